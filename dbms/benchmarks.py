@@ -0,0 +1,642 @@
+"""
+Benchmarks for the dbms package.
+
+Run them from the repository root with `python -m dbms.benchmarks [name ...]`.
+Every benchmark works on a throwaway database in a temporary directory, so
+dbms/contacts.db is never touched.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+from dbms import contact_points, dbms, search, vcard_import, vcf_files
+from dbms.connection import manager
+
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hannah", "Jonas", "Julia",
+               "Karl", "Lena", "Leon", "Lina", "Lukas", "Marie", "Max", "Mia", "Noah", "Paul",
+               "Sophie", "Tim", "Tom", "Ulrike", "Yusuf", "Zoe", "Nelio", "Leonie", "Jakob", "Ida"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+              "Schulz", "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Schröder", "Neumann",
+              "Schwarz", "Zimmermann", "Braun", "Krüger", "Hofmann", "Hartmann", "Lange", "Winter",
+              "Mendgen", "Krause", "Lehmann", "Köhler", "Herrmann", "König", "Walter", "Peters"]
+WORDS = ["met", "at", "conference", "call", "back", "about", "invoice", "birthday", "project",
+         "football", "neighbour", "dentist", "school", "friend", "colleague", "supplier"]
+
+
+@contextmanager
+def temp_database():
+    """Points the connection manager at a fresh, empty database for the duration of the block."""
+    previous_path = manager.db_path
+    with tempfile.TemporaryDirectory() as directory:
+        manager.use_database(os.path.join(directory, "bench.db"))
+        try:
+            dbms.create_tables()
+            yield manager.db_path
+        finally:
+            manager.use_database(previous_path)
+
+
+def synthetic_person(i, rng=random):
+    """Returns (fn, n, email, tel, note) of a made-up person, unique through its number i."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return (f"{first} {last} {i}", f"{last};{first};;", f"{first}.{last}{i}@example.com".lower(),
+            f"+49 30 {i:07d}", " ".join(rng.choice(WORDS) for _ in range(6)))
+
+def fill_persons(num_persons, num_groups=0):
+    """Inserts synthetic persons (and optionally groups) as fast as possible."""
+    rng = random.Random(42)
+    with manager.use_profile("bulk-load"), manager.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO persons (fn, n, email, tel, note) VALUES (?, ?, ?, ?, ?)",
+            (synthetic_person(i, rng) for i in range(num_persons))
+        )
+        conn.executemany(
+            "INSERT INTO groups (title, org) VALUES (?, ?)",
+            ((f"Group {i}", f"Company {i % 100}") for i in range(num_groups))
+        )
+
+
+def synthetic_vcard(i, rng=random):
+    """Returns the text of a made-up vCard 3.0 with the fields a phone export typically has."""
+    fn, n, email, tel, note = synthetic_person(i, rng)
+    return (
+        "BEGIN:VCARD\r\n"
+        "VERSION:3.0\r\n"
+        f"UID:urn:uuid:00000000-0000-4000-8000-{i:012d}\r\n"
+        f"FN:{fn}\r\n"
+        f"N:{n}\r\n"
+        f"EMAIL;TYPE=INTERNET:{email}\r\n"
+        f"TEL;TYPE=CELL:{tel}\r\n"
+        f"ORG:Company {i % 100}\r\n"
+        f"TITLE:{rng.choice(WORDS).title()}\r\n"
+        f"CATEGORIES:{rng.choice(WORDS)},{rng.choice(WORDS)}\r\n"
+        f"NOTE:{note}\r\n"
+        "END:VCARD\r\n"
+    )
+
+def write_synthetic_vcf(path, num_cards):
+    """Writes num_cards synthetic vCards to path without holding them in memory."""
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i in range(num_cards):
+            f.write(synthetic_vcard(i, rng))
+    return path
+
+
+def _time_calls(func, args_list):
+    """Returns the mean latency of func(*args) over args_list in microseconds."""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def _get_item_data_fresh_connection(category, item_id):
+    """The pre-connection-manager get_item_data: connect, query, close on every call."""
+    conn = sqlite3.connect(manager.db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM persons WHERE person_id = ?", (item_id,))
+    result = cursor.fetchone()
+    column_names = [description[0] for description in cursor.description]
+    conn.close()
+    return dict(zip(column_names, result)) if result else None
+
+
+def bench_connection_reuse(num_persons=100_000, calls=5_000):
+    """Per-call latency of get_item_data with a fresh connection per call vs. the shared one."""
+    with temp_database():
+        fill_persons(num_persons)
+        step = max(1, num_persons // calls)
+        args_list = [("persons", 1 + (i * step) % num_persons) for i in range(calls)]
+
+        before = _time_calls(_get_item_data_fresh_connection, args_list)
+        after = _time_calls(dbms.get_item_data, args_list)
+
+    print(f"get_item_data on {num_persons} contacts ({calls} calls):")
+    print(f"  connect per call:   {before:8.1f} us/call")
+    print(f"  shared connection:  {after:8.1f} us/call  ({before / after:.1f}x faster)")
+
+
+def bench_search(num_persons=1_000_000, repeat=20):
+    """Latency of FTS5 queries vs. the LIKE scans over the same columns they replace."""
+    queries = [
+        ("name prefix", "schrö", "prefix"),
+        ("two prefixes", "lena win", "prefix"),
+        ("phrase in note", "invoice birthday", "phrase"),
+        ("email prefix", "mia.kr", "prefix"),
+        ("unique number", "777777", "words"),
+    ]
+    columns = ("fn", "n", "nickname", "email", "tel", "adr", "note")
+    with temp_database():
+        print(f"Filling {num_persons} contacts...")
+        fill_persons(num_persons)
+        search.optimize_search_index()
+        conn = manager.get()
+        print(f"{'query':<16}{'fts5 name':>12}{'fts5 bm25':>12}{'LIKE scan':>12}")
+        for label, query, mode in queries:
+            fts = _time_calls(search.search, [(query, "persons", 20, mode)] * repeat) / 1000
+            bm25 = _time_calls(search.search, [(query, "persons", 20, mode, "bm25")] * repeat) / 1000
+            # What we would have to run without the index: every word in any column
+            words = query.split() if mode != "phrase" else [query]
+            where = " AND ".join("(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")" for _ in words)
+            params = [f"%{word}%" for word in words for _ in columns]
+            start = time.perf_counter()
+            conn.execute(f"SELECT person_id, fn FROM persons WHERE {where} LIMIT 20", params).fetchall()
+            scan = (time.perf_counter() - start) * 1000
+            print(f"{label:<16}{fts:>9.2f} ms{bm25:>9.2f} ms{scan:>9.2f} ms")
+
+
+def bench_batch_insert(num_rows=100_000, single_rows=2_000):
+    """Insert throughput of save_item_data one row at a time vs. save_items_batch."""
+    rng = random.Random(42)
+    columns = ("fn", "n", "email", "tel", "note")
+    rows = [dict(zip(columns, synthetic_person(i, rng))) for i in range(num_rows)]
+    with temp_database():
+        # save_item_data prints every statement, keep that out of the timing
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            for row in rows[:single_rows]:
+                dbms.save_item_data("persons", None, row)
+            single = single_rows / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            ids, failures = dbms.save_items_batch("persons", rows)
+            batch = num_rows / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            deleted = dbms.delete_items_batch("persons", ids)
+            delete = deleted / (time.perf_counter() - start)
+
+            with manager.use_profile("bulk-load"):
+                start = time.perf_counter()
+                dbms.save_items_batch("persons", rows)
+                bulk = num_rows / (time.perf_counter() - start)
+
+    print(f"save_item_data:                {single:10.0f} rows/s ({single_rows} rows)")
+    print(f"save_items_batch:              {batch:10.0f} rows/s ({num_rows} rows, {len(failures)} failures)")
+    print(f"save_items_batch (bulk-load):  {bulk:10.0f} rows/s")
+    print(f"delete_items_batch:            {delete:10.0f} rows/s")
+
+
+def bench_item_cache(num_persons=100_000, calls=20_000, distinct=500):
+    """get_item_data latency with the record cache vs. without it, on a working set of `distinct` records."""
+    rng = random.Random(7)
+    photo = bytes(rng.getrandbits(8) for _ in range(30_000))
+    with temp_database():
+        fill_persons(num_persons)
+        with manager.transaction() as conn:
+            conn.execute("UPDATE persons SET photo = ? WHERE person_id <= ?", (photo, distinct))
+        args_list = [("persons", rng.randint(1, distinct)) for _ in range(calls)]
+
+        table = dbms.get_table_schema("persons")
+        uncached = _time_calls(lambda category, item_id: dbms._load_item_data(category, table, item_id), args_list)
+        dbms.invalidate_cache()
+        cached = _time_calls(dbms.get_item_data, args_list)
+        stats = dbms.cache_stats()
+
+    print(f"get_item_data on {distinct} of {num_persons} contacts with 30 kB photos ({calls} calls):")
+    print(f"  without cache:  {uncached:8.1f} us/call")
+    print(f"  with cache:     {cached:8.1f} us/call  ({uncached / cached:.1f}x faster)")
+    print(f"  hit rate {stats['hit_rate']:.1%}, {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB, "
+          f"{stats['evictions']} evictions")
+
+
+def bench_projected_fetch(num_persons=2_000, photo_size=2_000_000, calls=200):
+    """Uncached record fetch of all columns vs. the text projection with lazy photo handles."""
+    photo = os.urandom(photo_size)
+    with temp_database():
+        fill_persons(num_persons)
+        with manager.transaction() as conn:
+            conn.execute("UPDATE persons SET photo = ?", (photo,))
+        table = dbms.get_table_schema("persons")
+        args_list = [(1 + (i * 7) % num_persons,) for i in range(calls)]
+
+        select_all = _time_calls(lambda item_id: dbms._load_item_data("persons", table, item_id), args_list)
+        projected = _time_calls(lambda item_id: dbms._load_record("persons", table, item_id), args_list)
+        handle = dbms._load_record("persons", table, 1)["photo"]
+        streamed = _time_calls(handle.read, [()] * 20)
+
+    print(f"Fetching one of {num_persons} contacts with {photo_size / 1e6:.0f} MB photos ({calls} calls, no cache):")
+    print(f"  all columns:               {select_all / 1000:8.2f} ms/call")
+    print(f"  text columns + handles:    {projected / 1000:8.2f} ms/call  ({select_all / projected:.0f}x faster)")
+    print(f"  BlobHandle.read() on view: {streamed / 1000:8.2f} ms/call")
+
+
+def _write_card_rows_one_by_one(cursor, card_rows):
+    """The pre-batching import writer: one execute and lastrowid round trip per row, trigger indexing."""
+    def insert(table_name, columns, values):
+        cursor.execute(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                       values)
+        return cursor.lastrowid
+
+    for person, other, group, role, _ in card_rows:
+        person_id = insert("persons", vcard_import.PERSON_COLUMNS, person)
+        if other:
+            insert("other", ("person_id",) + vcard_import.OTHER_COLUMNS, (person_id,) + tuple(other))
+        group_id = insert("groups", vcard_import.GROUP_COLUMNS, group) if group else None
+        role_id = insert("role", vcard_import.ROLE_COLUMNS, role) if role else None
+        if person_id and group_id and role_id:
+            insert("is_in", ("person_id", "group_id", "role_id"), (person_id, group_id, role_id))
+
+def _import_vcard_whole_file(vcf_path):
+    """The pre-streaming import_vcard: read the whole file, then parse and insert it."""
+    with open(vcf_path, "r") as f:
+        vcard_data = f.read()
+    with manager.use_profile("bulk-load"), manager.transaction() as connection:
+        _write_card_rows_one_by_one(connection.cursor(), vcard_import.parse_cards(vcard_data))
+
+
+def _peak_memory(func, *args):
+    """Runs func(*args) and returns (peak traced memory in bytes, seconds)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, seconds
+
+def bench_import_memory(sizes=(10_000, 100_000, 1_000_000), whole_file_up_to=100_000):
+    """Peak Python heap of import_vcard on synthetic files, streamed vs. read whole."""
+    print(f"{'cards':>10}{'file':>10}{'streamed peak':>16}{'whole-file peak':>18}{'streamed time':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_cards in sizes:
+            path = write_synthetic_vcf(os.path.join(directory, f"{num_cards}.vcf"), num_cards)
+            file_size = os.path.getsize(path)
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                with temp_database():
+                    streamed, seconds = _peak_memory(vcard_import.import_vcard, path)
+                whole = None
+                if num_cards <= whole_file_up_to:
+                    with temp_database():
+                        whole, _ = _peak_memory(_import_vcard_whole_file, path)
+            whole_text = f"{whole / 1e6:>15.1f} MB" if whole is not None else f"{'skipped':>18}"
+            print(f"{num_cards:>10}{file_size / 1e6:>7.1f} MB{streamed / 1e6:>13.1f} MB{whole_text}{seconds:>13.1f} s")
+            os.remove(path)
+
+
+def bench_import_writer(num_cards=20_000):
+    """Rows/s of the import writer: insert_* helpers per card vs. write_card_rows, on pre-parsed cards."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_synthetic_vcf(os.path.join(directory, "cards.vcf"), num_cards)
+        with open(path, "r", encoding="utf-8") as f:
+            start = time.perf_counter()
+            card_rows = vcard_import.parse_cards(f.read())
+            parse = num_cards / (time.perf_counter() - start)
+
+    with temp_database():
+        with manager.use_profile("bulk-load"), manager.transaction() as conn:
+            start = time.perf_counter()
+            _write_card_rows_one_by_one(conn.cursor(), card_rows)
+            one_by_one = num_cards / (time.perf_counter() - start)
+    with temp_database():
+        with manager.use_profile("bulk-load"), manager.transaction() as conn:
+            start = time.perf_counter()
+            vcard_import.write_card_rows(conn, card_rows)
+            batched = num_cards / (time.perf_counter() - start)
+
+    print(f"Writing {num_cards} parsed cards (person, other, group, role and membership rows each):")
+    print(f"  insert_* per card:   {one_by_one:10.0f} cards/s")
+    print(f"  write_card_rows:     {batched:10.0f} cards/s  ({batched / one_by_one:.1f}x faster)")
+    print(f"  for scale, parsing:  {parse:10.0f} cards/s with parse_cards")
+
+
+def _dump_tables(tables=("persons", "other", "groups", "role", "is_in", "search_index")):
+    """Every row of the given tables, to compare two databases."""
+    conn = manager.get()
+    return {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall() for table in tables}
+
+def bench_parallel_import(num_cards=50_000, workers=(1, 2, 4, 8)):
+    """
+    import_vcard throughput with 1..n parsing processes, checking every run
+    against the serial result. Also splits the serial import into reading and
+    parsing (what the processes take over) and the rest, which stays on the one
+    writer and limits the possible speedup.
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = [count for count in workers if count <= cpu_count] or [1]
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_synthetic_vcf(os.path.join(directory, "cards.vcf"), num_cards)
+        start = time.perf_counter()
+        for _ in vcard_import._parsed_chunks(path, vcard_import.IMPORT_CHUNK_SIZE, 1):
+            pass
+        parse_time = time.perf_counter() - start
+
+        serial = None
+        for count in workers:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull), temp_database():
+                start = time.perf_counter()
+                vcard_import.import_vcard(path, workers=count)
+                elapsed = time.perf_counter() - start
+                tables = _dump_tables()
+            if serial is None:
+                serial, serial_time = tables, elapsed
+            same = "identical" if tables == serial else "DIFFERENT"
+            print(f"  {count} worker(s): {num_cards / elapsed:8.0f} cards/s  (result {same} to {workers[0]} worker(s))")
+
+    writer_time = max(serial_time - parse_time, 1e-9)
+    print(f"  serial import {serial_time:.2f} s: reading and parsing {parse_time:.2f} s "
+          f"({parse_time / serial_time:.0%}), writing {writer_time:.2f} s")
+    for count in (2, 4, 8, 16):
+        bound = serial_time / (writer_time + parse_time / count)
+        print(f"  at most {bound:.1f}x with {count} processes on {count} free cores")
+    print(f"  at most {serial_time / writer_time:.1f}x however many, the writer is serial ({cpu_count} core(s) here)")
+
+def bench_vcard_parser(num_cards=20_000):
+    """
+    Cards/s of parse_cards with vcard_parser vs. vobject, checking both give the
+    same rows. tests/test_vcard_parser.py compares them on hand-written edge cases.
+    """
+    rng = random.Random(17)
+    text = "".join(synthetic_vcard(i, rng) for i in range(num_cards))
+
+    rates = {}
+    rows = {}
+    for fast in (False, True):
+        start = time.perf_counter()
+        rows[fast] = vcard_import.parse_cards(text, fast=fast)
+        rates[fast] = num_cards / (time.perf_counter() - start)
+    print(f"  rows {'identical' if rows[True] == rows[False] else 'DIFFERENT'}")
+    print(f"  vobject:      {rates[False]:8.0f} cards/s")
+    print(f"  vcard_parser: {rates[True]:8.0f} cards/s  ({rates[True] / rates[False]:.1f}x)")
+
+def bench_contact_lookup(num_persons=500_000, lookups=1_000):
+    """Reverse phone lookup: LIKE scan over persons.tel vs. find_persons_by_contact on the contact_points index."""
+    rng = random.Random(18)
+    numbers = [rng.randrange(num_persons) for _ in range(lookups)]
+    with temp_database():
+        fill_persons(num_persons)
+        with manager.use_profile("bulk-load"), manager.transaction() as conn:
+            contact_points.backfill(conn.cursor())
+        conn = manager.get()
+
+        start = time.perf_counter()
+        scanned = [[row[0] for row in conn.execute("SELECT person_id FROM persons WHERE tel LIKE ?", (f"%30 {i:07d}",))]
+                   for i in numbers[:lookups // 20]]
+        scan = (time.perf_counter() - start) * 1000 / len(scanned)
+        # Written differently than stored, the normalization has to find them anyway
+        start = time.perf_counter()
+        found = [dbms.find_persons_by_contact("tel", f"0049-30-{i:07d}") for i in numbers]
+        indexed = (time.perf_counter() - start) * 1000 / len(found)
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT DISTINCT person_id FROM contact_points WHERE kind = ? AND normalized = ?",
+            ("tel", "+49301234567")
+        ).fetchall()
+    same = "identical" if found[:len(scanned)] == scanned else "DIFFERENT"
+    print(f"Looking up phone numbers among {num_persons} persons:")
+    print(f"  LIKE scan over persons.tel:  {scan:8.3f} ms/lookup")
+    print(f"  find_persons_by_contact:     {indexed:8.3f} ms/lookup  ({scan / indexed:.0f}x faster, results {same})")
+    print(f"  plan: {'; '.join(row[-1] for row in plan)}")
+
+def bench_group_interning(num_cards=10_000):
+    """Groups/roles rows, their size and the write rate for one company's cards: a row per card vs. interned rows."""
+    rng = random.Random(19)
+    text = "".join(
+        synthetic_vcard(i, rng).replace("END:VCARD", "ROLE:Employee\r\nEND:VCARD")
+        for i in range(num_cards)
+    )
+    text = text.replace("ORG:Company ", "ORG:Acme Corp;Dept ").replace("TITLE:", "X-TITLE:")
+    card_rows = vcard_import.parse_cards(text)
+
+    print(f"Writing {num_cards} cards of one organization:")
+    for label, write in (("row per card (before)", lambda conn: _write_card_rows_one_by_one(conn.cursor(), card_rows)),
+                         ("interned", lambda conn: vcard_import.write_card_rows(conn, card_rows))):
+        with temp_database() as path:
+            with manager.use_profile("bulk-load"), manager.transaction() as conn:
+                start = time.perf_counter()
+                write(conn)
+                rate = num_cards / (time.perf_counter() - start)
+            conn = manager.get()
+            groups = conn.execute("SELECT COUNT(*) FROM groups").fetchone()[0]
+            roles = conn.execute("SELECT COUNT(*) FROM role").fetchone()[0]
+            # Pages of the groups and role tables and their indexes
+            size = conn.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name IN ('groups', 'role'))"
+            ).fetchone()[0] / 1024
+        print(f"  {label:<22}{groups:>7} groups {roles:>7} roles {size:8.0f} KiB  {rate:8.0f} cards/s")
+
+def bench_vcf_browse(num_cards=500_000, samples=1_000):
+    """Browsing a big .vcf file under "Files": one-time scan, then paging and previewing single cards."""
+    rng = random.Random(20)
+    with temp_database() as path:
+        directory = os.path.join(os.path.dirname(path), "vcf")
+        os.mkdir(directory)
+        vcf_path = write_synthetic_vcf(os.path.join(directory, "big.vcf"), num_cards)
+        size = os.path.getsize(vcf_path) / 1e6
+
+        start = time.perf_counter()
+        (file_id, _), = vcf_files.list_files(directory)
+        vcf_files.index_file(file_id)
+        scan = time.perf_counter() - start
+        start = time.perf_counter()
+        vcf_files.list_files(directory)
+        vcf_files.index_file(file_id)
+        reopen = (time.perf_counter() - start) * 1000
+
+        # The index has to split the file exactly like the import does
+        boundaries = [(start, end) for start, end, _ in vcard_import.iter_vcard_texts(vcf_path)]
+        indexed = manager.get().execute(
+            "SELECT byte_offset, byte_offset + byte_length FROM vcf_cards WHERE file_id = ? ORDER BY card_index",
+            (file_id,)
+        ).fetchall()
+        card_indexes = [rng.randrange(num_cards) for _ in range(samples)]
+        wrong_fn = sum(
+            vcf_files.list_cards(file_id, index - 1, 1)[0][1] != vcard_import.parse_cards(
+                vcf_files.read_card_text(file_id, index))[0][0][0]
+            for index in card_indexes
+        )
+
+        page = _time_calls(vcf_files.list_cards, [(file_id, index, 100) for index in card_indexes]) / 1000
+        preview = _time_calls(vcf_files.get_card_fields, [(file_id, index) for index in card_indexes]) / 1000
+        index_size = manager.get().execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = 'vcf_cards'"
+        ).fetchone()[0] / 1e6
+
+    print(f"Browsing a {size:.0f} MB file of {num_cards} cards:")
+    print(f"  first open (scan):     {scan:8.2f} s  ({size / scan:.0f} MB/s), index {index_size:.1f} MB")
+    print(f"  reopen:                {reopen:8.2f} ms")
+    print(f"  page of 100 cards:     {page:8.3f} ms")
+    print(f"  preview one card:      {preview:8.3f} ms")
+    same = "identical" if boundaries == indexed else "DIFFERENT"
+    print(f"  card boundaries vs. iter_vcard_texts: {same}, FN differs for {wrong_fn} of {samples} cards")
+
+def bench_item_window(num_persons=500_000, jumps=200):
+    """What the virtualized sidebar list reads: all rows at once (before) vs. the count plus the rows in view."""
+    rng = random.Random(21)
+    with temp_database():
+        fill_persons(num_persons)
+        start = time.perf_counter()
+        all_rows = list(dbms.iter_items("persons"))
+        everything = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        count = dbms.count_items("persons")
+        rows, next_key = dbms.list_items_page("persons", page_size=200)
+        first_window = (time.perf_counter() - start) * 1000
+
+        # Scrolling on page by page from the last key
+        start = time.perf_counter()
+        for _ in range(50):
+            rows, next_key = dbms.list_items_page("persons", page_size=200, after=next_key)
+        scroll = (time.perf_counter() - start) * 1000 / 50
+
+        offsets = [rng.randrange(num_persons) for _ in range(jumps)]
+        jump = _time_calls(lambda offset: dbms.list_items_page("persons", page_size=200, offset=offset),
+                           [(offset,) for offset in offsets]) / 1000
+        position = _time_calls(dbms.get_item_position, [("persons", all_rows[offset][0]) for offset in offsets]) / 1000
+        same = all(dbms.list_items_page("persons", page_size=1, offset=offset)[0][0] == all_rows[offset]
+                   for offset in offsets[:20])
+    print(f"Sidebar rows for {num_persons} persons:")
+    print(f"  all rows (before):          {everything:9.1f} ms  ({len(all_rows)} rows, one widget each)")
+    print(f"  count + first 200 rows:     {first_window:9.1f} ms")
+    print(f"  next 200 rows (scrolling):  {scroll:9.3f} ms")
+    print(f"  200 rows after a jump:      {jump:9.3f} ms  (rows {'identical' if same else 'DIFFERENT'})")
+    print(f"  position of an item:        {position:9.3f} ms  (count={count})")
+
+
+def _rebuild_detail_data(category, item_id):
+    """The reads of the pre-reuse MainContentFrame.update_content, done on the Tk thread."""
+    table = dbms.get_table_schema(category)
+    item_data = dbms.get_item_fields(category, item_id, table.column_names)
+    groups = dbms.get_groups_for_person(item_id)
+    return table, item_data, groups
+
+def _rebuild_detail_view(frame, category, item_id):
+    """The pre-reuse MainContentFrame.update_content: a new scroll frame and two labels per attribute per click."""
+    import customtkinter as ctk
+
+    if frame.details_scroll_frame is not None:
+        frame.details_scroll_frame.destroy()
+    table, item_data, groups = _rebuild_detail_data(category, item_id)
+    frame.details_scroll_frame = ctk.CTkScrollableFrame(
+        frame, label_text=f"Details for: {item_data.get('fn')}", label_font=ctk.CTkFont(size=18, weight="bold")
+    )
+    frame.details_scroll_frame.grid(row=0, column=0, padx=20, pady=(10, 5), sticky="nsew")
+    frame.details_scroll_frame.grid_columnconfigure(1, weight=1)
+    rows = [(column.display_name, item_data.get(column.name)) for column in table.columns]
+    rows.append(("Groups", ", ".join(title for _, title in groups) if groups else "None"))
+    for row_num, (display_name, value) in enumerate(rows):
+        ctk.CTkLabel(frame.details_scroll_frame, text=f"{display_name}:",
+                     font=ctk.CTkFont(size=13, weight="bold")).grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
+        ctk.CTkLabel(frame.details_scroll_frame, text=str(value) if value is not None else "N/A",
+                     wraplength=400, justify="left").grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
+    ctk.CTkButton(frame.details_scroll_frame, text="Assign to Groups").grid(row=999, column=0, columnspan=2, pady=(10, 5))
+
+def bench_detail_view(num_persons=10_000, clicks=200):
+    """
+    Click-to-render time of the person details: widgets rebuilt per click
+    (_rebuild_detail_view, before) vs. the reused label grid (after). The reads
+    of both paths are timed on their own as well, the widget part needs a display.
+    """
+    import tkinter as tk
+    import customtkinter as ctk
+    from gui import gui
+
+    rng = random.Random(23)
+    root = None
+    with temp_database():
+        fill_persons(num_persons)
+        item_ids = [rng.randint(1, num_persons) for _ in range(clicks)]
+        # Both runs read the same cached records, only the widget work differs
+        for item_id in item_ids:
+            _rebuild_detail_data("Persons", item_id)
+
+        args_list = [("Persons", item_id) for item_id in item_ids]
+        reads_before = _time_calls(_rebuild_detail_data, args_list) / 1000
+        reads_after = _time_calls(gui.MainContentFrame._load_details, args_list) / 1000
+        print(f"Showing a person of {num_persons} ({clicks} clicks):")
+        print(f"  reads, before:                   {reads_before:8.3f} ms/click")
+        print(f"  reads, after (_load_details):    {reads_after:8.3f} ms/click")
+
+        try:
+            root = ctk.CTk()
+        except tk.TclError as e:
+            print(f"  The widget part can only be measured with a display: {e}")
+            return
+        try:
+            def click(render, item_id):
+                render(frame, "Persons", item_id)
+                root.update_idletasks() # Geometry and redraw, what the user waits for
+
+            frame = gui.MainContentFrame(root)
+            root.update()
+            before = _time_calls(click, [(_rebuild_detail_view, item_id) for item_id in item_ids]) / 1000
+            frame.destroy()
+
+            frame = gui.MainContentFrame(root)
+            root.update()
+            first = _time_calls(click, [(gui.MainContentFrame.update_content, item_ids[0])]) / 1000
+            after = _time_calls(click, [(gui.MainContentFrame.update_content, item_id) for item_id in item_ids]) / 1000
+        finally:
+            root.destroy()
+    print(f"  new widgets per click (before):  {before:8.2f} ms/click")
+    print(f"  first click, builds the grid:    {first:8.2f} ms")
+    print(f"  reused label grid:               {after:8.2f} ms/click  ({before / after:.1f}x faster)")
+
+
+def bench_filter(num_persons=500_000, limit=100, count_limit=10_000):
+    """Per-keystroke cost of the sidebar filter: a LIKE scan over fn vs. filter_items on the NOCASE and FTS indexes."""
+    typed = {"prefix": "Marie Schm", "words": "lena win"}
+    with temp_database():
+        fill_persons(num_persons)
+        search.optimize_search_index()
+        conn = manager.get()
+        print(f"Filter over {num_persons} persons, first {limit} matches, counted up to {count_limit}:")
+        print(f"{'mode':<8}{'text':<14}{'LIKE scan':>12}{'indexed':>12}{'matches':>10}")
+        for mode, text in typed.items():
+            worst = 0
+            for end in range(1, len(text) + 1):
+                query = text[:end]
+                if not query.strip():
+                    continue
+                # Without an index (the unary + keeps LIKE off the NOCASE index): a scan of every name
+                start = time.perf_counter()
+                pattern = f"%{query}%" if mode == "words" else f"{query}%"
+                conn.execute("SELECT person_id, fn FROM persons WHERE +fn LIKE ? ORDER BY fn LIMIT ?",
+                             (pattern, limit)).fetchall()
+                conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM persons WHERE +fn LIKE ? LIMIT ?)",
+                             (pattern, count_limit)).fetchone()
+                scan = (time.perf_counter() - start) * 1000
+
+                start = time.perf_counter()
+                rows, count = dbms.filter_items("persons", query.strip(), mode, limit, count_limit)
+                indexed = (time.perf_counter() - start) * 1000
+                worst = max(worst, indexed)
+                print(f"{mode:<8}{query!r:<14}{scan:>9.2f} ms{indexed:>9.2f} ms{count:>10}")
+            print(f"  slowest keystroke ({mode}): {worst:.2f} ms")
+
+
+BENCHMARKS = {
+    "connection_reuse": bench_connection_reuse,
+    "search": bench_search,
+    "batch_insert": bench_batch_insert,
+    "item_cache": bench_item_cache,
+    "projected_fetch": bench_projected_fetch,
+    "import_memory": bench_import_memory,
+    "import_writer": bench_import_writer,
+    "parallel_import": bench_parallel_import,
+    "vcard_parser": bench_vcard_parser,
+    "contact_lookup": bench_contact_lookup,
+    "group_interning": bench_group_interning,
+    "vcf_browse": bench_vcf_browse,
+    "item_window": bench_item_window,
+    "detail_view": bench_detail_view,
+    "filter": bench_filter,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        print(f"--- {name} ---")
+        BENCHMARKS[name]()
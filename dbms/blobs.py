@@ -0,0 +1,56 @@
+import sqlite3
+
+from dbms.connection import manager
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobHandle:
+    """
+    Lazy reference to one BLOB value, e.g. a person's photo or a group's logo.
+
+    Creating a handle costs nothing but the length of the value. The bytes are
+    only read when read() or iter_chunks() is called, through SQLite's incremental
+    BLOB I/O, so callers that never show the picture never load it.
+    """
+    def __init__(self, table, column, rowid, size):
+        self.table = table
+        self.column = column
+        self.rowid = rowid
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"<BlobHandle {self.table}.{self.column} rowid={self.rowid} size={self.size}>"
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """
+        Yields the value in pieces of at most chunk_size bytes.
+
+        The current value in the database is read, so if the row was changed since
+        the handle was created the new data (and length) is returned.
+        """
+        with manager.connection() as conn:
+            try:
+                blob = conn.blobopen(self.table, self.column, self.rowid, readonly=True)
+            except sqlite3.OperationalError:
+                # blobopen only works on BLOB values, values saved as TEXT (e.g. from
+                # the edit form) are fetched in one piece
+                row = conn.execute(
+                    f"SELECT CAST({self.column} AS BLOB) FROM {self.table} WHERE rowid = ?", (self.rowid,)
+                ).fetchone()
+                if row and row[0]:
+                    yield row[0]
+                return
+            with blob:
+                while True:
+                    chunk = blob.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+    def read(self):
+        """Returns the whole value as bytes."""
+        return b"".join(self.iter_chunks())
@@ -0,0 +1,50 @@
+import threading
+from collections import namedtuple
+
+# In-process notifications about committed changes to persons and groups, so
+# views can update the rows that changed instead of reloading everything. The
+# write functions of dbms and vcard_import call notify() after their transaction
+# committed. Subscribers are called synchronously on the writing thread, a GUI
+# has to hand the change over to its own thread (see gui.App._poll_db_changes).
+
+# category is "persons" or "groups", the id tuples hold the items that were
+# added, changed or deleted. reset means too much changed to list (an import,
+# clear_tables()), everything shown of the category has to be read again.
+Change = namedtuple("Change", ["category", "inserted", "updated", "deleted", "reset"])
+
+_subscribers = []
+_lock = threading.Lock()
+
+
+def subscribe(callback):
+    """Calls callback(change) for every Change from now on. Returns callback."""
+    with _lock:
+        _subscribers.append(callback)
+    return callback
+
+def unsubscribe(callback):
+    """Stops calling callback, does nothing if it is not subscribed."""
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+def notify(category, inserted=(), updated=(), deleted=(), reset=False):
+    """
+    Tells every subscriber about a committed change. Empty changes are not sent.
+
+    Args:
+        category (str): "persons" or "groups".
+        inserted, updated, deleted: Ids of the items concerned.
+        reset (bool): Too many items changed to list them.
+    """
+    change = Change(category.lower(), tuple(inserted), tuple(updated), tuple(deleted), reset)
+    if not (change.inserted or change.updated or change.deleted or change.reset):
+        return
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        try:
+            callback(change)
+        except Exception as e:
+            # A broken view must not make the write look failed
+            print(f"Error in change subscriber {callback}: {e}")
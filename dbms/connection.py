@@ -0,0 +1,206 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_DIR = 'dbms'
+DB_PATH = os.path.join(DB_DIR, 'contacts.db')
+
+# Name of the environment variable that selects the performance profile
+PROFILE_ENV_VAR = 'CONTACTS_DB_PROFILE'
+DEFAULT_PROFILE = 'balanced'
+
+# Performance profiles: PRAGMA name -> value, applied to every new connection.
+# journal_mode is persisted in the database file and is only set when a
+# connection is opened, all other pragmas only affect the connection they run on
+# and can be switched temporarily with ConnectionManager.use_profile().
+PROFILES = {
+    # SQLite's own defaults: rollback journal, fsync on every commit
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,              # Negative values are KiB, i.e. 2 MiB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,             # Milliseconds
+    },
+    # WAL keeps readers and the writer out of each other's way, NORMAL only
+    # fsyncs at checkpoints, which is still safe against corruption in WAL mode
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # For imports and test data generation: no fsync at all and a big cache.
+    # A power loss during the operation can lose the last transactions.
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+
+
+class ConnectionManager:
+    """
+    Hands out one long-lived SQLite connection per thread.
+
+    Connections are opened lazily the first time a thread asks for one and are
+    reused by every later call from that thread, so a single GUI click no longer
+    pays for several connection setups. close() closes the calling thread's
+    connection, close_all() closes every connection the manager has handed out
+    (it is also registered to run at interpreter exit).
+
+    Every connection is configured with the pragmas of the selected performance
+    profile (see PROFILES), which defaults to the CONTACTS_DB_PROFILE
+    environment variable or 'balanced'.
+    """
+    def __init__(self, db_path=DB_PATH, profile=None):
+        self.db_path = db_path
+        if profile is None:
+            profile = os.environ.get(PROFILE_ENV_VAR, DEFAULT_PROFILE)
+            if profile not in PROFILES:
+                print(f"Warning: Unknown database profile '{profile}' in {PROFILE_ENV_VAR}, using '{DEFAULT_PROFILE}'.")
+                profile = DEFAULT_PROFILE
+        self.profile = _check_profile(profile)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set() # Every open connection, for close_all()
+        self._generation = 0      # Bumped by close_all() so threads reopen lazily
+
+    def _open(self):
+        """Opens a new connection to db_path, creating its directory if needed."""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connections never leave their thread, check_same_thread=False is only
+        # needed so close_all() can close them from whichever thread calls it.
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        _apply_profile(conn, self.profile, journal_mode=True)
+        return conn
+
+    def get(self):
+        """Returns the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            conn = self._open()
+            with self._lock:
+                self._connections.add(conn)
+            self._local.conn = conn
+            self._local.generation = self._generation
+            self._local.depth = 0
+            self._local.profile = self.profile
+        return conn
+
+    def set_profile(self, name):
+        """
+        Selects the performance profile for all connections.
+
+        Open connections are closed so that every thread reopens with the new
+        pragmas (including journal_mode) on its next call.
+        """
+        self.profile = _check_profile(name)
+        self.close_all()
+
+    @contextmanager
+    def use_profile(self, name):
+        """
+        Switches the calling thread's connection to another profile for the
+        duration of the block, e.g. `with manager.use_profile("bulk-load"):`.
+
+        journal_mode is left alone since changing it needs exclusive access to
+        the database file, every other pragma of the profile is applied.
+        """
+        name = _check_profile(name)
+        conn = self.get()
+        previous = self._local.profile
+        _apply_profile(conn, name, journal_mode=False)
+        self._local.profile = name
+        try:
+            yield conn
+        finally:
+            if self._local.conn is conn and self._local.generation == self._generation:
+                _apply_profile(conn, previous, journal_mode=False)
+                self._local.profile = previous
+
+    @contextmanager
+    def connection(self):
+        """Yields the calling thread's connection for read-only work."""
+        yield self.get()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields the calling thread's connection inside a transaction.
+
+        The transaction is committed when the outermost `with` block exits normally
+        and rolled back if it raises, nested blocks simply join the outer one.
+        """
+        conn = self.get()
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.rollback()
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.commit()
+
+    def close(self):
+        """Closes the calling thread's connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def close_all(self):
+        """Closes every connection handed out so far, in all threads."""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing database connection: {e}")
+
+    def use_database(self, db_path):
+        """Closes all connections and points the manager at another database file."""
+        self.close_all()
+        self.db_path = db_path
+
+
+def _check_profile(name):
+    """Returns name if it is a known profile, raises ValueError otherwise."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown database profile '{name}'. Available: {', '.join(PROFILES)}")
+    return name
+
+def _apply_profile(conn, name, journal_mode):
+    """Runs the pragmas of profile `name` on conn."""
+    for pragma, value in PROFILES[name].items():
+        if pragma == "journal_mode" and not journal_mode:
+            continue
+        try:
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        except sqlite3.Error as e:
+            # e.g. leaving WAL mode while another process has the database open
+            print(f"Warning: could not set PRAGMA {pragma} = {value}: {e}")
+
+
+manager = ConnectionManager()
+atexit.register(manager.close_all)
@@ -0,0 +1,132 @@
+import re
+
+# Multi-valued properties kept in the contact_points table. The persons table has
+# a column of the same name holding the first one, which is position 0 here.
+CONTACT_KINDS = ('tel', 'email', 'adr', 'impp', 'lang')
+
+COLUMNS = ('person_id', 'kind', 'position', 'type', 'raw', 'normalized')
+
+# Everything after the number itself: URI parameters (tel:...;ext=12) and
+# written extensions ("555-1234 x12", "ext. 12")
+_PHONE_EXTENSION_RE = re.compile(r'(?:;|\s*(?:ext\.?|x)\s*\d).*$', re.IGNORECASE | re.DOTALL)
+_NON_DIGITS_RE = re.compile(r'[^0-9]')
+
+
+def normalize_phone(value):
+    """
+    E.164-style form of a phone number: its digits, with a leading "+" if the
+    number is international ("+49 30 123", "0049 30 123" -> "+4930123").
+    National numbers keep their digits only, as the country is not known.
+    """
+    value = value.strip()
+    if value[:4].lower() == 'tel:':
+        value = value[4:]
+    value = _PHONE_EXTENSION_RE.sub('', value)
+    digits = _NON_DIGITS_RE.sub('', value)
+    if not digits:
+        return None
+    if value.lstrip().startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    return digits
+
+def normalize_email(value):
+    value = value.strip()
+    if value[:7].lower() == 'mailto:':
+        value = value[7:]
+    return value.lower() or None
+
+def _normalize_text(value):
+    return ' '.join(value.split()).casefold() or None
+
+NORMALIZERS = {
+    'tel': normalize_phone,
+    'email': normalize_email,
+    'adr': _normalize_text,
+    'impp': _normalize_text,
+    'lang': _normalize_text,
+}
+
+def normalize(kind, value):
+    """
+    Returns the form a value of the given kind is stored and looked up by, or None
+    if nothing is left of it (e.g. a phone number without digits).
+    """
+    return NORMALIZERS[kind](value)
+
+def _is_empty(raw):
+    # The import writes the text 'None' for missing values
+    return raw is None or not str(raw).strip() or raw == 'None'
+
+def card_points(contacts):
+    """
+    Turns the contact lines of one card into contact_points rows without person_id.
+
+    Args:
+        contacts (list): (kind, type, raw value) tuples in card order.
+
+    Returns:
+        tuple: (kind, position, type, raw, normalized) tuples, ordered by kind as
+        in CONTACT_KINDS and then by position within the card. Empty values are
+        left out but keep their position.
+    """
+    by_kind = {kind: [] for kind in CONTACT_KINDS}
+    for kind, types, raw in contacts:
+        by_kind[kind].append((types, raw))
+    points = []
+    for kind in CONTACT_KINDS:
+        for position, (types, raw) in enumerate(by_kind[kind]):
+            if not _is_empty(raw):
+                points.append((kind, position, types, raw, normalize(kind, raw)))
+    return tuple(points)
+
+def insert_points(conn, rows):
+    """Inserts (person_id, kind, position, type, raw, normalized) rows."""
+    if rows:
+        conn.executemany(
+            f"INSERT INTO contact_points ({', '.join(COLUMNS)}) VALUES ({', '.join(['?'] * len(COLUMNS))})", rows
+        )
+
+def sync_person_columns(conn, person_rows):
+    """
+    Brings position 0 of every kind in line with the persons columns after they
+    were saved from the GUI. The other positions come from imports and are kept.
+
+    Args:
+        conn: Connection inside the transaction that wrote the persons rows.
+        person_rows (list): (person_id, data) tuples, data being the saved
+            column: value dictionary. Kinds not in data are left alone.
+    """
+    for person_id, data in person_rows:
+        for kind in CONTACT_KINDS:
+            if kind not in data:
+                continue
+            raw = data[kind]
+            if _is_empty(raw):
+                conn.execute(
+                    "DELETE FROM contact_points WHERE person_id = ? AND kind = ? AND position = 0", (person_id, kind)
+                )
+                continue
+            raw = str(raw)
+            normalized = normalize(kind, raw)
+            cursor = conn.execute(
+                "UPDATE contact_points SET raw = ?, normalized = ? WHERE person_id = ? AND kind = ? AND position = 0",
+                (raw, normalized, person_id, kind)
+            )
+            if cursor.rowcount == 0:
+                insert_points(conn, [(person_id, kind, 0, None, raw, normalized)])
+
+def backfill(cursor):
+    """Migration step: creates position 0 of every kind from the existing persons columns."""
+    rows = []
+    for person_id, *values in cursor.connection.execute(
+        f"SELECT person_id, {', '.join(CONTACT_KINDS)} FROM persons"
+    ):
+        for kind, raw in zip(CONTACT_KINDS, values):
+            if not _is_empty(raw):
+                rows.append((person_id, kind, 0, None, str(raw), normalize(kind, str(raw))))
+        if len(rows) >= 10_000:
+            insert_points(cursor, rows)
+            rows = []
+    insert_points(cursor, rows)
@@ -1,91 +1,100 @@
 import sqlite3
 import os
 
-DB_DIR = 'dbms'
-DB_PATH = os.path.join(DB_DIR, 'contacts.db')
+from dbms import changes, contact_points, migrations, schema, search
+from dbms.blobs import BlobHandle
+from dbms.cache import LRUCache
+from dbms.connection import DB_DIR, DB_PATH, manager
+
+# category -> (table name, id column, name column)
+TABLES = {
+    "persons": ("persons", "person_id", "fn"),
+    "groups": ("groups", "group_id", "title"),
+}
+
+# Orders supported by list_items_page() and iter_items()
+SORT_KEYS = ("name", "id")
+
+# Ways filter_items() matches the typed text against names
+FILTER_MODES = ("prefix", "words")
+
+# Read-through cache for get_item_data, get_item_fields, get_groups_for_person and
+# get_persons_for_group. Keys are ("item", category, id), ("record", category, id),
+# ("groups_for_person", person_id) and ("persons_for_group", group_id). Every
+# write function below invalidates exactly the entries its change affects. Writes
+# made by other processes are not seen until those entries are evicted or
+# invalidate_cache() is called.
+item_cache = LRUCache()
+_cached_db_path = manager.db_path
+
+def cache_stats():
+    """Returns the hit/miss/eviction counters and fill level of the item cache."""
+    return item_cache.stats()
+
+def invalidate_cache():
+    """Drops every cached record and membership list."""
+    item_cache.clear()
+
+def _cached(key, load):
+    """Returns the cached value for key, calling load() and caching its result on a miss."""
+    global _cached_db_path
+    if manager.db_path != _cached_db_path:
+        # manager.use_database() switched files, nothing cached belongs to the new one
+        item_cache.clear()
+        _cached_db_path = manager.db_path
+    found, value = item_cache.get(key)
+    if not found:
+        generation = item_cache.current_generation()
+        value = load()
+        if value is not None:
+            item_cache.put(key, value, generation)
+    return value
+
+def _invalidate_items(category, item_ids):
+    """
+    Drops the cached records of the given persons or groups together with the
+    membership lists that show their names.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    own_column, other_column, other_key = (
+        ("person_id", "group_id", "persons_for_group") if category == "persons"
+        else ("group_id", "person_id", "groups_for_person")
+    )
+    own_key = "groups_for_person" if category == "persons" else "persons_for_group"
+
+    keys = []
+    for item_id in item_ids:
+        keys.append(("item", category, item_id))
+        keys.append(("record", category, item_id))
+        keys.append((own_key, item_id))
+    with manager.connection() as conn:
+        # Chunked to stay below SQLite's host parameter limit
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ', '.join(['?'] * len(chunk))
+            for (other_id,) in conn.execute(
+                f"SELECT DISTINCT {other_column} FROM is_in WHERE {own_column} IN ({placeholders})", chunk
+            ):
+                keys.append((other_key, other_id))
+    item_cache.invalidate(keys)
+
+def _invalidate_memberships(pairs):
+    """Drops the cached membership lists of the given (person_id, group_id) pairs."""
+    keys = []
+    for person_id, group_id in pairs:
+        keys.append(("groups_for_person", person_id))
+        keys.append(("persons_for_group", group_id))
+    if keys:
+        item_cache.invalidate(keys)
 
 def create_tables():
-    """Create the necessary tables in the SQLite database."""
+    """Create the necessary tables and indexes by applying all pending schema migrations."""
     # Ensure the directory for the database exists
     os.makedirs(DB_DIR, exist_ok=True)
 
-    connection = sqlite3.connect(DB_PATH)
-    cursor = connection.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS persons (
-        person_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fn TEXT,
-        n TEXT,
-        nickname TEXT,
-        photo BLOB,
-        bday TEXT,
-        anniversary TEXT,
-        gender TEXT,
-        adr TEXT,
-        tel TEXT,
-        email TEXT,
-        impp TEXT,
-        lang TEXT,
-        tz TEXT,
-        geo TEXT,
-        note TEXT
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS groups (
-        group_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT,
-        logo BLOB,
-        org TEXT,
-        related TEXT,
-        url TEXT
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS role (
-        role_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        role TEXT,
-        member TEXT
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS is_in (
-        is_in_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        person_id INTEGER,
-        group_id INTEGER,
-        role_id INTEGER,
-        FOREIGN KEY(person_id) REFERENCES persons(person_id),
-        FOREIGN KEY(group_id) REFERENCES groups(group_id),
-        FOREIGN KEY(role_id) REFERENCES role(role_id),
-        UNIQUE(person_id, group_id)
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS other (
-        other_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        person_id INTEGER,
-        categories TEXT,
-        prodid TEXT,
-        rev TEXT,
-        sound TEXT,
-        uid TEXT,
-        clientpidmap TEXT,
-        version TEXT,
-        key TEXT,
-        fburl TEXT,
-        caladruri TEXT,
-        caluri TEXT,
-        FOREIGN KEY(person_id) REFERENCES persons(person_id)
-    )
-    """)
-
-    connection.commit()
-    connection.close()
+    migrations.migrate()
     print("Tables created successfully.")
 
 
@@ -93,83 +102,313 @@ def get_all_items_ids_and_names(category):
     """
     Fetch IDs and names from the database based on the category.
     Returns a dictionary where keys are IDs and values are names.
+
+    This holds the whole table in memory, prefer list_items_page() or iter_items().
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    if category.lower() not in TABLES:
+        print(f"Warning: Unknown category '{category.lower()}' in get_all_items_ids_and_names.")
+        return {}
 
-    category = category.lower() # Ensure category matches table names ('persons', 'groups')
+    return dict(iter_items(category, sort="id"))
 
-    if category == "persons":
-        cursor.execute("SELECT person_id, fn FROM persons")
-    elif category == "groups":
-        cursor.execute("SELECT group_id, title FROM groups")
+def list_items_page(category, sort="name", page_size=100, after=None, offset=0):
+    """
+    Fetch one page of (id, name) rows using keyset pagination.
+
+    Each page is a single index range scan that starts right after the last row of
+    the previous page, so every page costs the same however deep into the list it is.
+
+    Args:
+        category (str): "persons" or "groups".
+        sort (str): "name" to order by fn/title (then id), "id" to order by id.
+        page_size (int): Maximum number of rows in the page.
+        after: The key returned as next_after by the previous page, None for the first page.
+        offset (int): Rows to skip, to jump into the list without the key of the
+            previous page. The skipped index entries are still read, so continue
+            with after from there.
+
+    Returns:
+        tuple: (rows, next_after) where rows is a list of (id, name) tuples and
+        next_after is the key of the next page, None once the last page was returned.
+    """
+    category = category.lower() # Ensure category matches table names
+
+    if category not in TABLES:
+        print(f"Warning: Unknown category '{category}' in list_items_page.")
+        return [], None
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}'. Available: {', '.join(SORT_KEYS)}")
+
+    table_name, id_column, name_column = TABLES[category]
+    params = []
+    where = ""
+    if sort == "id":
+        order = id_column
+        if after is not None:
+            where = f"WHERE {id_column} > ?"
+            params.append(after)
     else:
-        print(f"Warning: Unknown category '{category}' in get_all_items_ids_and_names.")
-        conn.close()
-        return {}
+        order = f"{name_column}, {id_column}"
+        if after is not None:
+            after_name, after_id = after
+            if after_name is None:
+                # NULL names sort first and can't take part in a row value comparison
+                where = f"WHERE ({name_column} IS NULL AND {id_column} > ?) OR {name_column} IS NOT NULL"
+                params.append(after_id)
+            else:
+                where = f"WHERE ({name_column}, {id_column}) > (?, ?)"
+                params.extend((after_name, after_id))
+
+    with manager.connection() as conn:
+        rows = conn.execute(
+            f"SELECT {id_column}, {name_column} FROM {table_name} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [page_size, offset]
+        ).fetchall()
+
+    if len(rows) < page_size:
+        return rows, None
+    last_id, last_name = rows[-1]
+    return rows, (last_id if sort == "id" else (last_name, last_id))
+
+def count_items(category):
+    """Returns the number of persons or groups."""
+    category = category.lower()
+    if category not in TABLES:
+        print(f"Warning: Unknown category '{category}' in count_items.")
+        return 0
+    table_name = TABLES[category][0]
+    with manager.connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+def filter_items(category, text, mode="prefix", limit=100, count_limit=1000):
+    """
+    Returns the first persons or groups whose name matches what the user typed.
 
-    results = {}
-    for row in cursor.fetchall():
-        results[row[0]] = row[1]
+    "prefix" finds the names starting with text, ignoring the case of ASCII
+    letters, as one range scan of the NOCASE name index (migration 14). "words"
+    finds the names with a word starting with every word of text through the
+    full-text index, so "win" also finds "Lena Winter". Counting stops at
+    count_limit, so text matching half the table costs no more than a rare name.
 
-    conn.close()
-    return results
+    Args:
+        category (str): "persons" or "groups".
+        text (str): The filter text.
+        mode (str): "prefix" or "words".
+        limit (int): Maximum number of rows returned.
+        count_limit (int): Matches are only counted up to here.
+
+    Returns:
+        tuple: (rows, count) where rows is a list of (id, name) tuples in name
+        order and count the number of matches, at most count_limit. With "words"
+        the rows are the first matches in id order, sorted by name afterwards.
+    """
+    category = category.lower()
+    if category not in TABLES:
+        print(f"Warning: Unknown category '{category}' in filter_items.")
+        return [], 0
+    if mode not in FILTER_MODES:
+        raise ValueError(f"Unknown filter mode '{mode}'. Available: {', '.join(FILTER_MODES)}")
+
+    if mode == "words":
+        item_ids, count = search.match_names(text, category, limit, count_limit)
+        rows = list(get_item_names(category, item_ids).items())
+        rows.sort(key=lambda row: ((row[1] or "").casefold(), row[0]))
+        return rows, count
+
+    table_name, id_column, name_column = TABLES[category]
+    # Every name starting with text sorts between text and text followed by the highest code point
+    where = f"{name_column} >= ?1 COLLATE NOCASE AND {name_column} < ?2 COLLATE NOCASE"
+    params = (text, text + "\U0010ffff")
+    with manager.connection() as conn:
+        rows = conn.execute(
+            f"SELECT {id_column}, {name_column} FROM {table_name} WHERE {where} "
+            f"ORDER BY {name_column} COLLATE NOCASE, {id_column} LIMIT ?3",
+            params + (limit,)
+        ).fetchall()
+        count = len(rows)
+        if count == limit:
+            count = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {table_name} WHERE {where} LIMIT ?3)", params + (count_limit,)
+            ).fetchone()[0]
+    return rows, count
+
+def get_item_position(category, item_id, sort="name"):
+    """
+    Returns the index of an item in the order of list_items_page(), or None if
+    it does not exist. Counts the index entries before it, so it costs about as
+    much as a page at that offset.
+    """
+    category = category.lower()
+    if category not in TABLES:
+        print(f"Warning: Unknown category '{category}' in get_item_position.")
+        return None
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}'. Available: {', '.join(SORT_KEYS)}")
+
+    table_name, id_column, name_column = TABLES[category]
+    with manager.connection() as conn:
+        row = conn.execute(f"SELECT {name_column} FROM {table_name} WHERE {id_column} = ?", (item_id,)).fetchone()
+        if row is None:
+            return None
+        name = row[0]
+        if sort == "id":
+            where, params = f"{id_column} < ?", (item_id,)
+        elif name is None:
+            where, params = f"{name_column} IS NULL AND {id_column} < ?", (item_id,)
+        else:
+            # Three index range counts, an OR of them would be counted through a slower multi-index plan
+            return conn.execute(
+                f"SELECT (SELECT COUNT(*) FROM {table_name} WHERE {name_column} IS NULL)"
+                f" + (SELECT COUNT(*) FROM {table_name} WHERE {name_column} < ?1)"
+                f" + (SELECT COUNT(*) FROM {table_name} WHERE {name_column} = ?1 AND {id_column} < ?2)",
+                (name, item_id)
+            ).fetchone()[0]
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {where}", params).fetchone()[0]
+
+def iter_items(category, sort="name", page_size=500):
+    """
+    Yields every (id, name) row of a category page by page.
+
+    Only one page is held in memory at a time and no read transaction stays open
+    between pages, so this can walk millions of rows while writers keep going.
+    """
+    after = None
+    while True:
+        rows, after = list_items_page(category, sort=sort, page_size=page_size, after=after)
+        yield from rows
+        if after is None:
+            return
 
 def get_item_data(category, item_id):
     """
     Fetch a single item from the database based on category and item ID.
     Returns the item as a dictionary where keys are column names.
+    Served from item_cache when possible, callers get their own copy of the dict.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
     category = category.lower() # Ensure category matches table names
 
-    if category == "persons":
-        cursor.execute(f"SELECT * FROM persons WHERE person_id = ?", (item_id,))
-    elif category == "groups":
-        cursor.execute(f"SELECT * FROM groups WHERE group_id = ?", (item_id,))
-    else:
+    if category not in TABLES:
         print(f"Unknown category: {category} in get_item_data")
-        conn.close()
         return None
-    
-    result = cursor.fetchone()
 
-    if result:
-        column_names = [description[0] for description in cursor.description]
-        item_dict = dict(zip(column_names, result))
-        conn.close()
-        return item_dict
-    else:
-        conn.close()
+    table = get_table_schema(category)
+    item = _cached(("item", category, item_id), lambda: _load_item_data(category, table, item_id))
+    return dict(item) if item is not None else None
+
+def _load_item_data(category, table, item_id):
+    # Only the public columns, internal ones like intern_key stay in the database
+    _, id_column, _ = TABLES[category]
+    with manager.connection() as conn:
+        result = conn.execute(
+            f"SELECT {', '.join(table.column_names)} FROM {table.name} WHERE {id_column} = ?", (item_id,)
+        ).fetchone()
+
+        if result:
+            return dict(zip(table.column_names, result))
+        return None # Item not found
+
+def get_item_fields(category, item_id, columns=None):
+    """
+    Fetch selected columns of a single item.
+
+    Unlike get_item_data this never loads BLOB columns: they are returned as
+    blobs.BlobHandle objects (None if empty) that read the data only on demand.
+
+    Args:
+        category (str): The table name (e.g., "persons", "groups").
+        item_id (int): The ID of the item.
+        columns (iterable or None): Column names to return. None means all text columns.
+
+    Returns:
+        dict: column_name: value for the requested columns, or None if the item does not exist.
+    """
+    table = get_table_schema(category)
+    if table is None:
+        print(f"Unknown category: {category} in get_item_fields")
+        return None
+    category = category.lower()
+
+    record = _cached(("record", category, item_id), lambda: _load_record(category, table, item_id))
+    if record is None:
+        return None
+    if columns is None:
+        columns = table.text_columns
+    unknown = [column for column in columns if column not in record]
+    if unknown:
+        print(f"Unknown column(s) for {category}: {', '.join(unknown)}")
+    return {column: record[column] for column in columns if column in record}
+
+def get_item_name(category, item_id):
+    """Returns the fn of a person or the title of a group, or None if it does not exist."""
+    category = category.lower()
+    if category not in TABLES:
+        print(f"Unknown category: {category} in get_item_name")
+        return None
+    name_column = TABLES[category][2]
+    fields = get_item_fields(category, item_id, (name_column,))
+    return fields[name_column] if fields else None
+
+def get_item_names(category, item_ids):
+    """
+    Returns {id: name} of the given persons or groups in one query per 500 ids,
+    ids that do not exist are left out. Not cached.
+    """
+    category = category.lower()
+    if category not in TABLES:
+        print(f"Unknown category: {category} in get_item_names")
+        return {}
+    table_name, id_column, name_column = TABLES[category]
+    item_ids = list(item_ids)
+    names = {}
+    with manager.connection() as conn:
+        # Chunked to stay below SQLite's host parameter limit
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            names.update(conn.execute(
+                f"SELECT {id_column}, {name_column} FROM {table_name} "
+                f"WHERE {id_column} IN ({', '.join(['?'] * len(chunk))})", chunk
+            ))
+    return names
+
+def _load_record(category, table, item_id):
+    """Reads all text columns of an item and the lengths of its BLOB columns."""
+    _, id_column, _ = TABLES[category]
+    select = [f"length({column.name})" if column.is_blob else column.name for column in table.columns]
+    with manager.connection() as conn:
+        result = conn.execute(
+            f"SELECT {', '.join(select)} FROM {table.name} WHERE {id_column} = ?", (item_id,)
+        ).fetchone()
+    if result is None:
         return None # Item not found
 
+    record = {}
+    for column, value in zip(table.columns, result):
+        if column.is_blob:
+            value = BlobHandle(table.name, column.name, item_id, value) if value else None
+        record[column.name] = value
+    return record
+
 def get_attributes(category):
     """
     Fetch all attributes for a given category.
     Returns a list of tuples where each tuple contains the attribute name and its type.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    category = category.lower() # Ensure category matches table names
-
-    if category == "persons":
-        cursor.execute("PRAGMA table_info(persons)")
-    elif category == "groups":
-        cursor.execute("PRAGMA table_info(groups)")
-    else:
+    table = get_table_schema(category)
+    if table is None:
         print(f"Unknown category: {category} in get_attributes")
-        conn.close()
         return []
+    return [(column.name, column.type) for column in table.columns]
 
-    attributes = cursor.fetchall()
-    conn.close()
+def get_table_schema(category):
+    """
+    Returns the cached schema.Table (columns, types, BLOB flags and display names)
+    of a category, or None for an unknown category. No query is run once loaded.
+    """
+    category = category.lower() # Ensure category matches table names
 
-    # PRAGMA table_info returns: (cid, name, type, notnull, dflt_value, pk)
-    # We want (name, type)
-    return [(attr[1], attr[2]) for attr in attributes]
+    if category not in TABLES:
+        return None
+    return schema.get_table(TABLES[category][0])
 
 def save_item_data(category, item_id, data):
     """
@@ -180,81 +419,85 @@ def save_item_data(category, item_id, data):
         category (str): The table name (e.g., "persons", "groups").
         item_id (int or None): The ID of the item if editing, or None if adding a new item.
         data (dict): A dictionary of column_name: value pairs to save.
-    """
-    conn = None # Initialize connection to None for finally block
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
 
-        category = category.lower() # Ensure category matches table names
+    Raises:
+        sqlite3.Error: If the database rejected the change, e.g. because it is
+            locked. Nothing was saved then, the error has already been printed.
+    """
+    category = category.lower() # Ensure category matches table names
 
-        if category == "persons":
-            table_name = "persons"
-            id_column = "person_id"
-        elif category == "groups":
-            table_name = "groups"
-            id_column = "group_id"
-        else:
-            print(f"Error: Unknown category '{category}'. Data not saved.")
-            return
+    if category not in TABLES:
+        print(f"Error: Unknown category '{category}'. Data not saved.")
+        return
+    table_name, id_column, _ = TABLES[category]
 
-        # Prepare columns and values from the incoming data
-        # We need to filter out the primary key if it's passed in the data dict,
-        # because for INSERT it's AUTOINCREMENT, and for UPDATE it's used in the WHERE clause.
-        query_columns = []
-        query_values = []
-        for col, val in data.items():
-            if col != id_column: # Exclude the primary key column from the INSERT/UPDATE lists
-                query_columns.append(col)
-                query_values.append(val)
-
-        if item_id is None: # Add new item (INSERT operation)
-            # Ensure there's actual data to insert (excluding the auto-incremented ID)
-            if not query_columns:
-                print(f"No non-ID data provided for new {category[:-1]}. Skipping insert.")
-                return
-
-            placeholders = ', '.join(['?'] * len(query_columns))
-            cols_str = ', '.join(query_columns)
-            
-            sql = f"INSERT INTO {table_name} ({cols_str}) VALUES ({placeholders})"
-            print(f"Executing INSERT for {category}: SQL='{sql}' with values={query_values}")
-            cursor.execute(sql, tuple(query_values))
-            print(f"New {category[:-1]} added with ID: {cursor.lastrowid}")
-
-        else: # Edit existing item (UPDATE operation)
-            # Ensure there are fields to update
-            if not query_columns:
-                print(f"No data fields to update for {category[:-1]} ID {item_id}. Skipping update.")
-                return
-
-            set_clauses = [f"{col} = ?" for col in query_columns]
-            set_str = ', '.join(set_clauses)
-            
-            # Add the item_id to the end of the values list for the WHERE clause
-            update_values = query_values + [item_id]
-            sql = f"UPDATE {table_name} SET {set_str} WHERE {id_column} = ?"
-            print(f"Executing UPDATE for {category[:-1]} ID {item_id}: SQL='{sql}' with values={update_values}")
-            cursor.execute(sql, tuple(update_values))
-            
-            if cursor.rowcount == 0:
-                print(f"Warning: No {category[:-1]} found with ID {item_id} to update.")
-            else:
-                print(f"{category[:-1]} ID {item_id} updated successfully.")
+    try:
+        with manager.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Prepare columns and values from the incoming data
+            # We need to filter out the primary key if it's passed in the data dict,
+            # because for INSERT it's AUTOINCREMENT, and for UPDATE it's used in the WHERE clause.
+            query_columns = []
+            query_values = []
+            for col, val in data.items():
+                if col != id_column: # Exclude the primary key column from the INSERT/UPDATE lists
+                    query_columns.append(col)
+                    query_values.append(val)
+
+            if item_id is None: # Add new item (INSERT operation)
+                # Ensure there's actual data to insert (excluding the auto-incremented ID)
+                if not query_columns:
+                    print(f"No non-ID data provided for new {category[:-1]}. Skipping insert.")
+                    return
+
+                placeholders = ', '.join(['?'] * len(query_columns))
+                cols_str = ', '.join(query_columns)
+
+                sql = f"INSERT INTO {table_name} ({cols_str}) VALUES ({placeholders})"
+                print(f"Executing INSERT for {category}: SQL='{sql}' with values={query_values}")
+                cursor.execute(sql, tuple(query_values))
+                print(f"New {category[:-1]} added with ID: {cursor.lastrowid}")
+                new_id = cursor.lastrowid
+                if category == "persons":
+                    contact_points.sync_person_columns(conn, [(new_id, data)])
+
+            else: # Edit existing item (UPDATE operation)
+                # Ensure there are fields to update
+                if not query_columns:
+                    print(f"No data fields to update for {category[:-1]} ID {item_id}. Skipping update.")
+                    return
+
+                set_clauses = [f"{col} = ?" for col in query_columns]
+                set_str = ', '.join(set_clauses)
+
+                # Add the item_id to the end of the values list for the WHERE clause
+                update_values = query_values + [item_id]
+                sql = f"UPDATE {table_name} SET {set_str} WHERE {id_column} = ?"
+                print(f"Executing UPDATE for {category[:-1]} ID {item_id}: SQL='{sql}' with values={update_values}")
+                cursor.execute(sql, tuple(update_values))
+
+                if cursor.rowcount == 0:
+                    print(f"Warning: No {category[:-1]} found with ID {item_id} to update.")
+                else:
+                    print(f"{category[:-1]} ID {item_id} updated successfully.")
+                    if category == "persons":
+                        contact_points.sync_person_columns(conn, [(item_id, data)])
 
-        conn.commit()
         print(f"Data for {category[:-1]} {'added' if item_id is None else 'updated'} successfully in DB.")
+        if item_id is not None:
+            _invalidate_items(category, [item_id])
+            changes.notify(category, updated=[item_id])
+        else:
+            changes.notify(category, inserted=[new_id])
 
     except sqlite3.Error as e:
+        # The transaction has already been rolled back by the connection manager
         print(f"Database error during save_item_data: {e}")
-        if conn:
-            conn.rollback() # Rollback changes in case of error
+        raise
     except Exception as e:
         print(f"An unexpected error occurred during save_item_data: {e}")
-    finally:
-        if conn:
-            conn.close()
-            print("Database connection closed.")
+        raise
 
 def delete_item(category, item_id):
     """
@@ -263,106 +506,359 @@ def delete_item(category, item_id):
     Args:
         category (str): The table name (e.g., "persons", "groups").
         item_id (int): The ID of the item to delete.
+
+    Returns:
+        bool: True if the item was deleted, False if it did not exist.
+
+    Raises:
+        sqlite3.Error: If the database rejected the delete, e.g. because it is
+            locked. Nothing was deleted then, the error has already been printed.
     """
-    conn = None # Initialize connection to None for finally block
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+    category = category.lower() # Ensure category matches table names
 
-        category = category.lower() # Ensure category matches table names
+    if category not in TABLES:
+        print(f"Error: Unknown category '{category}'. Item not deleted.")
+        return False
+    table_name, id_column, _ = TABLES[category]
 
-        if category == "persons":
-            table_name = "persons"
-            id_column = "person_id"
-        elif category == "groups":
-            table_name = "groups"
-            id_column = "group_id"
-        else:
-            print(f"Error: Unknown category '{category}'. Item not deleted.")
-            return
+    try:
+        with manager.transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM {table_name} WHERE {id_column} = ?", (item_id,))
 
-        sql = f"DELETE FROM {table_name} WHERE {id_column} = ?"
-        cursor.execute(sql, (item_id,))
-        
-        if cursor.rowcount == 0:
-            print(f"Warning: No {category[:-1]} found with ID {item_id} to delete.")
-        else:
-            print(f"{category[:-1]} ID {item_id} deleted successfully.")
+            deleted = cursor.rowcount
+            if deleted == 0:
+                print(f"Warning: No {category[:-1]} found with ID {item_id} to delete.")
+            else:
+                print(f"{category[:-1]} ID {item_id} deleted successfully.")
 
-        conn.commit()
+        _invalidate_items(category, [item_id])
+        if deleted:
+            changes.notify(category, deleted=[item_id])
+        return deleted > 0
 
     except sqlite3.Error as e:
+        # The transaction has already been rolled back by the connection manager
         print(f"Database error during delete_item: {e}")
-        if conn:
-            conn.rollback() # Rollback changes in case of error
+        raise
     except Exception as e:
         print(f"An unexpected error occurred during delete_item: {e}")
-    finally:
-        if conn:
-            conn.close()
-            print("Database connection closed.")
+        raise
+
+def save_items_batch(category, rows):
+    """
+    Saves many items of one category in a single transaction.
+
+    Rows are grouped by their set of columns and every group is written with one
+    executemany. Rows that contain the id column update that item, all others are
+    inserted. If a group fails it is retried row by row, so a bad row is reported
+    in `failures` instead of aborting the whole batch.
+
+    Args:
+        category (str): The table name (e.g., "persons", "groups").
+        rows (list): Dictionaries of column_name: value pairs, like save_item_data's data.
+
+    Returns:
+        tuple: (ids, failures) where ids[i] is the id of rows[i] (None if it failed)
+        and failures is a list of (row index, error message) tuples.
+    """
+    category = category.lower() # Ensure category matches table names
+
+    if category not in TABLES:
+        print(f"Error: Unknown category '{category}'. Data not saved.")
+        return [None] * len(rows), [(index, f"Unknown category '{category}'") for index in range(len(rows))]
+    table_name, id_column, _ = TABLES[category]
+    known_columns = set(get_table_schema(category).column_names)
+
+    ids = [None] * len(rows)
+    failures = []
+
+    # (is update, columns) -> [(row index, parameter tuple)]
+    statements = {}
+    for index, row in enumerate(rows):
+        columns = tuple(sorted(col for col in row if col != id_column))
+        unknown = [col for col in columns if col not in known_columns]
+        if unknown:
+            failures.append((index, f"Unknown column(s) for {category}: {', '.join(unknown)}"))
+            continue
+        if not columns:
+            failures.append((index, "No data fields to save"))
+            continue
+        values = tuple(row[col] for col in columns)
+        item_id = row.get(id_column)
+        if item_id is None:
+            statements.setdefault((False, columns), []).append((index, values))
+        else:
+            statements.setdefault((True, columns), []).append((index, values + (item_id,)))
+
+    try:
+        with manager.transaction() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for (is_update, columns), entries in statements.items():
+                if is_update:
+                    sql = f"UPDATE {table_name} SET {', '.join(f'{col} = ?' for col in columns)} WHERE {id_column} = ?"
+                else:
+                    sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+
+                conn.execute("SAVEPOINT save_items_batch")
+                try:
+                    if is_update:
+                        cursor = conn.executemany(sql, [values for _, values in entries])
+                        _record_updated_ids(conn, table_name, id_column, entries, cursor.rowcount, ids, failures)
+                    else:
+                        # Index the new rows in one statement instead of one trigger call per row
+                        with search.insert_triggers_suspended(conn):
+                            conn.executemany(sql, [values for _, values in entries])
+                            # AUTOINCREMENT ids of one statement in one write transaction are consecutive
+                            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                            first_id = last_id - len(entries) + 1
+                            search.index_id_range(conn, category, first_id, last_id)
+                        for offset, (index, _) in enumerate(entries):
+                            ids[index] = first_id + offset
+                    conn.execute("RELEASE save_items_batch")
+                except sqlite3.Error:
+                    conn.execute("ROLLBACK TO save_items_batch")
+                    conn.execute("RELEASE save_items_batch")
+                    _save_rows_one_by_one(conn, sql, is_update, entries, ids, failures)
+
+            if category == "persons":
+                contact_points.sync_person_columns(conn, [
+                    (ids[index], rows[index]) for entries in statements.values()
+                    for index, _ in entries if ids[index] is not None
+                ])
+
+    except sqlite3.Error as e:
+        # The transaction has already been rolled back by the connection manager
+        print(f"Database error during save_items_batch: {e}")
+        return [None] * len(rows), [(index, str(e)) for index in range(len(rows))]
+
+    failures.sort()
+    print(f"Saved {len(rows) - len(failures)} of {len(rows)} {category} in one batch.")
+    saved = {False: [], True: []} # is update -> ids
+    for (is_update, _), entries in statements.items():
+        saved[is_update] += [ids[index] for index, _ in entries if ids[index] is not None]
+    _invalidate_items(category, saved[True])
+    changes.notify(category, inserted=saved[False], updated=saved[True])
+    return ids, failures
+
+def _record_updated_ids(conn, table_name, id_column, entries, rowcount, ids, failures):
+    """Fills in ids for a batch of UPDATEs, reporting the ones whose item does not exist."""
+    missing = set()
+    if rowcount != len(entries):
+        update_ids = [values[-1] for _, values in entries]
+        placeholders = ', '.join(['?'] * len(update_ids))
+        existing = {row[0] for row in conn.execute(
+            f"SELECT {id_column} FROM {table_name} WHERE {id_column} IN ({placeholders})", update_ids
+        )}
+        missing = set(update_ids) - existing
+    for index, values in entries:
+        if values[-1] in missing:
+            failures.append((index, f"No item found with ID {values[-1]}"))
+        else:
+            ids[index] = values[-1]
+
+def _save_rows_one_by_one(conn, sql, is_update, entries, ids, failures):
+    """Fallback for a failed executemany: runs every row under its own savepoint."""
+    for index, values in entries:
+        conn.execute("SAVEPOINT save_items_row")
+        try:
+            cursor = conn.execute(sql, values)
+            if is_update and cursor.rowcount == 0:
+                failures.append((index, f"No item found with ID {values[-1]}"))
+            else:
+                ids[index] = values[-1] if is_update else cursor.lastrowid
+            conn.execute("RELEASE save_items_row")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO save_items_row")
+            conn.execute("RELEASE save_items_row")
+            failures.append((index, str(e)))
+
+def delete_items_batch(category, item_ids):
+    """
+    Deletes many items of one category in a single transaction.
+
+    Args:
+        category (str): The table name (e.g., "persons", "groups").
+        item_ids (iterable): IDs of the items to delete.
+
+    Returns:
+        int: The number of items that were actually deleted.
+    """
+    category = category.lower() # Ensure category matches table names
+
+    if category not in TABLES:
+        print(f"Error: Unknown category '{category}'. Items not deleted.")
+        return 0
+    table_name, id_column, _ = TABLES[category]
+    item_ids = list(item_ids)
+
+    try:
+        with manager.transaction() as conn:
+            # Only the ids that exist are reported as deleted
+            existing = set()
+            for start in range(0, len(item_ids), 500):
+                chunk = item_ids[start:start + 500]
+                existing.update(item_id for item_id, in conn.execute(
+                    f"SELECT {id_column} FROM {table_name} "
+                    f"WHERE {id_column} IN ({', '.join(['?'] * len(chunk))})", chunk
+                ))
+            deleted_ids = [item_id for item_id in dict.fromkeys(item_ids) if item_id in existing]
+            conn.executemany(f"DELETE FROM {table_name} WHERE {id_column} = ?",
+                             [(item_id,) for item_id in deleted_ids])
+    except sqlite3.Error as e:
+        # The transaction has already been rolled back by the connection manager
+        print(f"Database error during delete_items_batch: {e}")
+        return 0
+
+    print(f"Deleted {len(deleted_ids)} {category} in one batch.")
+    _invalidate_items(category, deleted_ids)
+    if deleted_ids:
+        changes.notify(category, deleted=deleted_ids)
+    return len(deleted_ids)
 
 def clear_tables():
-    """Clear all data from the persons and groups tables."""
-    connection = sqlite3.connect(DB_PATH)
-    cursor = connection.cursor()
-
-    cursor.execute("DELETE FROM persons")
-    cursor.execute("DELETE FROM groups")
-    cursor.execute("DELETE FROM role")
-    cursor.execute("DELETE FROM is_in")
-    cursor.execute("DELETE FROM other")
-
-    connection.commit()
-    connection.close()
+    """
+    Clear all data from the persons and groups tables, and the import checkpoints,
+    so that the files imported before are imported again.
+    """
+    with manager.transaction() as connection:
+        cursor = connection.cursor()
+
+        cursor.execute("DELETE FROM persons")
+        cursor.execute("DELETE FROM groups")
+        cursor.execute("DELETE FROM role")
+        cursor.execute("DELETE FROM is_in")
+        cursor.execute("DELETE FROM other")
+        cursor.execute("DELETE FROM import_checkpoints")
+
+    item_cache.clear()
+    for category in TABLES:
+        changes.notify(category, reset=True)
     print("Tables cleared successfully.")
 
 
 
 def assign_person_to_group(person_id, group_id):
     """Assign a person to a group, avoiding duplicates."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Check if the connection already exists
-    cursor.execute("SELECT 1 FROM is_in WHERE person_id=? AND group_id=?", (person_id, group_id))
-    if cursor.fetchone() is None:
-        cursor.execute("INSERT INTO is_in (person_id, group_id) VALUES (?, ?)", (person_id, group_id))
-        conn.commit()
-    conn.close()
+    with manager.transaction() as conn:
+        cursor = conn.cursor()
+        # Check if the connection already exists
+        cursor.execute("SELECT 1 FROM is_in WHERE person_id=? AND group_id=?", (person_id, group_id))
+        if cursor.fetchone() is None:
+            cursor.execute("INSERT INTO is_in (person_id, group_id) VALUES (?, ?)", (person_id, group_id))
+    _invalidate_memberships([(person_id, group_id)])
 
 def remove_person_from_group(person_id, group_id):
     """Remove a person from a group if the connection exists."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM is_in WHERE person_id=? AND group_id=?", (person_id, group_id))
-    conn.commit()
-    conn.close()
+    with manager.transaction() as conn:
+        conn.execute("DELETE FROM is_in WHERE person_id=? AND group_id=?", (person_id, group_id))
+    _invalidate_memberships([(person_id, group_id)])
+
+def sync_memberships(category, item_id, desired_ids):
+    """
+    Makes the memberships of one person or group match desired_ids exactly.
+
+    The current memberships are read and only the difference is written, all in
+    one transaction, so saving an unchanged assignment list writes nothing.
+
+    Args:
+        category (str): "persons" to sync the groups of person item_id,
+            "groups" to sync the members of group item_id.
+        item_id (int): The ID of the person or group.
+        desired_ids (iterable): Group IDs (for a person) or person IDs (for a group)
+            that item_id should be linked to afterwards.
+
+    Returns:
+        tuple: (added, removed) lists of the IDs whose membership changed.
+    """
+    category = category.lower() # Ensure category matches table names
+
+    if category == "persons":
+        own_column, other_column = "person_id", "group_id"
+    elif category == "groups":
+        own_column, other_column = "group_id", "person_id"
+    else:
+        print(f"Error: Unknown category '{category}'. Memberships not saved.")
+        return [], []
+
+    desired = set(desired_ids)
+    with manager.transaction() as conn:
+        # Take the write lock before reading so the diff can't go stale
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        current = {row[0] for row in conn.execute(
+            f"SELECT {other_column} FROM is_in WHERE {own_column} = ?", (item_id,)
+        )}
+        added = sorted(desired - current)
+        removed = sorted(current - desired)
+        conn.executemany(f"INSERT INTO is_in ({own_column}, {other_column}) VALUES (?, ?)",
+                         [(item_id, other_id) for other_id in added])
+        conn.executemany(f"DELETE FROM is_in WHERE {own_column} = ? AND {other_column} = ?",
+                         [(item_id, other_id) for other_id in removed])
+
+    changed = added + removed
+    if category == "persons":
+        _invalidate_memberships((item_id, group_id) for group_id in changed)
+    else:
+        _invalidate_memberships((person_id, item_id) for person_id in changed)
+    return added, removed
 
 def get_groups_for_person(person_id):
     """Return a list of (group_id, title) for all groups this person is in."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT g.group_id, g.title FROM groups g
-        JOIN is_in i ON g.group_id = i.group_id
-        WHERE i.person_id = ?
-    """, (person_id,))
-    result = cursor.fetchall()
-    conn.close()
-    return result
+    def load():
+        with manager.connection() as conn:
+            return conn.execute("""
+                SELECT g.group_id, g.title FROM groups g
+                JOIN is_in i ON g.group_id = i.group_id
+                WHERE i.person_id = ?
+            """, (person_id,)).fetchall()
+    return list(_cached(("groups_for_person", person_id), load))
 
 def get_persons_for_group(group_id):
     """Return a list of (person_id, fn) for all persons in this group."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT p.person_id, p.fn FROM persons p
-        JOIN is_in i ON p.person_id = i.person_id
-        WHERE i.group_id = ?
-    """, (group_id,))
-    result = cursor.fetchall()
-    conn.close()
-    return result
+    def load():
+        with manager.connection() as conn:
+            return conn.execute("""
+                SELECT p.person_id, p.fn FROM persons p
+                JOIN is_in i ON p.person_id = i.person_id
+                WHERE i.group_id = ?
+            """, (group_id,)).fetchall()
+    return list(_cached(("persons_for_group", group_id), load))
+
+def find_persons_by_contact(kind, value):
+    """
+    Exact reverse lookup of a phone number, email address or other contact point,
+    through the (kind, normalized) index. "+49 30 1234567", "0049-30-1234567"
+    and "tel:+49301234567" all find the same person, secondary numbers included.
+
+    Args:
+        kind (str): One of contact_points.CONTACT_KINDS ("tel", "email", "adr", "impp", "lang").
+        value (str): The value as the user typed it.
+
+    Returns:
+        list: The ids of the matching persons, in ascending order.
+    """
+    kind = kind.lower()
+    if kind not in contact_points.CONTACT_KINDS:
+        print(f"Error: Unknown contact kind '{kind}'.")
+        return []
+    normalized = contact_points.normalize(kind, value)
+    if normalized is None:
+        return []
+    with manager.connection() as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT person_id FROM contact_points WHERE kind = ? AND normalized = ? ORDER BY person_id",
+            (kind, normalized)
+        )]
+
+def get_contact_points(person_id):
+    """Return a list of (kind, type, raw value) for all contact points of a person."""
+    with manager.connection() as conn:
+        return conn.execute("""
+            SELECT kind, type, raw FROM contact_points
+            WHERE person_id = ?
+            ORDER BY kind, position
+        """, (person_id,)).fetchall()
 
 
 def generate_test_data():
@@ -396,9 +892,6 @@ class Tests:
     def insert_person_data(self, fake_data):
         """Inserts a single randomly generated person into the persons table."""
         import random
-        connection = sqlite3.connect(DB_PATH)
-        cursor = connection.cursor()
-
         fn = fake_data.name()
         n = fake_data.last_name() + ";" + fake_data.first_name() + ";;"
         nickname = fake_data.first_name()
@@ -417,19 +910,17 @@ class Tests:
         # photo BLOB is not generated for simplicity, it would require converting an image to bytes
         # For now, it will be NULL
 
-        cursor.execute("""
-        INSERT INTO persons (fn, n, nickname, bday, anniversary, gender, adr, tel, email, impp, lang, tz, geo, note)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (fn, n, nickname, bday, anniversary, gender, adr, tel, email, impp, lang, tz, geo, note))
-
-        connection.commit()
-        connection.close()
+        with manager.transaction() as connection:
+            cursor = connection.execute("""
+            INSERT INTO persons (fn, n, nickname, bday, anniversary, gender, adr, tel, email, impp, lang, tz, geo, note)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (fn, n, nickname, bday, anniversary, gender, adr, tel, email, impp, lang, tz, geo, note))
+            contact_points.sync_person_columns(connection, [
+                (cursor.lastrowid, {"adr": adr, "tel": tel, "email": email, "impp": impp, "lang": lang})
+            ])
 
     def insert_group_data(self, fake_data):
         """Inserts a single randomly generated group into the groups table."""
-        connection = sqlite3.connect(DB_PATH)
-        cursor = connection.cursor()
-
         title = fake_data.catch_phrase() + " Group"
         org = fake_data.company()
         related = fake_data.word()
@@ -438,13 +929,11 @@ class Tests:
         # logo BLOB is not generated for simplicity
         # For now, it will be NULL
 
-        cursor.execute("""
-        INSERT INTO groups (title, org, related, url)
-        VALUES (?, ?, ?, ?)
-        """, (title, org, related, url))
-
-        connection.commit()
-        connection.close()
+        with manager.transaction() as connection:
+            connection.execute("""
+            INSERT INTO groups (title, org, related, url)
+            VALUES (?, ?, ?, ?)
+            """, (title, org, related, url))
 
     def generate_data(self, num_persons=10, num_groups=5):
         """
@@ -454,15 +943,20 @@ class Tests:
             num_groups (int): Number of random groups to generate.
         """
         self.faker = self.Faker()
-        print(f"Generating and inserting {num_persons} random persons...")
-        for _ in range(num_persons):
-            self.insert_person_data(self.faker)
-        print(f"{num_persons} persons inserted.")
-
-        print(f"Generating and inserting {num_groups} random groups...")
-        for _ in range(num_groups):
-            self.insert_group_data(self.faker)
-        print(f"{num_groups} groups inserted.")
+        # One transaction under the bulk-load pragmas, the per-row transactions
+        # of insert_person_data/insert_group_data join it.
+        with manager.use_profile("bulk-load"), manager.transaction():
+            print(f"Generating and inserting {num_persons} random persons...")
+            for _ in range(num_persons):
+                self.insert_person_data(self.faker)
+            print(f"{num_persons} persons inserted.")
+
+            print(f"Generating and inserting {num_groups} random groups...")
+            for _ in range(num_groups):
+                self.insert_group_data(self.faker)
+            print(f"{num_groups} groups inserted.")
+        for category in TABLES:
+            changes.notify(category, reset=True)
         print("Data generation complete!")
 
 
@@ -0,0 +1,172 @@
+import unicodedata
+
+# Groups and roles written by the import are shared: every card with the same
+# (title, org, related, url) links to one groups row and every card with the same
+# (role, member) to one role row. Rows are found by their intern_key column, which
+# has a partial unique index, so only rows that take part in interning need one.
+# Editing a group in the GUI clears its key (see migration 12), so imports never
+# add members to a group the user has renamed.
+
+GROUP_KEY_COLUMNS = ('title', 'org', 'related', 'url')
+ROLE_KEY_COLUMNS = ('role', 'member')
+
+_SEPARATOR = '\x1f'
+
+
+def _normalize(value):
+    if value is None:
+        return ''
+    return ' '.join(unicodedata.normalize('NFC', str(value)).split()).casefold()
+
+def intern_key(values):
+    """Key of a group or role given the values of its *_KEY_COLUMNS, case and whitespace normalized."""
+    return _SEPARATOR.join(_normalize(value) for value in values)
+
+def group_key(group_row):
+    """intern_key() of a (title, logo, org, related, url) row, None if it has a logo (never interned)."""
+    title, logo, org, related, url = group_row
+    if logo is not None:
+        return None
+    return intern_key((title, org, related, url))
+
+def role_key(role_row):
+    """intern_key() of a (role, member) row."""
+    return intern_key(role_row)
+
+
+class Interner:
+    """
+    The intern keys of one database in memory, so a group or role that was
+    seen before costs a dictionary lookup instead of a query or a new row.
+
+    Create one per import run: it is primed from the database when created and
+    only knows about rows added through it afterwards.
+    """
+    def __init__(self, conn):
+        self.group_ids = dict(conn.execute("SELECT intern_key, group_id FROM groups WHERE intern_key IS NOT NULL"))
+        self.role_ids = dict(conn.execute("SELECT intern_key, role_id FROM role WHERE intern_key IS NOT NULL"))
+
+    def forget_groups(self, group_ids):
+        """Drops deleted groups, so they are not handed out again."""
+        self._forget(self.group_ids, group_ids)
+
+    def forget_roles(self, role_ids):
+        """Drops deleted roles, so they are not handed out again."""
+        self._forget(self.role_ids, role_ids)
+
+    @staticmethod
+    def _forget(ids_by_key, deleted_ids):
+        deleted_ids = set(deleted_ids)
+        if deleted_ids:
+            for key in [key for key, row_id in ids_by_key.items() if row_id in deleted_ids]:
+                del ids_by_key[key]
+
+    def intern(self, conn, table_name, columns, rows, key_function):
+        """
+        Returns the ids of rows, inserting the ones not known yet with one
+        executemany. Rows without a key (and rows that are None) are inserted as
+        they are, or get None.
+
+        Args:
+            conn: Connection inside a write transaction.
+            table_name (str): "groups" or "role".
+            columns (tuple): Column names of the row tuples.
+            rows (list): Row tuples or None, in card order.
+            key_function: group_key or role_key.
+
+        Returns:
+            tuple: (ids in the order of rows, list of the ids of inserted rows)
+        """
+        ids_by_key = self.group_ids if table_name == 'groups' else self.role_ids
+        keys = [key_function(row) if row else None for row in rows]
+
+        # Rows to insert: each unknown key once, plus every row that is not interned
+        new_rows = []
+        new_keys = {}
+        for row, key in zip(rows, keys):
+            if not row:
+                continue
+            if key is None:
+                new_rows.append(row + (None,))
+            elif key not in ids_by_key and key not in new_keys:
+                new_keys[key] = len(new_rows)
+                new_rows.append(row + (key,))
+
+        inserted = []
+        if new_rows:
+            conn.executemany(
+                f"INSERT INTO {table_name} ({', '.join(columns)}, intern_key) "
+                f"VALUES ({', '.join(['?'] * (len(columns) + 1))})", new_rows
+            )
+            # AUTOINCREMENT ids of one statement in one write transaction are consecutive
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            inserted = list(range(last_id - len(new_rows) + 1, last_id + 1))
+            for key, index in new_keys.items():
+                ids_by_key[key] = inserted[index]
+
+        ids = []
+        uninterned = iter(row_id for row_id, row in zip(inserted, new_rows) if row[-1] is None)
+        for row, key in zip(rows, keys):
+            if not row:
+                ids.append(None)
+            elif key is None:
+                ids.append(next(uninterned))
+            else:
+                ids.append(ids_by_key[key])
+        return ids, inserted
+
+
+# Groups only the import can have written: every card gets a role, so all their
+# is_in rows have one, while memberships added in the GUI have none. A group
+# created in the GUI, or an imported one the user added someone to, is the user's.
+_IMPORTED_GROUPS = """
+    logo IS NULL
+    AND EXISTS (SELECT 1 FROM is_in WHERE is_in.group_id = groups.group_id AND is_in.role_id IS NOT NULL)
+    AND NOT EXISTS (SELECT 1 FROM is_in WHERE is_in.group_id = groups.group_id AND is_in.role_id IS NULL)
+"""
+
+
+def backfill(cursor):
+    """
+    Migration step: merges groups and roles the import created as exact copies
+    of each other and gives the remaining ones their intern key. Every other
+    group (see _IMPORTED_GROUPS) is left as it is and without a key, so imports
+    never add members to it.
+    """
+    conn = cursor.connection
+    _merge_duplicates(cursor, 'groups', 'group_id', GROUP_KEY_COLUMNS, _IMPORTED_GROUPS)
+    _merge_duplicates(cursor, 'role', 'role_id', ROLE_KEY_COLUMNS, "1")
+
+    for table_name, id_column, key_columns, where in (
+        ('groups', 'group_id', GROUP_KEY_COLUMNS, _IMPORTED_GROUPS),
+        ('role', 'role_id', ROLE_KEY_COLUMNS, "1"),
+    ):
+        # Of rows that only differ in case or spacing the oldest gets the key
+        keys = {}
+        for row_id, *values in conn.execute(
+            f"SELECT {id_column}, {', '.join(key_columns)} FROM {table_name} WHERE {where} ORDER BY {id_column}"
+        ):
+            keys.setdefault(intern_key(values), row_id)
+        cursor.executemany(
+            f"UPDATE {table_name} SET intern_key = ? WHERE {id_column} = ?", list(keys.items())
+        )
+
+def _merge_duplicates(cursor, table_name, id_column, key_columns, where):
+    # Every row that equals an older one in all key columns is replaced by it
+    cursor.execute("DROP TABLE IF EXISTS temp.merged_ids")
+    cursor.execute("CREATE TEMP TABLE merged_ids (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+    cursor.execute(f"""
+        INSERT INTO temp.merged_ids (old_id, new_id)
+        SELECT {id_column}, keeper FROM (
+            SELECT {id_column}, MIN({id_column}) OVER (PARTITION BY {', '.join(key_columns)}) AS keeper
+            FROM {table_name} WHERE {where}
+        ) WHERE {id_column} != keeper
+    """)
+    # A person linked to two copies keeps one membership (UNIQUE(person_id, group_id))
+    cursor.execute(f"""
+        UPDATE OR IGNORE is_in SET {id_column} = (SELECT new_id FROM temp.merged_ids WHERE old_id = is_in.{id_column})
+        WHERE {id_column} IN (SELECT old_id FROM temp.merged_ids)
+    """)
+    cursor.execute(f"DELETE FROM is_in WHERE {id_column} IN (SELECT old_id FROM temp.merged_ids)")
+    cursor.execute(f"DELETE FROM {table_name} WHERE {id_column} IN (SELECT old_id FROM temp.merged_ids)")
+    cursor.execute("DROP TABLE temp.merged_ids")
@@ -0,0 +1,267 @@
+import sqlite3
+
+from dbms import contact_points, interning, schema, search
+from dbms.connection import manager
+
+# Numbered schema migrations: (version, description, steps). They are applied in
+# order and PRAGMA user_version records the last one applied, so every database
+# only ever runs the migrations it has not seen yet. A step is either an SQL
+# statement or a callable that receives the cursor. Never edit a migration that
+# has been released, add a new one instead.
+MIGRATIONS = [
+    (1, "Create base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS persons (
+            person_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fn TEXT,
+            n TEXT,
+            nickname TEXT,
+            photo BLOB,
+            bday TEXT,
+            anniversary TEXT,
+            gender TEXT,
+            adr TEXT,
+            tel TEXT,
+            email TEXT,
+            impp TEXT,
+            lang TEXT,
+            tz TEXT,
+            geo TEXT,
+            note TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS groups (
+            group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            logo BLOB,
+            org TEXT,
+            related TEXT,
+            url TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS role (
+            role_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role TEXT,
+            member TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS is_in (
+            is_in_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id INTEGER,
+            group_id INTEGER,
+            role_id INTEGER,
+            FOREIGN KEY(person_id) REFERENCES persons(person_id),
+            FOREIGN KEY(group_id) REFERENCES groups(group_id),
+            FOREIGN KEY(role_id) REFERENCES role(role_id),
+            UNIQUE(person_id, group_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS other (
+            other_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id INTEGER,
+            categories TEXT,
+            prodid TEXT,
+            rev TEXT,
+            sound TEXT,
+            uid TEXT,
+            clientpidmap TEXT,
+            version TEXT,
+            key TEXT,
+            fburl TEXT,
+            caladruri TEXT,
+            caluri TEXT,
+            FOREIGN KEY(person_id) REFERENCES persons(person_id)
+        )
+        """,
+    ]),
+    # UNIQUE(person_id, group_id) only helps lookups by person
+    (2, "Index is_in by group", [
+        "CREATE INDEX IF NOT EXISTS idx_is_in_group_person ON is_in(group_id, person_id)",
+    ]),
+    (3, "Index other by person", [
+        "CREATE INDEX IF NOT EXISTS idx_other_person ON other(person_id)",
+    ]),
+    (4, "Index persons by name", [
+        "CREATE INDEX IF NOT EXISTS idx_persons_fn ON persons(fn)",
+    ]),
+    (5, "Create full-text search index", [
+        search.create_search_index,
+    ]),
+    # Keyset pagination of the groups list by title
+    (6, "Index groups by title", [
+        "CREATE INDEX IF NOT EXISTS idx_groups_title ON groups(title)",
+    ]),
+    # Lets batch writers index their rows in one statement instead of per row
+    (7, "Add switch for the search index insert triggers", [
+        search.create_insert_sync_switch,
+    ]),
+    # Bulk imports write one `other` row per card, each one updated the index on its own
+    (8, "Switch the search index categories trigger off during bulk inserts", [
+        search.gate_other_insert_trigger,
+    ]),
+    # Re-imports recognize cards by UID or content hash, see vcard_import.upsert_card_rows()
+    (9, "Add import keys for idempotent re-imports", [
+        """
+        CREATE TABLE IF NOT EXISTS import_keys (
+            key TEXT PRIMARY KEY,
+            person_id INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            FOREIGN KEY(person_id) REFERENCES persons(person_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_import_keys_person ON import_keys(person_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS import_keys_person_delete AFTER DELETE ON persons BEGIN
+            DELETE FROM import_keys WHERE person_id = old.person_id;
+        END
+        """,
+        # Persons imported earlier are matched by UID, the empty hash makes their
+        # next import count as an update. Of duplicates the oldest person wins.
+        """
+        INSERT OR IGNORE INTO import_keys (key, person_id, content_hash)
+        SELECT 'uid:' || trim(uid), person_id, '' FROM other
+        WHERE uid IS NOT NULL AND uid != 'None' AND trim(uid) != ''
+        ORDER BY person_id
+        """,
+    ]),
+    # Progress of vcard_import.import_paths(), so an interrupted run can resume
+    (10, "Add checkpoints for resumable imports", [
+        """
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL DEFAULT 0,
+            cards_committed INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ]),
+    # Every TEL, EMAIL, ADR, IMPP and LANG of a card, persons only keeps the first
+    (11, "Add normalized contact points", [
+        """
+        CREATE TABLE IF NOT EXISTS contact_points (
+            contact_point_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            type TEXT,
+            raw TEXT NOT NULL,
+            normalized TEXT,
+            FOREIGN KEY(person_id) REFERENCES persons(person_id)
+        )
+        """,
+        # person_id lets lookups return distinct persons straight from the index
+        "CREATE INDEX IF NOT EXISTS idx_contact_points_lookup ON contact_points(kind, normalized, person_id)",
+        "CREATE INDEX IF NOT EXISTS idx_contact_points_person ON contact_points(person_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS contact_points_person_delete AFTER DELETE ON persons BEGIN
+            DELETE FROM contact_points WHERE person_id = old.person_id;
+        END
+        """,
+        contact_points.backfill,
+    ]),
+    # Imports link every card with the same organization or role to one shared row
+    (12, "Intern imported groups and roles", [
+        "ALTER TABLE groups ADD COLUMN intern_key TEXT",
+        "ALTER TABLE role ADD COLUMN intern_key TEXT",
+        interning.backfill,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_groups_intern_key ON groups(intern_key) WHERE intern_key IS NOT NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_role_intern_key ON role(intern_key) WHERE intern_key IS NOT NULL",
+        # Shared roles are only deleted once unused, which is looked up by role
+        "CREATE INDEX IF NOT EXISTS idx_is_in_role ON is_in(role_id)",
+        # A group edited in the GUI is the user's now, later imports get a new one
+        """
+        CREATE TRIGGER IF NOT EXISTS groups_intern_key_reset AFTER UPDATE OF title, logo, org, related, url ON groups
+        WHEN old.intern_key IS NOT NULL AND new.intern_key IS old.intern_key BEGIN
+            UPDATE groups SET intern_key = NULL WHERE group_id = new.group_id;
+        END
+        """,
+    ]),
+    # Byte ranges of the cards in the .vcf files browsed under "Files", see vcf_files.py
+    (13, "Add index of browsed vCard files", [
+        """
+        CREATE TABLE IF NOT EXISTS vcf_files (
+            file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            card_count INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS vcf_cards (
+            file_id INTEGER NOT NULL,
+            card_index INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            byte_length INTEGER NOT NULL,
+            fn TEXT,
+            PRIMARY KEY (file_id, card_index),
+            FOREIGN KEY(file_id) REFERENCES vcf_files(file_id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    # Case-insensitive prefix ranges for the filter box, see dbms.filter_items()
+    (14, "Index names case-insensitively", [
+        "CREATE INDEX IF NOT EXISTS idx_persons_fn_nocase ON persons(fn COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_groups_title_nocase ON groups(title COLLATE NOCASE)",
+    ]),
+    # search() ranks name matches first by querying the names on their own, see search.NAME_TABLE
+    (15, "Add full-text index of names", [
+        search.create_name_index,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn=None):
+    """Returns the number of the last migration applied to the database."""
+    if conn is None:
+        conn = manager.get()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def get_pending_migrations(conn=None):
+    """Returns the (version, description, steps) entries not yet applied."""
+    version = get_schema_version(conn)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+def migrate():
+    """
+    Applies all pending migrations in order, each one in its own transaction.
+
+    Returns:
+        int: The number of migrations that were applied.
+    """
+    applied = 0
+    for version, description, steps in get_pending_migrations():
+        try:
+            with manager.transaction() as conn:
+                # DDL does not open a transaction implicitly, so start one to make
+                # the migration and its user_version bump atomic
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                # Another process may have migrated while we were waiting for the lock
+                if get_schema_version(conn) >= version:
+                    continue
+                print(f"Applying migration {version}: {description}")
+                cursor = conn.cursor()
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(f"PRAGMA user_version = {version}")
+            applied += 1
+        except sqlite3.Error as e:
+            print(f"Database error during migration {version} ({description}): {e}")
+            raise
+
+    if applied:
+        schema.invalidate()
+        print(f"Applied {applied} migration(s), database schema is at version {LATEST_VERSION}.")
+    return applied
@@ -0,0 +1,100 @@
+import threading
+from collections import namedtuple
+
+from dbms.connection import manager
+
+# Labels shown next to a value in the detail view
+DISPLAY_NAMES = {
+    "fn": "First Name", "n": "Last Name", "nickname": "Nickname",
+    "photo": "Photo", "bday": "Birthday", "anniversary": "Anniversary",
+    "gender": "Gender", "adr": "Address", "tel": "Telephone",
+    "email": "Email", "impp": "Instant Messenger", "lang": "Language",
+    "tz": "Time Zone", "geo": "Geolocation", "note": "Notes",
+    "title": "Group Title", "logo": "Group Logo", "org": "Organization",
+    "related": "Related Information", "url": "Website URL"
+}
+
+# Labels in the add/edit form where it differs from DISPLAY_NAMES
+FORM_LABELS = {
+    "tel": "Telephone Number",
+    "email": "Email Address",
+    "impp": "Instant Messenger ID",
+    "geo": "Geolocation (Lat,Long)",
+}
+
+# Columns the dbms layer maintains itself, they are not part of a Table and so
+# never shown, edited or saved from the GUI
+INTERNAL_COLUMNS = frozenset(("intern_key",))
+
+Column = namedtuple("Column", ["name", "type", "is_blob", "is_primary_key", "display_name", "form_label"])
+Table = namedtuple("Table", ["name", "columns", "column_names", "blob_columns", "text_columns", "version"])
+
+_tables = {}           # table name -> Table
+_loaded_for = None     # (database path, schema version) _tables belongs to
+_lock = threading.Lock()
+
+
+def default_display_name(column_name):
+    """Label for a column without an entry in DISPLAY_NAMES."""
+    return column_name.replace("_", " ").title()
+
+def column_label(column_name):
+    """Label of any column in the detail view, also of columns outside a Table."""
+    return DISPLAY_NAMES.get(column_name, default_display_name(column_name))
+
+def _build_column(row):
+    # PRAGMA table_info returns: (cid, name, type, notnull, dflt_value, pk)
+    _, name, column_type, _, _, pk = row
+    display_name = column_label(name)
+    return Column(
+        name=name,
+        type=column_type,
+        is_blob=column_type.upper() == "BLOB",
+        is_primary_key=bool(pk),
+        display_name=display_name,
+        form_label=FORM_LABELS.get(name, display_name),
+    )
+
+def get_table(table_name):
+    """
+    Returns the metadata of a table, reading it from the database only the first
+    time it is asked for after startup, a migration or a switch of database file.
+
+    Args:
+        table_name (str): Name of the table, e.g. "persons".
+
+    Returns:
+        Table: Immutable description of the table, or None if it does not exist.
+    """
+    global _loaded_for
+    table = _tables.get(table_name)
+    if table is not None and _loaded_for is not None and _loaded_for[0] == manager.db_path:
+        return table
+
+    with _lock:
+        with manager.connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if _loaded_for != (manager.db_path, version):
+                _tables.clear()
+                _loaded_for = (manager.db_path, version)
+            rows = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+        if not rows:
+            return None
+        columns = tuple(_build_column(row) for row in rows if row[1] not in INTERNAL_COLUMNS)
+        table = Table(
+            name=table_name,
+            columns=columns,
+            column_names=tuple(column.name for column in columns),
+            blob_columns=frozenset(column.name for column in columns if column.is_blob),
+            text_columns=tuple(column.name for column in columns if not column.is_blob),
+            version=version,
+        )
+        _tables[table_name] = table
+        return table
+
+def invalidate():
+    """Forgets all loaded metadata. Called after migrations changed the schema."""
+    global _loaded_for
+    with _lock:
+        _tables.clear()
+        _loaded_for = None
@@ -0,0 +1,405 @@
+import re
+import sqlite3
+from contextlib import contextmanager
+
+from dbms.connection import manager
+
+# Full-text search over persons, groups and other.categories.
+#
+# Everything lives in one FTS5 table (the names also in NAME_TABLE) with prefix indexes for the first six
+# characters, so search-as-you-type prefix queries never have to merge the
+# doclists of all matching terms at query time. Its rowid encodes the source row, persons
+# use person_id * 2 and groups group_id * 2 + 1, so the triggers below can keep it
+# in sync with O(log n) rowid lookups instead of scanning for UNINDEXED columns.
+#   name:       persons fn, n, nickname / groups title
+#   details:    persons email, tel, adr, note / groups org
+#   categories: other.categories of the person
+SEARCH_TABLE = "search_index"
+
+# One-row table whose insert_sync flag gates the per-row insert triggers, see
+# insert_triggers_suspended()
+SETTINGS_TABLE = "search_settings"
+
+# bm25 weights for (name, details, categories), name matches rank first
+RANK_WEIGHTS = (10.0, 1.0, 2.0)
+
+SEARCH_MODES = ("prefix", "words", "phrase", "raw")
+
+SEARCH_RANKINGS = ("name", "bm25")
+
+
+
+def _text(*columns):
+    """SQL expression joining columns with spaces, skipping NULLs and the 'None' the vCard import stores."""
+    return " || ' ' || ".join(f"ifnull(nullif({column}, 'None'), '')" for column in columns)
+
+def _categories(person_id):
+    """SQL subquery collecting all other.categories of a person."""
+    return f"(SELECT group_concat(nullif(categories, 'None'), ' ') FROM other WHERE person_id = {person_id})"
+
+def _person_row(alias):
+    return (f"{alias}.person_id * 2, {_text(f'{alias}.fn', f'{alias}.n', f'{alias}.nickname')}, "
+            f"{_text(f'{alias}.email', f'{alias}.tel', f'{alias}.adr', f'{alias}.note')}, "
+            f"{_categories(f'{alias}.person_id')}")
+
+def _group_row(alias):
+    return f"{alias}.group_id * 2 + 1, {_text(f'{alias}.title')}, {_text(f'{alias}.org')}, NULL"
+
+_INSERT = f"INSERT INTO {SEARCH_TABLE} (rowid, name, details, categories)"
+
+SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, details, categories,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '1 2 3 4 5 6'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_persons_insert AFTER INSERT ON persons BEGIN
+        {_INSERT} SELECT {_person_row('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_persons_update AFTER UPDATE ON persons BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.person_id * 2;
+        {_INSERT} SELECT {_person_row('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_persons_delete AFTER DELETE ON persons BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.person_id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_groups_insert AFTER INSERT ON groups BEGIN
+        {_INSERT} SELECT {_group_row('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_groups_update AFTER UPDATE ON groups BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.group_id * 2 + 1;
+        {_INSERT} SELECT {_group_row('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_groups_delete AFTER DELETE ON groups BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.group_id * 2 + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_other_insert AFTER INSERT ON other BEGIN
+        UPDATE {SEARCH_TABLE} SET categories = {_categories('new.person_id')}
+        WHERE rowid = new.person_id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_other_update AFTER UPDATE ON other BEGIN
+        UPDATE {SEARCH_TABLE} SET categories = {_categories('old.person_id')}
+        WHERE rowid = old.person_id * 2;
+        UPDATE {SEARCH_TABLE} SET categories = {_categories('new.person_id')}
+        WHERE rowid = new.person_id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_other_delete AFTER DELETE ON other BEGIN
+        UPDATE {SEARCH_TABLE} SET categories = {_categories('old.person_id')}
+        WHERE rowid = old.person_id * 2;
+    END
+    """,
+]
+
+
+# The names once more, in a table of their own. search() ranks name matches first:
+# in search_index a frequent word of the notes shares its doclist with the names,
+# so a "name : ..." filter would have to read all of it to find the few name
+# matches. Same rowids and tokenizer as search_index.
+NAME_TABLE = "name_index"
+
+def _person_name(alias):
+    return f"{alias}.person_id * 2, {_text(f'{alias}.fn', f'{alias}.n', f'{alias}.nickname')}"
+
+def _group_name(alias):
+    return f"{alias}.group_id * 2 + 1, {_text(f'{alias}.title')}"
+
+_INSERT_NAME = f"INSERT INTO {NAME_TABLE} (rowid, name)"
+
+NAME_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {NAME_TABLE} USING fts5(
+        name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '1 2 3 4 5 6'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS name_persons_insert AFTER INSERT ON persons
+    WHEN (SELECT insert_sync FROM {SETTINGS_TABLE}) BEGIN
+        {_INSERT_NAME} SELECT {_person_name('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS name_persons_update AFTER UPDATE OF fn, n, nickname ON persons BEGIN
+        DELETE FROM {NAME_TABLE} WHERE rowid = old.person_id * 2;
+        {_INSERT_NAME} SELECT {_person_name('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS name_persons_delete AFTER DELETE ON persons BEGIN
+        DELETE FROM {NAME_TABLE} WHERE rowid = old.person_id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS name_groups_insert AFTER INSERT ON groups
+    WHEN (SELECT insert_sync FROM {SETTINGS_TABLE}) BEGIN
+        {_INSERT_NAME} SELECT {_group_name('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS name_groups_update AFTER UPDATE OF title ON groups BEGIN
+        DELETE FROM {NAME_TABLE} WHERE rowid = old.group_id * 2 + 1;
+        {_INSERT_NAME} SELECT {_group_name('new')};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS name_groups_delete AFTER DELETE ON groups BEGIN
+        DELETE FROM {NAME_TABLE} WHERE rowid = old.group_id * 2 + 1;
+    END
+    """,
+]
+
+
+def create_search_index(cursor):
+    """Creates the FTS5 table and its triggers and indexes all existing rows (used by the migrations)."""
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    _populate(cursor)
+
+def _populate(cursor):
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    cursor.execute(f"{_INSERT} SELECT {_person_row('p')} FROM persons p")
+    cursor.execute(f"{_INSERT} SELECT {_group_row('g')} FROM groups g")
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+def create_name_index(cursor):
+    """Creates the name table and its triggers and indexes all existing names (used by the migrations)."""
+    for statement in NAME_SCHEMA:
+        cursor.execute(statement)
+    _populate_names(cursor)
+
+def _populate_names(cursor):
+    cursor.execute(f"DELETE FROM {NAME_TABLE}")
+    cursor.execute(f"{_INSERT_NAME} SELECT {_person_name('p')} FROM persons p")
+    cursor.execute(f"{_INSERT_NAME} SELECT {_group_name('g')} FROM groups g")
+    cursor.execute(f"INSERT INTO {NAME_TABLE} ({NAME_TABLE}) VALUES ('optimize')")
+
+def optimize_search_index():
+    """Merges the index b-trees into one, worth running after large imports."""
+    with manager.transaction() as conn:
+        for table_name in (SEARCH_TABLE, NAME_TABLE):
+            conn.execute(f"INSERT INTO {table_name} ({table_name}) VALUES ('optimize')")
+
+def create_insert_sync_switch(cursor):
+    """Recreates the insert triggers so they only fire while search_settings.insert_sync is set (used by the migrations)."""
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {SETTINGS_TABLE} (insert_sync INTEGER NOT NULL)")
+    cursor.execute(f"INSERT INTO {SETTINGS_TABLE} (insert_sync) SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM {SETTINGS_TABLE})")
+    for table_name, row in (("persons", _person_row('new')), ("groups", _group_row('new'))):
+        cursor.execute(f"DROP TRIGGER IF EXISTS search_{table_name}_insert")
+        cursor.execute(f"""
+            CREATE TRIGGER search_{table_name}_insert AFTER INSERT ON {table_name}
+            WHEN (SELECT insert_sync FROM {SETTINGS_TABLE}) BEGIN
+                {_INSERT} SELECT {row};
+            END
+        """)
+
+def gate_other_insert_trigger(cursor):
+    """Recreates the other insert trigger so it is also switched off by insert_triggers_suspended() (used by the migrations)."""
+    cursor.execute("DROP TRIGGER IF EXISTS search_other_insert")
+    cursor.execute(f"""
+        CREATE TRIGGER search_other_insert AFTER INSERT ON other
+        WHEN (SELECT insert_sync FROM {SETTINGS_TABLE}) BEGIN
+            UPDATE {SEARCH_TABLE} SET categories = {_categories('new.person_id')}
+            WHERE rowid = new.person_id * 2;
+        END
+    """)
+
+@contextmanager
+def insert_triggers_suspended(conn):
+    """
+    Turns the per-row search index insert triggers off for the rest of the block.
+
+    Indexing rows one trigger call at a time is several times slower than a single
+    INSERT ... SELECT, so bulk writers insert with the triggers off and then call
+    index_id_range(). That includes the categories of `other` rows, so they have
+    to be inserted before their persons are indexed. Must be used inside a write transaction: the flag change is
+    part of it and other connections never see the triggers switched off.
+    """
+    conn.execute(f"UPDATE {SETTINGS_TABLE} SET insert_sync = 0")
+    try:
+        yield
+    finally:
+        conn.execute(f"UPDATE {SETTINGS_TABLE} SET insert_sync = 1")
+
+def index_id_range(conn, category, first_id, last_id):
+    """Adds the persons or groups with first_id <= id <= last_id to the search and name index."""
+    if category == "persons":
+        for insert, row in ((_INSERT, _person_row('p')), (_INSERT_NAME, _person_name('p'))):
+            conn.execute(f"{insert} SELECT {row} FROM persons p WHERE p.person_id BETWEEN ? AND ?",
+                         (first_id, last_id))
+    else:
+        for insert, row in ((_INSERT, _group_row('g')), (_INSERT_NAME, _group_name('g'))):
+            conn.execute(f"{insert} SELECT {row} FROM groups g WHERE g.group_id BETWEEN ? AND ?",
+                         (first_id, last_id))
+
+def rebuild_search_index():
+    """
+    Re-indexes every person and group from scratch.
+
+    The triggers keep the index current, this is only needed for databases whose
+    index got out of sync, e.g. after rows were written with the triggers dropped.
+    """
+    with manager.use_profile("bulk-load"), manager.transaction() as conn:
+        _populate(conn.cursor())
+        _populate_names(conn.cursor())
+    print("Search index rebuilt.")
+
+
+def build_match_query(query, mode="prefix"):
+    """
+    Turns user input into an FTS5 MATCH expression.
+
+    Args:
+        query (str): The text to search for.
+        mode (str): "prefix" matches every word as a prefix ("jo sm" finds "John Smith"),
+            "words" matches whole words, "phrase" matches the words in this exact order
+            and "raw" passes query through as FTS5 query syntax.
+
+    Returns:
+        str or None: The MATCH expression, None if query contains no searchable words.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Available: {', '.join(SEARCH_MODES)}")
+    if mode == "raw":
+        return query.strip() or None
+
+    # Quoting every token keeps FTS5 operators (AND, NEAR, ^, ...) in user input literal
+    tokens = re.findall(r"\w+", query)
+    if not tokens:
+        return None
+    if mode == "phrase":
+        return '"' + " ".join(tokens) + '"'
+    suffix = "*" if mode == "prefix" else ""
+    return " ".join(f'"{token}"{suffix}' for token in tokens)
+
+def search(query, category=None, limit=20, mode="prefix", ranking="name"):
+    """
+    Ranked full-text search over persons and groups.
+
+    Args:
+        query (str): The text to search for, see build_match_query() for how it is interpreted.
+        category (str or None): "persons" or "groups" to restrict the results, None for both.
+        limit (int): Maximum number of results.
+        mode (str): "prefix", "words", "phrase" or "raw".
+        ranking (str): "name" returns the items whose name matches the whole
+            query first and the other matches after them, each in id order
+            (raw queries all in id order). It reads only as many matches as it
+            returns, so it stays fast for frequent words. "bm25" orders all
+            matches by relevance, it has to weight every match of every word
+            first (tens of milliseconds for frequent words on a large address book).
+
+    Returns:
+        list: (category, item_id, name) tuples, best match first.
+    """
+    match = build_match_query(query, mode)
+    if match is None:
+        return []
+    if ranking not in SEARCH_RANKINGS:
+        raise ValueError(f"Unknown search ranking '{ranking}'. Available: {', '.join(SEARCH_RANKINGS)}")
+
+    kind_filter = ""
+    if category is not None:
+        category = category.lower()
+        if category not in ("persons", "groups"):
+            print(f"Unknown category: {category} in search")
+            return []
+        kind_filter = f"AND rowid % 2 = {0 if category == 'persons' else 1}"
+
+    try:
+        with manager.connection() as conn:
+            if ranking == "bm25":
+                weights = ", ".join(str(weight) for weight in RANK_WEIGHTS)
+                rowids = [row[0] for row in conn.execute(f"""
+                    SELECT rowid FROM {SEARCH_TABLE}
+                    WHERE {SEARCH_TABLE} MATCH ? {kind_filter}
+                    ORDER BY bm25({SEARCH_TABLE}, {weights})
+                    LIMIT ?
+                """, (match, limit))]
+            elif mode == "raw":
+                # May use the columns and operators of search_index, which the name table lacks
+                rowids = _match_rowids(conn, SEARCH_TABLE, match, kind_filter, limit)
+            else:
+                rowids = _match_rowids(conn, NAME_TABLE, match, kind_filter, limit)
+                if len(rowids) < limit:
+                    # These are all name matches, so they are among the first limit + len(rowids) matches
+                    name_matches = set(rowids)
+                    others = _match_rowids(conn, SEARCH_TABLE, match, kind_filter, limit + len(rowids))
+                    rowids += [rowid for rowid in others if rowid not in name_matches][:limit - len(rowids)]
+
+            names = _fetch_names(conn, rowids)
+    except sqlite3.OperationalError as e:
+        # Only reachable with mode="raw" and malformed FTS5 syntax
+        print(f"Invalid search query '{query}': {e}")
+        return []
+
+    return [("groups" if rowid % 2 else "persons", rowid // 2, names.get(rowid)) for rowid in rowids]
+
+def _match_rowids(conn, table_name, match, kind_filter, limit):
+    """The first limit rowids of table_name matching match, in rowid order."""
+    return [row[0] for row in conn.execute(
+        f"SELECT rowid FROM {table_name} WHERE {table_name} MATCH ? {kind_filter} LIMIT ?", (match, limit)
+    )]
+
+def match_names(query, category, limit=100, count_limit=1000):
+    """
+    Finds the persons or groups with a name word starting with every word of query.
+
+    Only the name table is searched, matches come in id order.
+
+    Args:
+        query (str): What the user typed, e.g. "lena win".
+        category (str): "persons" or "groups".
+        limit (int): Maximum number of ids returned.
+        count_limit (int): Matches are only counted up to here.
+
+    Returns:
+        tuple: (item_ids, count), count being at most count_limit.
+    """
+    match = build_match_query(query, "prefix")
+    if match is None:
+        return [], 0
+    kind = 0 if category.lower() == "persons" else 1
+    with manager.connection() as conn:
+        rowids = [row[0] for row in conn.execute(
+            f"SELECT rowid FROM {NAME_TABLE} WHERE {NAME_TABLE} MATCH ? AND rowid % 2 = ? LIMIT ?",
+            (match, kind, limit)
+        )]
+        count = len(rowids)
+        if count == limit:
+            count = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {NAME_TABLE} WHERE {NAME_TABLE} MATCH ? AND rowid % 2 = ? LIMIT ?)",
+                (match, kind, count_limit)
+            ).fetchone()[0]
+    return [rowid // 2 for rowid in rowids], count
+
+def _fetch_names(conn, rowids):
+    """Returns {search rowid: fn or title} for the given search_index rowids."""
+    names = {}
+    for kind, table_name, id_column, name_column in ((0, "persons", "person_id", "fn"), (1, "groups", "group_id", "title")):
+        ids = [rowid // 2 for rowid in rowids if rowid % 2 == kind]
+        if ids:
+            placeholders = ", ".join("?" * len(ids))
+            for item_id, name in conn.execute(
+                f"SELECT {id_column}, {name_column} FROM {table_name} WHERE {id_column} IN ({placeholders})", ids
+            ):
+                names[item_id * 2 + kind] = name
+    return names
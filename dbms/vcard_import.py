@@ -1,11 +1,19 @@
 # why is there so much stringify?
 # due to a fuckload of problems when trying to import values, such as lists when only strings are accepted, the program makes a string out of every imported value so as not to cause any problems
 
-import sqlite3
 import vobject
 import base64
-
-DB_PATH = 'dbms/contacts.db'
+import glob
+import hashlib
+import os
+import re
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from dbms import changes, contact_points, dbms, interning, search, vcard_parser
+from dbms.connection import manager
 
 def stringify(val, seen=None):
     if seen is None:
@@ -47,176 +55,697 @@ def photo_to_blob(photo_obj):
             return None
     return None
 
-def insert_person(cursor, person):
-    cursor.execute("""
-        INSERT INTO persons (fn, n, nickname, photo, bday, anniversary, gender, adr, tel, email, impp, lang, tz, geo, note)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        person.get('fn'),
-        person.get('n'),
-        person.get('nickname'),
-        person.get('photo'),
-        person.get('bday'),
-        person.get('anniversary'),
-        person.get('gender'),
-        person.get('adr'),
-        person.get('tel'),
-        person.get('email'),
-        person.get('impp'),
-        person.get('lang'),
-        person.get('tz'),
-        person.get('geo'),
-        person.get('note')
-    ))
-    return cursor.lastrowid
-
-def insert_group(cursor, group):
-    cursor.execute("""
-        INSERT INTO groups (title, logo, org, related, url)
-        VALUES (?, ?, ?, ?, ?)
-    """, (
-        group.get('title'),
-        group.get('logo'),
-        group.get('org'),
-        group.get('related'),
-        group.get('url')
-    ))
-    return cursor.lastrowid
-
-def insert_role(cursor, role):
-    cursor.execute("""
-        INSERT INTO role (role, member)
-        VALUES (?, ?)
-    """, (
-        role.get('role'),
-        role.get('member')
-    ))
-    return cursor.lastrowid
-
-def insert_is_in(cursor, person_id, group_id, role_id):
-    cursor.execute("""
-        INSERT INTO is_in (person_id, group_id, role_id)
-        VALUES (?, ?, ?)
-    """, (person_id, group_id, role_id))
-
-def insert_other(cursor, person_id, other):
-    cursor.execute("""
-        INSERT INTO other (
-            person_id, categories, prodid, rev, sound, uid,
-            clientpidmap, version, key, fburl, caladruri, caluri
+
+# Number of cards parsed and committed together by import_vcard
+IMPORT_CHUNK_SIZE = 1000
+
+# Number of processes import_vcard parses with by default, 1 parses in the calling process
+IMPORT_WORKERS = 1
+
+
+# The line a nested vCard 2.1 AGENT card follows: an AGENT property without a value
+_AGENT_LINE_RE = re.compile(rb'[ \t]*(?:[A-Za-z0-9_-]+\.)?AGENT(?:;[^:\r\n]*)?:[ \t]*\r?\n?', re.IGNORECASE)
+
+def is_agent_line(line):
+    """
+    True if a BEGIN:VCARD after this raw line starts a card nested in an AGENT
+    property. Any other BEGIN:VCARD inside a card means that card was never closed.
+    """
+    return line is not None and _AGENT_LINE_RE.fullmatch(line) is not None
+
+
+class UnclosedCard(ValueError):
+    """Raised by iter_vcard_texts for a card without END:VCARD."""
+
+
+def iter_vcard_texts(vcf_path, start_offset=0):
+    """
+    Reads a .vcf file incrementally and yields one card at a time.
+
+    The file is read line by line in binary mode, so memory use depends on the
+    largest card and not on the size of the file. Cards nested in a property of
+    another card (vCard 2.1 AGENT) stay part of their outer card. start_offset
+    lets a resumed import continue after the last card it committed.
+
+    Yields:
+        tuple: (start, end, text) with the byte offsets of the card in the file
+        and its decoded text, from BEGIN:VCARD up to and including END:VCARD.
+
+    Raises:
+        UnclosedCard: If a card has no END:VCARD, found at the next card's
+            BEGIN:VCARD or at the end of the file.
+    """
+    with open(vcf_path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        start = None
+        depth = 0
+        lines = []
+        previous = None
+        for line in f:
+            line_start = offset
+            offset += len(line)
+            keyword = line.strip().upper()
+            if keyword == b'BEGIN:VCARD':
+                if depth == 0:
+                    start = line_start
+                    lines = []
+                elif not is_agent_line(previous):
+                    raise UnclosedCard(f"The card at byte {start} of {vcf_path} has no END:VCARD "
+                                       f"before the next card at byte {line_start}.")
+                depth += 1
+            previous = line
+            if depth == 0:
+                continue # Text between cards is ignored, like vobject does
+            lines.append(line)
+            if keyword == b'END:VCARD':
+                depth -= 1
+                if depth == 0:
+                    yield start, offset, b''.join(lines).decode('utf-8', errors='replace')
+                    lines = []
+        if depth > 0:
+            raise UnclosedCard(f"The card at byte {start} of {vcf_path} has no END:VCARD.")
+
+def iter_vcard_chunks(vcf_path, chunk_size=IMPORT_CHUNK_SIZE, start_offset=0):
+    """Groups the cards of iter_vcard_texts into lists of at most chunk_size cards."""
+    chunk = []
+    for card in iter_vcard_texts(vcf_path, start_offset):
+        chunk.append(card)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportCancelled(Exception):
+    """Raised by import_vcard when its cancel_event was set."""
+
+
+def import_vcard(vcf_path, chunk_size=IMPORT_CHUNK_SIZE, workers=IMPORT_WORKERS,
+                 atomic=False, progress=None, cancel_event=None, upsert=False, checkpoint=False):
+    """
+    Imports all cards of a .vcf file.
+
+    The file is streamed and every chunk of chunk_size cards is parsed and
+    committed in its own transaction, so peak memory stays flat for any file
+    size. If the import fails, the chunks committed so far stay in the database.
+    With atomic=True the whole file is committed at once instead, so a failure
+    or cancellation leaves the database untouched.
+
+    With workers > 1 the chunks are parsed in that many processes while this
+    thread stays the only writer and commits the chunks in file order, so the
+    database ends up exactly as with workers=1.
+
+    With upsert=True cards imported before (same UID, or same content for cards
+    without one) are updated in place or skipped if unchanged instead of being
+    added again, see upsert_card_rows(). Without it every card is added, but
+    its key is recorded all the same, so a later upsert import recognizes it.
+
+    With checkpoint=True the position after every committed chunk is stored in
+    import_checkpoints together with the chunk. A file that was imported
+    completely is skipped, one that was interrupted continues after its last
+    committed card. Both only if its size and modification time are unchanged,
+    otherwise it is imported from the start.
+
+    Args:
+        vcf_path (str): Path of the .vcf file.
+        chunk_size (int): Number of cards per transaction (and per task for a worker).
+        workers (int): Number of parsing processes, 1 parses in this process.
+        atomic (bool): Commit once at the end instead of after every chunk.
+        progress (callable or None): Called after every chunk with a dictionary
+            holding cards, bytes_done, bytes_total, cards_per_sec and eta_seconds.
+        cancel_event (threading.Event or None): When set, the import stops before
+            the next chunk and raises ImportCancelled.
+        upsert (bool): Match cards against earlier imports instead of always inserting.
+        checkpoint (bool): Record progress in import_checkpoints and resume from it.
+
+    Returns:
+        dict: Numbers of "cards" read and of cards "inserted", "updated" and
+        "unchanged" (without upsert every card counts as inserted).
+    """
+    imported = 0
+    counts = {"cards": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    interner = None
+    bytes_total = os.path.getsize(vcf_path)
+    start_time = time.perf_counter()
+    start_offset = 0
+    if checkpoint:
+        vcf_path = os.path.abspath(vcf_path)
+        state = _checkpoint_state(vcf_path)
+        if state == "done":
+            print(f"{vcf_path} was already imported, skipped.")
+            return counts
+        start_offset, cards_before = state
+        if start_offset:
+            print(f"Resuming {vcf_path} after {cards_before} cards (byte {start_offset}).")
+    try:
+        with manager.use_profile("bulk-load"), (manager.transaction() if atomic else nullcontext()):
+            for chunk, card_rows in _parsed_chunks(vcf_path, chunk_size, workers, start_offset):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled(f"Import of {vcf_path} cancelled after {imported} cards.")
+                with manager.transaction() as connection:
+                    if interner is None:
+                        # Shared by all chunks, so each group or role is looked up once per file
+                        interner = interning.Interner(connection)
+                    if upsert:
+                        for name, count in upsert_card_rows(connection, card_rows, interner).items():
+                            counts[name] += count
+                    else:
+                        write_card_rows(connection, card_rows, interner)
+                        counts["inserted"] += len(card_rows)
+                    if checkpoint:
+                        _save_checkpoint(connection, vcf_path, chunk[-1][1], len(chunk))
+                imported += len(chunk)
+                print(f"Imported {imported} cards...")
+                if progress is not None:
+                    progress(_progress_info(imported, chunk[-1][1], start_offset, bytes_total, start_time))
+            if checkpoint:
+                with manager.transaction() as connection:
+                    connection.execute("UPDATE import_checkpoints SET done = 1 WHERE path = ?", (vcf_path,))
+    finally:
+        # Imports write many rows at once, start the record cache over
+        dbms.invalidate_cache()
+        if imported:
+            changes.notify("persons", reset=True)
+            changes.notify("groups", reset=True)
+    counts["cards"] = imported
+    print(f"Import complete: {counts['inserted']} inserted, {counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged.")
+    return counts
+
+def _progress_info(cards, bytes_done, start_offset, bytes_total, start_time):
+    elapsed = time.perf_counter() - start_time
+    remaining = bytes_total - bytes_done
+    processed = bytes_done - start_offset # In this run, a resumed import started at start_offset
+    return {
+        "cards": cards,
+        "bytes_done": bytes_done,
+        "bytes_total": bytes_total,
+        "cards_per_sec": cards / elapsed if elapsed > 0 else 0.0,
+        "eta_seconds": elapsed * remaining / processed if processed else None,
+    }
+
+def _checkpoint_state(vcf_path):
+    """
+    Returns "done" if vcf_path was imported completely, otherwise the
+    (byte offset, cards committed) to continue from. A changed file starts over.
+    """
+    stat = os.stat(vcf_path)
+    with manager.transaction() as connection:
+        row = connection.execute(
+            "SELECT size, mtime, byte_offset, cards_committed, done FROM import_checkpoints WHERE path = ?",
+            (vcf_path,)
+        ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return "done" if row[4] else (row[2], row[3])
+        connection.execute(
+            "INSERT OR REPLACE INTO import_checkpoints (path, size, mtime, byte_offset, cards_committed, done) "
+            "VALUES (?, ?, ?, 0, 0, 0)",
+            (vcf_path, stat.st_size, stat.st_mtime_ns)
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        person_id,
-        stringify(other.get('categories')),
-        stringify(other.get('prodid')),
-        stringify(other.get('rev')),
-        stringify(other.get('sound')),
-        stringify(other.get('uid')),
-        stringify(other.get('clientpidmap')),
-        stringify(other.get('version')),
-        stringify(other.get('key')),
-        stringify(other.get('fburl')),
-        stringify(other.get('caladruri')),
-        stringify(other.get('caluri'))
-    ))
-
-
-def import_vcard(vcf_path):
-    with open(vcf_path, 'r') as f:
-        vcard_data = f.read()
-
-    connection = sqlite3.connect(DB_PATH)
-    cursor = connection.cursor()
-
-    for vcard in vobject.readComponents(vcard_data):
-        person = {
-        'fn': stringify(extract_property(vcard, 'fn')),
-        'n': None,  # handled later
-        'nickname': stringify(extract_property(vcard, 'nickname')),
-        'photo': None,
-        'bday': None,
-        'anniversary': None,
-        'gender': stringify(extract_property(vcard, 'gender')),
-        'adr': None,
-        'tel': None,
-        'email': None,
-        'impp': None,
-        'lang': None,
-        'tz': stringify(extract_property(vcard, 'tz')),
-        'geo': stringify(extract_property(vcard, 'geo')),
-        'note': stringify(extract_property(vcard, 'note'))
+    return 0, 0
+
+def _save_checkpoint(connection, vcf_path, byte_offset, cards):
+    """Records a committed chunk, called inside the chunk's transaction."""
+    connection.execute(
+        "UPDATE import_checkpoints SET byte_offset = ?, cards_committed = cards_committed + ? WHERE path = ?",
+        (byte_offset, cards, vcf_path)
+    )
+
+def is_imported(vcf_path):
+    """True if vcf_path was imported completely with checkpoint=True and has not changed since."""
+    vcf_path = os.path.abspath(vcf_path)
+    stat = os.stat(vcf_path)
+    with manager.connection() as connection:
+        row = connection.execute(
+            "SELECT size, mtime, done FROM import_checkpoints WHERE path = ?", (vcf_path,)
+        ).fetchone()
+    return bool(row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns and row[2])
+
+def expand_import_paths(paths):
+    """
+    Turns files, directories (searched recursively for *.vcf) and glob patterns
+    into a sorted list of files without duplicates.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(glob.escape(path), '**', '*.vcf'), recursive=True)
+            matches += glob.glob(os.path.join(glob.escape(path), '**', '*.VCF'), recursive=True)
+        elif glob.has_magic(path):
+            matches = glob.glob(path, recursive=True)
+        else:
+            matches = [path]
+        files.extend(sorted(os.path.abspath(match) for match in matches if os.path.isfile(match) or match == path))
+    return list(dict.fromkeys(files))
+
+def import_paths(paths, commit_every=IMPORT_CHUNK_SIZE, workers=IMPORT_WORKERS, upsert=True, cancel_event=None):
+    """
+    Imports many .vcf files so that an interrupted run can simply be started again.
+
+    Every file is imported with checkpoint=True: files that were imported before
+    are skipped and a file that was interrupted continues where it stopped. A file
+    that fails is reported and the next one is imported.
+
+    Args:
+        paths (list): Files, directories and glob patterns.
+        commit_every (int): Number of cards per transaction.
+        workers (int): Number of parsing processes, see import_vcard.
+        upsert (bool): Match cards against earlier imports, so a file that changed
+            after it was imported is not added twice.
+        cancel_event (threading.Event or None): Stops the run, see import_vcard.
+
+    Returns:
+        dict: Numbers of files "imported", "skipped" and "failed", and the card
+        counts of import_vcard summed over all files.
+    """
+    totals = {"imported": 0, "skipped": 0, "failed": 0,
+              "cards": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    files = expand_import_paths(paths)
+    for number, vcf_path in enumerate(files, start=1):
+        print(f"[{number}/{len(files)}] {vcf_path}")
+        try:
+            if is_imported(vcf_path):
+                totals["skipped"] += 1
+                continue
+            counts = import_vcard(vcf_path, chunk_size=commit_every, workers=workers, upsert=upsert,
+                                  cancel_event=cancel_event, checkpoint=True)
+        except ImportCancelled:
+            raise
+        except Exception as e:
+            print(f"Error importing {vcf_path}: {e}")
+            totals["failed"] += 1
+            continue
+        totals["imported"] += 1
+        for name, count in counts.items():
+            totals[name] += count
+    print(f"Imported {totals['imported']} file(s), skipped {totals['skipped']}, {totals['failed']} failed.")
+    return totals
+
+def _chunk_text(chunk):
+    return ''.join(text for _, _, text in chunk)
+
+def _parsed_chunks(vcf_path, chunk_size, workers, start_offset=0):
+    """Yields (chunk, card_rows) for every chunk of the file, in file order."""
+    chunks = iter_vcard_chunks(vcf_path, chunk_size, start_offset)
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, parse_cards(_chunk_text(chunk))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a few chunks per worker are in flight, so memory stays bounded even
+        # when parsing is faster than writing
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(parse_cards, _chunk_text(chunk))))
+            if len(pending) >= workers * 2:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+# Column order of the row tuples built by card_to_rows()
+PERSON_COLUMNS = ('fn', 'n', 'nickname', 'photo', 'bday', 'anniversary', 'gender', 'adr',
+                  'tel', 'email', 'impp', 'lang', 'tz', 'geo', 'note')
+OTHER_COLUMNS = ('categories', 'prodid', 'rev', 'sound', 'uid', 'clientpidmap', 'version',
+                 'key', 'fburl', 'caladruri', 'caluri')
+GROUP_COLUMNS = ('title', 'logo', 'org', 'related', 'url')
+ROLE_COLUMNS = ('role', 'member')
+
+
+def parse_cards(vcard_data, fast=True):
+    """
+    Parses vCard text and returns the card_to_rows() result of every card in it.
+
+    Cards are read by vcard_parser, which gives the same rows as vobject without
+    building its component tree. Cards it does not handle, or all of them when
+    fast is False, are parsed by vobject.
+    """
+    if fast:
+        try:
+            cards = vcard_parser.read_cards(vcard_data)
+        except vcard_parser.UnsupportedCard:
+            pass
+        else:
+            return [values_to_rows(values, contacts) if values is not None
+                    else card_to_rows(vobject.readOne(card_text))
+                    for values, contacts, card_text in cards]
+    return [card_to_rows(vcard) for vcard in vobject.readComponents(vcard_data)]
+
+def card_to_rows(vcard):
+    """
+    Extracts everything one parsed card contributes to the database.
+
+    Every value is converted once, here, so the writer only moves finished tuples.
+
+    Returns:
+        tuple: (person, other, group, role, points). The first four are row tuples
+        in the column order of PERSON_COLUMNS, OTHER_COLUMNS, GROUP_COLUMNS and
+        ROLE_COLUMNS, other, group and role are None when the card has no data for
+        them. points holds the card's contact_points rows, see
+        contact_points.card_points().
+    """
+    person = {
+    'fn': stringify(extract_property(vcard, 'fn')),
+    'n': None,  # handled later
+    'nickname': stringify(extract_property(vcard, 'nickname')),
+    'photo': None,
+    'bday': None,
+    'anniversary': None,
+    'gender': stringify(extract_property(vcard, 'gender')),
+    'adr': None,
+    'tel': None,
+    'email': None,
+    'impp': None,
+    'lang': None,
+    'tz': stringify(extract_property(vcard, 'tz')),
+    'geo': stringify(extract_property(vcard, 'geo')),
+    'note': stringify(extract_property(vcard, 'note'))
 }
 
 
-        if hasattr(vcard, 'n'):
-            n = vcard.n.value
-            person['n'] = ' '.join(n) if isinstance(n, (list, tuple)) else str(n)
-
-        if hasattr(vcard, 'photo'):
-            person['photo'] = photo_to_blob(vcard.photo)
-
-        if hasattr(vcard, 'bday'):
-            val = vcard.bday.value
-            person['bday'] = val.strftime('%Y-%m-%d') if hasattr(val, 'strftime') else str(val)
-
-        if hasattr(vcard, 'anniversary'):
-            val = vcard.anniversary.value
-            person['anniversary'] = val.strftime('%Y-%m-%d') if hasattr(val, 'strftime') else str(val)
-
-        for field in ['adr', 'tel', 'email', 'impp', 'lang']:
-            val = extract_property(vcard, field)
-            if isinstance(val, list):
-                val = val[0] if val else None
-            person[field] = stringify(val)
-
-
-        person_id = insert_person(cursor, person)
-
-        # Insert into 'other' table
-        other_data = {
-        'categories': stringify(extract_property(vcard, 'categories')),
-        'prodid': stringify(extract_property(vcard, 'prodid')),
-        'rev': stringify(extract_property(vcard, 'rev')),
-        'sound': stringify(extract_property(vcard, 'sound')),
-        'uid': stringify(extract_property(vcard, 'uid')),
-        'clientpidmap': stringify(extract_property(vcard, 'clientpidmap')),
-        'version': stringify(extract_property(vcard, 'version')),
-        'key': stringify(extract_property(vcard, 'key')),
-        'fburl': stringify(extract_property(vcard, 'fburl')),
-        'caladruri': stringify(extract_property(vcard, 'caladruri')),
-        'caluri': stringify(extract_property(vcard, 'caluri'))
-        }
-
-
-        if any(other_data.values()):
-            insert_other(cursor, person_id, other_data)
-
-        group = {
-        'title': stringify(extract_property(vcard, 'title')),
-        'logo': None,
-        'org': stringify(extract_property(vcard, 'org')),
-        'related': stringify(extract_property(vcard, 'related')),
-        'url': stringify(extract_property(vcard, 'url'))
-        }
-
-
-        if group['logo']:
-            group['logo'] = photo_to_blob(group['logo'])
-
-        group_id = insert_group(cursor, group) if any(group.values()) else None
-
-        role = {
-        'role': stringify(extract_property(vcard, 'role')),
-        'member': stringify(extract_property(vcard, 'member'))
-        }
-
-
-        role_id = insert_role(cursor, role) if any(role.values()) else None
-
-        if person_id and group_id and role_id:
-            insert_is_in(cursor, person_id, group_id, role_id)
-
-    connection.commit()
-    connection.close()
-    print("Import complete.")
+    if hasattr(vcard, 'n'):
+        n = vcard.n.value
+        person['n'] = ' '.join(n) if isinstance(n, (list, tuple)) else str(n)
+
+    if hasattr(vcard, 'photo'):
+        person['photo'] = photo_to_blob(vcard.photo)
+
+    if hasattr(vcard, 'bday'):
+        val = vcard.bday.value
+        person['bday'] = val.strftime('%Y-%m-%d') if hasattr(val, 'strftime') else str(val)
+
+    if hasattr(vcard, 'anniversary'):
+        val = vcard.anniversary.value
+        person['anniversary'] = val.strftime('%Y-%m-%d') if hasattr(val, 'strftime') else str(val)
+
+    for field in ['adr', 'tel', 'email', 'impp', 'lang']:
+        val = extract_property(vcard, field)
+        if isinstance(val, list):
+            val = val[0] if val else None
+        person[field] = stringify(val)
+
+    other = tuple(stringify(extract_property(vcard, field)) for field in OTHER_COLUMNS)
+
+    group = {
+    'title': stringify(extract_property(vcard, 'title')),
+    'logo': None,
+    'org': stringify(extract_property(vcard, 'org')),
+    'related': stringify(extract_property(vcard, 'related')),
+    'url': stringify(extract_property(vcard, 'url'))
+    }
+
+
+    if group['logo']:
+        group['logo'] = photo_to_blob(group['logo'])
+
+    role = (
+        stringify(extract_property(vcard, 'role')),
+        stringify(extract_property(vcard, 'member'))
+    )
+
+    contacts = [
+        (kind, vcard_parser.format_types(line.params.get('TYPE', ()), line.singletonparams), stringify(line.value))
+        for kind in contact_points.CONTACT_KINDS for line in vcard.contents.get(kind, [])
+    ]
+
+    return (
+        tuple(person[field] for field in PERSON_COLUMNS),
+        other if any(other) else None,
+        tuple(group[field] for field in GROUP_COLUMNS) if any(group.values()) else None,
+        role if any(role) else None,
+        contact_points.card_points(contacts),
+    )
+
+
+def _text(val):
+    # stringify() without its overhead for the common cases
+    if type(val) is str:
+        return val
+    if val is None:
+        return 'None'
+    return stringify(val)
+
+def values_to_rows(values, contacts):
+    """
+    card_to_rows() for a card decoded by vcard_parser.read_cards().
+
+    values already holds what vobject would return for each property, so this
+    only has to apply the same conversions card_to_rows() does.
+    """
+    person = {field: _text(values.get(field)) for field in PERSON_COLUMNS}
+    person['n'] = values.get('n')
+
+    photo = values.get('photo')
+    if isinstance(photo, bytes) or photo is None:
+        person['photo'] = photo
+    else:
+        try:
+            person['photo'] = base64.b64decode(photo)
+        except Exception:
+            person['photo'] = None
+
+    for field in ['bday', 'anniversary']:
+        person[field] = str(values[field]) if field in values else None
+
+    other = tuple(_text(values.get(field)) for field in OTHER_COLUMNS)
+    group = (_text(values.get('title')), None, _text(values.get('org')),
+             _text(values.get('related')), _text(values.get('url')))
+    role = (_text(values.get('role')), _text(values.get('member')))
+
+    return (
+        tuple(person[field] for field in PERSON_COLUMNS),
+        other if any(other) else None,
+        group if any(group) else None,
+        role if any(role) else None,
+        contact_points.card_points([(kind, types, _text(raw)) for kind, types, raw in contacts]),
+    )
+
+def _insert_many(conn, table_name, columns, rows):
+    """Inserts rows with one executemany and returns the id of the first one."""
+    conn.executemany(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})", rows
+    )
+    # AUTOINCREMENT ids of one statement in one write transaction are consecutive
+    return conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(rows) + 1
+
+def write_card_rows(conn, card_rows, interner=None, keys=None):
+    """
+    Inserts the rows of many cards, one executemany per table.
+
+    Ids are not fetched row by row: the ids of one executemany are consecutive,
+    so they follow from last_insert_rowid(). The search index is filled with one
+    statement per table at the end instead of one trigger call per row. Groups
+    and roles are interned, cards with the same ones share a row.
+
+    Every card's import key is recorded, so a later import with upsert=True
+    recognizes it. A card whose key is taken already (a duplicate) is added but
+    the key stays with the older person, as in migration 9.
+
+    Args:
+        conn: Connection with an open or joinable write transaction (manager.transaction()).
+        card_rows (list): card_to_rows() results, in input order.
+        interner (interning.Interner or None): Known groups and roles, pass the
+            same one for all chunks of an import. A new one is primed if None.
+        keys (list or None): (card_key(), content_hash()) of every card if the
+            caller has them already, computed if None.
+
+    Returns:
+        list: The person ids, in the order of card_rows.
+    """
+    if not card_rows:
+        return []
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    if interner is None:
+        interner = interning.Interner(conn)
+
+    with search.insert_triggers_suspended(conn):
+        first_person_id = _insert_many(conn, 'persons', PERSON_COLUMNS, [rows[0] for rows in card_rows])
+        person_ids = list(range(first_person_id, first_person_id + len(card_rows)))
+        # Before indexing, so the persons are indexed with their categories
+        _insert_others(conn, person_ids, card_rows)
+        search.index_id_range(conn, 'persons', person_ids[0], person_ids[-1])
+        _insert_memberships(conn, person_ids, card_rows, interner)
+    _insert_contact_points(conn, person_ids, card_rows)
+
+    if keys is None:
+        keys = [(card_key(rows), content_hash(rows)) for rows in card_rows]
+    conn.executemany(
+        "INSERT OR IGNORE INTO import_keys (key, person_id, content_hash) VALUES (?, ?, ?)",
+        [(key, person_id, digest) for (key, digest), person_id in zip(keys, person_ids)]
+    )
+    return person_ids
+
+def _insert_others(conn, person_ids, card_rows):
+    others = [(person_id,) + rows[1] for person_id, rows in zip(person_ids, card_rows) if rows[1]]
+    if others:
+        _insert_many(conn, 'other', ('person_id',) + OTHER_COLUMNS, others)
+
+def _insert_contact_points(conn, person_ids, card_rows):
+    contact_points.insert_points(conn, [
+        (person_id,) + point for person_id, rows in zip(person_ids, card_rows) for point in rows[4]
+    ])
+
+def _insert_memberships(conn, person_ids, card_rows, interner):
+    """Links every card's person to its interned group and role (triggers must be suspended)."""
+    group_ids, new_group_ids = interner.intern(
+        conn, 'groups', GROUP_COLUMNS, [rows[2] for rows in card_rows], interning.group_key
+    )
+    if new_group_ids:
+        search.index_id_range(conn, 'groups', new_group_ids[0], new_group_ids[-1])
+    role_ids, _ = interner.intern(conn, 'role', ROLE_COLUMNS, [rows[3] for rows in card_rows], interning.role_key)
+
+    memberships = [
+        (person_id, group_id, role_id)
+        for person_id, group_id, role_id in zip(person_ids, group_ids, role_ids)
+        if group_id and role_id
+    ]
+    if memberships:
+        # OR IGNORE: a person updated by a re-import may already be in a shared group through the GUI
+        conn.executemany("INSERT OR IGNORE INTO is_in (person_id, group_id, role_id) VALUES (?, ?, ?)", memberships)
+
+
+def card_key(card_rows_of_one_card):
+    """
+    Returns the key re-imports of a card are recognized by.
+
+    That is "uid:<UID>" if the card has a UID, otherwise "hash:<digest>" of its
+    content with case and whitespace normalized and the fields left out that
+    exports change on every run (REV, PRODID, VERSION).
+    """
+    # Contact points are left out, so keys stay the same as before they existed
+    person, other, group, role = card_rows_of_one_card[:4]
+    if other:
+        uid = other[OTHER_COLUMNS.index('uid')]
+        if uid and uid != 'None' and uid.strip():
+            return "uid:" + uid.strip()
+        other = tuple(value for column, value in zip(OTHER_COLUMNS, other) if column not in _VOLATILE_COLUMNS)
+    normalized = tuple(
+        tuple(_normalize(value) for value in rows) if rows else None
+        for rows in (person, other, group, role)
+    )
+    return "hash:" + hashlib.sha1(repr(normalized).encode('utf-8')).hexdigest()
+
+def content_hash(card_rows_of_one_card):
+    """Digest of everything a card writes, to tell whether a re-imported card changed."""
+    return hashlib.sha1(repr(card_rows_of_one_card).encode('utf-8')).hexdigest()
+
+_VOLATILE_COLUMNS = ('rev', 'prodid', 'version')
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.split()).casefold()
+    return value
+
+def upsert_card_rows(conn, card_rows, interner=None):
+    """
+    Writes cards that are not in the database yet, updates the ones that changed
+    since they were imported and skips the unchanged ones.
+
+    Cards are matched through the import_keys table by card_key(). An updated
+    card keeps its person id: the person row is rewritten, its `other` rows and
+    the group and role the import linked it to are replaced. Groups and roles no
+    longer used by anybody are removed, memberships made in the GUI are kept.
+
+    Args:
+        conn: Connection with an open or joinable write transaction (manager.transaction()).
+        card_rows (list): card_to_rows() results, in input order.
+        interner (interning.Interner or None): See write_card_rows().
+
+    Returns:
+        dict: Numbers of "inserted", "updated" and "unchanged" cards.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not card_rows:
+        return counts
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    if interner is None:
+        interner = interning.Interner(conn)
+
+    keyed = [(card_key(rows), content_hash(rows), rows) for rows in card_rows]
+    known = {}
+    unique_keys = list({key for key, _, _ in keyed})
+    # Chunked to stay below SQLite's host parameter limit
+    for start in range(0, len(unique_keys), 500):
+        chunk = unique_keys[start:start + 500]
+        placeholders = ', '.join(['?'] * len(chunk))
+        for key, person_id, stored_hash in conn.execute(
+            f"SELECT key, person_id, content_hash FROM import_keys WHERE key IN ({placeholders})", chunk
+        ):
+            known[key] = (person_id, stored_hash)
+
+    # key -> (content hash, rows), a card repeated in the same chunk replaces the earlier one
+    new_cards = {}
+    changed_cards = {}
+    for key, digest, rows in keyed:
+        target = changed_cards if key in known else new_cards
+        if key in target:
+            last_digest = target[key][0]
+        else:
+            last_digest = known[key][1] if key in known else None
+        if digest == last_digest:
+            counts["unchanged"] += 1
+            continue
+        counts["inserted" if last_digest is None else "updated"] += 1
+        target[key] = (digest, rows)
+
+    if new_cards:
+        write_card_rows(
+            conn, [rows for _, rows in new_cards.values()], interner,
+            keys=[(key, digest) for key, (digest, _) in new_cards.items()]
+        )
+    if changed_cards:
+        _update_cards(conn, [(known[key][0], digest, rows) for key, (digest, rows) in changed_cards.items()], interner)
+        conn.executemany(
+            "UPDATE import_keys SET content_hash = ? WHERE key = ?",
+            [(digest, key) for key, (digest, _) in changed_cards.items()]
+        )
+    return counts
+
+def _update_cards(conn, updates, interner):
+    """Rewrites the rows of already imported cards, updates is a list of (person_id, content hash, rows)."""
+    person_ids = [person_id for person_id, _, _ in updates]
+    card_rows = [rows for _, _, rows in updates]
+    id_params = [(person_id,) for person_id in person_ids]
+
+    # The memberships the import created are the ones with a role, the GUI assigns without.
+    # A group edited in the GUI lost its intern_key (one with a logo never had one) and is
+    # the user's now: its memberships stay, so it is neither emptied nor deleted below
+    imported = ("person_id = ? AND role_id IS NOT NULL AND group_id IN "
+                "(SELECT group_id FROM groups WHERE intern_key IS NOT NULL OR logo IS NOT NULL)")
+    old_links = []
+    for person_id in person_ids:
+        old_links.extend(conn.execute(f"SELECT group_id, role_id FROM is_in WHERE {imported}", (person_id,)).fetchall())
+    conn.executemany(f"DELETE FROM is_in WHERE {imported}", id_params)
+
+    conn.executemany("DELETE FROM other WHERE person_id = ?", id_params)
+    conn.executemany("DELETE FROM contact_points WHERE person_id = ?", id_params)
+    _insert_contact_points(conn, person_ids, card_rows)
+    with search.insert_triggers_suspended(conn):
+        _insert_others(conn, person_ids, card_rows)
+        _insert_memberships(conn, person_ids, card_rows, interner)
+
+    # Groups and roles nobody links to any more, shared ones usually stay
+    interner.forget_groups(_delete_unused(conn, 'groups', 'group_id', {group_id for group_id, _ in old_links}))
+    interner.forget_roles(_delete_unused(conn, 'role', 'role_id', {role_id for _, role_id in old_links}))
+
+    # The update trigger re-indexes each person, including the new categories
+    conn.executemany(
+        f"UPDATE persons SET {', '.join(f'{column} = ?' for column in PERSON_COLUMNS)} WHERE person_id = ?",
+        [rows[0] + (person_id,) for person_id, rows in zip(person_ids, card_rows)]
+    )
+
+def _delete_unused(conn, table_name, id_column, row_ids):
+    """Deletes the rows of row_ids no is_in row refers to and returns their ids."""
+    unused = [
+        row_id for row_id in row_ids
+        if conn.execute(f"SELECT 1 FROM is_in WHERE {id_column} = ? LIMIT 1", (row_id,)).fetchone() is None
+    ]
+    conn.executemany(f"DELETE FROM {table_name} WHERE {id_column} = ?", [(row_id,) for row_id in unused])
+    return unused
@@ -0,0 +1,308 @@
+# Fast reader for the vCard properties the import stores.
+#
+# vobject builds a full component tree for every card, runs a behavior class on
+# every line and hands back native objects that card_to_rows() then takes apart
+# again. This module tokenizes the text itself (unfolding, parameters,
+# QUOTED-PRINTABLE, base64) and decodes only the first value of each property
+# the import looks at, reproducing what vobject 0.9 returns for it. Whatever it
+# is not sure about is left to vobject, see read_cards().
+
+import base64
+import codecs
+import re
+
+from vobject.base import parseLine
+
+# Properties card_to_rows() reads, by the name of their content line
+MAPPED_PROPERTIES = frozenset((
+    'FN', 'N', 'NICKNAME', 'PHOTO', 'BDAY', 'ANNIVERSARY', 'GENDER', 'ADR', 'TEL',
+    'EMAIL', 'IMPP', 'LANG', 'TZ', 'GEO', 'NOTE',
+    'CATEGORIES', 'PRODID', 'REV', 'SOUND', 'UID', 'CLIENTPIDMAP', 'VERSION', 'KEY',
+    'FBURL', 'CALADRURI', 'CALURI',
+    'TITLE', 'LOGO', 'ORG', 'RELATED', 'URL', 'ROLE', 'MEMBER',
+))
+
+# How vobject's vCard 3.0 behavior (used for every VERSION) decodes a property,
+# everything not listed is backslash-unescaped text that may be base64 encoded
+RAW_PROPERTIES = frozenset(('GEO', 'VERSION'))
+ICALENDAR_TEXT_PROPERTIES = frozenset(('UID', 'PRODID'))
+LIST_PROPERTIES = frozenset(('CATEGORIES',))
+
+# Properties whose every line is returned, not just the first (see contact_points)
+MULTI_VALUED_PROPERTIES = frozenset(('TEL', 'EMAIL', 'ADR', 'IMPP', 'LANG'))
+
+# Parameters that only say how the value is encoded
+ENCODING_SINGLETONS = frozenset(('QUOTED-PRINTABLE', 'BASE64'))
+
+NAME_ORDER = ('family', 'given', 'additional', 'prefix', 'suffix')
+ADDRESS_ORDER = ('box', 'extended', 'street', 'city', 'region', 'code', 'country')
+
+ESCAPABLE_CHARS = '\\;,Nn"'
+
+_FOLD_RE = re.compile(r'(?:\r\n|\r|\n)[\t ]')
+_LINE_END_RE = re.compile(r'\r\n|\r|\n')
+# Name and parameters of a content line without quoted parameter values, lines
+# with quotes go through vobject's own (slower) line parser
+_LINE_HEAD_RE = re.compile(r'(?:[A-Za-z0-9_-]+\.)?([A-Za-z0-9_-]+)((?:;[A-Za-z0-9_-]+(?:=[^";:]*)?)*)')
+
+
+class UnsupportedCard(Exception):
+    """Raised for input the fast reader leaves to vobject."""
+
+
+def read_cards(text):
+    """
+    Splits vCard text into cards and decodes the properties in MAPPED_PROPERTIES.
+
+    Cards with a nested component (e.g. a 2.1 AGENT) or a value that cannot be
+    decoded come back without values, so the caller can hand their text to
+    vobject, which either reads them or raises the error it always raised.
+
+    Args:
+        text (str): One or more complete vCards.
+
+    Returns:
+        list: A (values, contacts, card_text) tuple per card. values maps lower-case
+        property names to the value vobject would return for the first such line of
+        the card, with N and ADR already converted to their str(). contacts has a
+        (lower-case name, types, value) tuple for every line of the
+        MULTI_VALUED_PROPERTIES, in card order. Both are None when the card needs
+        vobject, card_text is the card as unfolded lines.
+
+    Raises:
+        UnsupportedCard: If the text is not a sequence of complete vCards.
+    """
+    cards = []
+    stack = []
+    card_lines = None
+    properties = None
+    contact_lines = None
+    nested = False
+
+    for line in _LINE_END_RE.split(unfold(text)):
+        if not line:
+            continue
+        try:
+            name, params, value = split_line(line)
+        except Exception:
+            if card_lines is None:
+                raise UnsupportedCard(f"Cannot parse line: {line[:80]}")
+            nested = True  # let vobject report it
+            card_lines.append(line)
+            continue
+
+        if name == 'BEGIN':
+            if not stack:
+                if value.upper() != 'VCARD':
+                    raise UnsupportedCard(f"Not a vCard: {value[:80]}")
+                card_lines = []
+                properties = {}
+                contact_lines = []
+                nested = False
+            else:
+                nested = True
+            stack.append(value.upper())
+        elif card_lines is None:
+            raise UnsupportedCard(f"Line outside of a vCard: {line[:80]}")
+
+        card_lines.append(line)
+
+        if name == 'END':
+            if not stack or stack[-1] != value.upper():
+                raise UnsupportedCard(f"Unbalanced END: {value[:80]}")
+            stack.pop()
+            if not stack:
+                values, contacts = (None, None) if nested else _decode_card(properties, contact_lines)
+                cards.append((values, contacts, '\r\n'.join(card_lines)))
+                card_lines = None
+        elif len(stack) == 1 and name in MAPPED_PROPERTIES:
+            if name not in properties:
+                properties[name] = (params, value)
+            if name in MULTI_VALUED_PROPERTIES:
+                contact_lines.append((name, params, value))
+
+    if stack:
+        raise UnsupportedCard("Last vCard is not closed")
+    return cards
+
+def unfold(text):
+    """Joins folded content lines, i.e. removes every line break followed by a space or tab."""
+    return _FOLD_RE.sub('', text)
+
+def split_line(line):
+    """
+    Splits one unfolded content line into (name, params, value).
+
+    name is upper-case with '_' read as '-', params is the parameter string or
+    vobject's parameter list, see parse_params(). Raises whatever vobject's
+    parseLine() raises for a line it cannot parse.
+    """
+    head, colon, value = line.partition(':')
+    match = _LINE_HEAD_RE.fullmatch(head) if colon else None
+    if match is not None:
+        return match.group(1).replace('_', '-').upper(), match.group(2), value
+    name, params, value, _ = parseLine(line)
+    return name.replace('_', '-').upper(), params, value
+
+def _decode_card(properties, contact_lines):
+    try:
+        values = {name.lower(): decode_value(name, params, value)
+                  for name, (params, value) in properties.items()}
+        contacts = [(name.lower(), line_types(params), decode_value(name, params, value))
+                    for name, params, value in contact_lines]
+    except Exception:
+        return None, None
+    return values, contacts
+
+def parse_params(params):
+    """
+    Returns (table, singletons) of a line's parameters like vobject's ContentLine
+    has them: upper-case name -> list of values, and the parameters without a value.
+
+    Args:
+        params: The parameter part of the line as a string (";TYPE=HOME;PREF")
+            or as the list of [name, *values] lists vobject's parseLine() returns.
+    """
+    if not params:
+        return {}, []
+    if isinstance(params, str):
+        params = [_split_param(param) for param in params.split(';')[1:]]
+    table = {}
+    singletons = []
+    for param in params:
+        if len(param) == 1:
+            singletons += param
+        else:
+            table.setdefault(param[0].upper(), []).extend(param[1:])
+    return table, singletons
+
+def format_types(type_values, singletons):
+    """
+    Joins the TYPE values and the valueless parameters of a line (vCard 2.1 writes
+    TEL;WORK;VOICE) into one lower-case, comma separated string, or None.
+    """
+    types = [part.lower() for value in type_values for part in value.split(',') if part]
+    types += [singleton.lower() for singleton in singletons if singleton.upper() not in ENCODING_SINGLETONS]
+    return ','.join(types) or None
+
+def line_types(params):
+    table, singletons = parse_params(params)
+    return format_types(table.get('TYPE', ()), singletons)
+
+def decode_value(name, params, value):
+    """
+    Decodes the value of one content line like vobject's vCard 3.0 behavior does.
+
+    Args:
+        name (str): Upper-case property name.
+        params: The parameters of the line, see parse_params().
+        value (str): Everything after the colon.
+
+    Returns:
+        The decoded value: str, bytes for base64, a list for CATEGORIES and ORG,
+        and the formatted str() of vobject's Name and Address for N and ADR.
+    """
+    table, singletons = parse_params(params)
+
+    quoted_printable = False
+    if 'QUOTED-PRINTABLE' in table.get('ENCODING', ()):
+        quoted_printable = True
+        table['ENCODING'].remove('QUOTED-PRINTABLE')
+        if not table['ENCODING']:
+            del table['ENCODING']
+    if 'QUOTED-PRINTABLE' in singletons:
+        quoted_printable = True
+        singletons.remove('QUOTED-PRINTABLE')
+    if quoted_printable:
+        if 'ENCODING' in table:
+            raise UnsupportedCard("QUOTED-PRINTABLE combined with another encoding")
+        charset = table['CHARSET'][0] if 'CHARSET' in table else 'utf-8'
+        value = codecs.decode(value.encode('utf-8'), 'quoted-printable').decode(charset)
+
+    if name in RAW_PROPERTIES:
+        return value
+    if name == 'N':
+        fields = dict(zip(NAME_ORDER, split_fields(value)))
+        return ' '.join(_join(fields.get(field, ''), ' ')
+                        for field in ('prefix', 'given', 'additional', 'family', 'suffix'))
+    if name == 'ADR':
+        return _format_address(dict(zip(ADDRESS_ORDER, split_fields(value))))
+    if name == 'ORG':
+        return split_fields(value)
+    if name in LIST_PROPERTIES:
+        return text_values(value)
+    if name in ICALENDAR_TEXT_PROPERTIES:
+        encoding = table['ENCODING'][0] if 'ENCODING' in table else None
+        if encoding and encoding.upper() == 'BASE64':
+            return base64.b64decode(value)
+        return text_values(value)[0]
+
+    # vCard text; Apple exports a BASE64 singleton instead of ENCODING=b
+    if 'BASE64' in singletons:
+        encoding = 'B'
+    else:
+        encoding = table['ENCODING'][0] if 'ENCODING' in table else None
+    if encoding:
+        return codecs.decode(value.encode('utf-8'), 'base64')
+    return text_values(value)[0]
+
+def _split_param(param):
+    param_name, _, param_values = param.partition('=')
+    return [param_name] + [value for value in param_values.split(',') if value]
+
+def text_values(string, separator=',', escapable=ESCAPABLE_CHARS):
+    """
+    Splits a value at unescaped separators and removes the backslash escapes of
+    the characters in escapable, other escapes are kept as they are. A trailing
+    empty value is dropped, like vobject's stringToTextValues() does.
+    """
+    if '\\' not in string:
+        if separator not in string:
+            return [string]
+        values = string.split(separator)
+        if values[-1] == '':
+            values.pop()
+        return values
+
+    values = []
+    current = []
+    chars = iter(string)
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, None)
+            if escaped is None:
+                # vobject turns a trailing backslash into the text "\eof"
+                raise UnsupportedCard("Value ends with a backslash")
+            if escaped in escapable:
+                current.append('\n' if escaped in 'nN' else escaped)
+            else:
+                current.append('\\' + escaped)
+        elif char == separator:
+            values.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    if current or not values:
+        values.append(''.join(current))
+    return values
+
+def split_fields(string):
+    """Splits a structured value (N, ADR, ORG) into str or list of str fields."""
+    fields = []
+    for field in text_values(string, ';', ';'):
+        values = text_values(field)
+        fields.append(values[0] if len(values) == 1 else values)
+    return fields
+
+def _join(value, join_char):
+    return join_char.join(value) if isinstance(value, list) else value
+
+def _format_address(fields):
+    # Same layout as str() of vobject.vcard.Address
+    lines = '\n'.join(_join(fields[field], '\n')
+                      for field in ('box', 'extended', 'street') if fields.get(field))
+    lines += "\n{0!s}, {1!s} {2!s}".format(*(_join(fields.get(field, ''), ' ')
+                                             for field in ('city', 'region', 'code')))
+    if fields.get('country'):
+        lines += '\n' + _join(fields['country'], '\n')
+    return lines
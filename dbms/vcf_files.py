@@ -0,0 +1,277 @@
+import mmap
+import os
+import re
+
+from dbms import vcard_import, vcard_parser
+from dbms.connection import manager
+
+# Browsing .vcf files without importing them. Every file is scanned once through
+# a memory map and the byte range and FN of each card go into vcf_cards (see
+# migration 13). Selecting a card then reads and parses only its own bytes, so a
+# file of any size opens as fast as its index can be paged. The index is keyed by
+# path, size and mtime and is rebuilt when the file changes.
+
+# Name of the environment variable that sets the directory listed under "Files"
+VCF_DIR_ENV_VAR = 'CONTACTS_VCF_DIR'
+DEFAULT_VCF_DIR = 'vcf'
+
+# Number of vcf_cards rows written per executemany while scanning
+SCAN_BATCH_SIZE = 10_000
+
+# BEGIN:VCARD and END:VCARD lines, the same ones vcard_import.iter_vcard_texts() splits
+# at. Spelled out instead of re.IGNORECASE, which makes the search about twice as slow.
+_BOUNDARY_RE = re.compile(
+    rb'^[ \t]*([Bb][Ee][Gg][Ii][Nn]|[Ee][Nn][Dd]):[Vv][Cc][Aa][Rr][Dd][ \t]*\r?(?:\n|\Z)', re.MULTILINE
+)
+# An FN line with its folded continuation lines
+_FN_RE = re.compile(rb'^(?:[A-Za-z0-9_-]+\.)?FN[;:][^\r\n]*(?:\r?\n[ \t][^\r\n]*)*', re.MULTILINE | re.IGNORECASE)
+
+
+def get_vcf_dir():
+    """Returns the directory whose .vcf files are listed, CONTACTS_VCF_DIR or 'vcf'."""
+    return os.environ.get(VCF_DIR_ENV_VAR, DEFAULT_VCF_DIR)
+
+def list_files(directory=None):
+    """
+    Lists the .vcf files of a directory and registers new ones in vcf_files.
+
+    Files are only stat()ed here, they are scanned the first time they are opened.
+    A file whose size or mtime changed loses its index.
+
+    Args:
+        directory (str): Defaults to get_vcf_dir().
+
+    Returns:
+        list: (file_id, file name) tuples sorted by name, empty if the directory does not exist.
+    """
+    directory = directory or get_vcf_dir()
+    try:
+        entries = sorted((entry for entry in os.scandir(directory)
+                          if entry.is_file() and entry.name.lower().endswith('.vcf')),
+                         key=lambda entry: entry.name.lower())
+    except OSError as e:
+        print(f"Cannot list vCard directory {directory}: {e}")
+        return []
+
+    files = []
+    with manager.transaction() as conn:
+        for entry in entries:
+            stat = entry.stat()
+            files.append((_register_file(conn, os.path.abspath(entry.path), stat), entry.name))
+    return files
+
+def _register_file(conn, path, stat):
+    row = conn.execute("SELECT file_id, size, mtime FROM vcf_files WHERE path = ?", (path,)).fetchone()
+    if row is None:
+        return conn.execute(
+            "INSERT INTO vcf_files (path, size, mtime) VALUES (?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns)
+        ).lastrowid
+    file_id, size, mtime = row
+    if size != stat.st_size or mtime != stat.st_mtime_ns:
+        conn.execute("DELETE FROM vcf_cards WHERE file_id = ?", (file_id,))
+        conn.execute(
+            "UPDATE vcf_files SET size = ?, mtime = ?, card_count = NULL WHERE file_id = ?",
+            (stat.st_size, stat.st_mtime_ns, file_id)
+        )
+    return file_id
+
+def get_file(file_id):
+    """
+    Returns the vcf_files row of file_id as a dictionary (path, size, mtime,
+    card_count), card_count being None until the file was scanned, or None.
+    """
+    with manager.connection() as conn:
+        row = conn.execute(
+            "SELECT path, size, mtime, card_count FROM vcf_files WHERE file_id = ?", (file_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(('path', 'size', 'mtime', 'card_count'), row))
+
+def is_indexed(file_id):
+    """True if the file was scanned and has not changed on disk since."""
+    info = get_file(file_id)
+    if info is None or info['card_count'] is None:
+        return False
+    try:
+        stat = os.stat(info['path'])
+    except OSError:
+        return False
+    return stat.st_size == info['size'] and stat.st_mtime_ns == info['mtime']
+
+def index_file(file_id):
+    """
+    Scans a registered file if its index is missing or out of date.
+
+    Returns:
+        int: The number of cards in the file.
+    """
+    if is_indexed(file_id):
+        return get_file(file_id)['card_count']
+    path = get_file(file_id)['path']
+    stat = os.stat(path)
+
+    with manager.transaction() as conn:
+        conn.execute("DELETE FROM vcf_cards WHERE file_id = ?", (file_id,))
+        count = 0
+        batch = []
+        for card_index, (start, end, fn) in enumerate(scan_cards(path)):
+            batch.append((file_id, card_index, start, end - start, fn))
+            if len(batch) >= SCAN_BATCH_SIZE:
+                _insert_cards(conn, batch)
+                count += len(batch)
+                batch = []
+        _insert_cards(conn, batch)
+        count += len(batch)
+        conn.execute(
+            "UPDATE vcf_files SET size = ?, mtime = ?, card_count = ? WHERE file_id = ?",
+            (stat.st_size, stat.st_mtime_ns, count, file_id)
+        )
+    return count
+
+def _insert_cards(conn, rows):
+    if rows:
+        conn.executemany(
+            "INSERT INTO vcf_cards (file_id, card_index, byte_offset, byte_length, fn) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+def scan_cards(path):
+    """
+    Finds the cards of a .vcf file without decoding it.
+
+    The file is memory-mapped and searched with byte regular expressions, so the
+    operating system pages it in and out as needed. Cards nested in another card
+    (vCard 2.1 AGENT) stay part of their outer card, see vcard_import.is_agent_line().
+
+    A card without END:VCARD is reported and ends where the next card begins (or
+    at the end of the file), so the cards after it are still listed. Opening it
+    then shows that it cannot be parsed.
+
+    Yields:
+        tuple: (start, end, fn) with the byte offsets of the card, from BEGIN:VCARD
+        up to and including the line break after END:VCARD, and its decoded FN
+        (None if it has none).
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return # mmap cannot map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            depth = 0
+            start = None
+            fn = None
+            segment_start = 0
+            for match in _BOUNDARY_RE.finditer(mapped):
+                # Only the outer card's own lines are searched for its FN
+                if depth == 1 and fn is None:
+                    fn_match = _FN_RE.search(mapped, segment_start, match.start())
+                    if fn_match is not None:
+                        fn = decode_fn(fn_match.group())
+                if match.group(1).upper() == b'BEGIN':
+                    if depth > 0:
+                        line_start = mapped.rfind(b'\n', 0, max(match.start() - 1, 0)) + 1
+                        if not vcard_import.is_agent_line(mapped[line_start:match.start()]):
+                            print(f"The card at byte {start} of {path} has no END:VCARD.")
+                            yield start, match.start(), fn
+                            depth = 0
+                    if depth == 0:
+                        start = match.start()
+                        fn = None
+                    depth += 1
+                elif depth > 0: # END outside of a card is ignored, like vobject does
+                    depth -= 1
+                    if depth == 0:
+                        yield start, match.end(), fn
+                segment_start = match.end()
+            if depth > 0:
+                if depth == 1 and fn is None:
+                    fn_match = _FN_RE.search(mapped, segment_start)
+                    if fn_match is not None:
+                        fn = decode_fn(fn_match.group())
+                print(f"The card at byte {start} of {path} has no END:VCARD.")
+                yield start, len(mapped), fn
+
+def decode_fn(line):
+    """Decodes a raw (possibly folded) FN content line like the import would."""
+    # Most names need no decoding at all: no parameters, escapes, list separators or folds
+    if line.startswith(b'FN:') and b'\\' not in line and b',' not in line and b'\n' not in line:
+        return line[3:].decode('utf-8', errors='replace')
+    text = vcard_parser.unfold(line.decode('utf-8', errors='replace'))
+    try:
+        name, params, value = vcard_parser.split_line(text)
+        return vcard_parser.decode_value(name, params, value)
+    except Exception:
+        return text.partition(':')[2]
+
+def list_cards(file_id, after=None, limit=100):
+    """
+    Returns one page of a scanned file's cards in file order.
+
+    Args:
+        file_id (int): The file, see list_files().
+        after (int): card_index of the last card of the previous page, None for the first page.
+        limit (int): Maximum number of cards.
+
+    Returns:
+        list: (card_index, fn) tuples.
+    """
+    with manager.connection() as conn:
+        return conn.execute(
+            "SELECT card_index, fn FROM vcf_cards WHERE file_id = ? AND card_index > ? "
+            "ORDER BY card_index LIMIT ?",
+            (file_id, -1 if after is None else after, limit)
+        ).fetchall()
+
+def read_card_text(file_id, card_index):
+    """
+    Reads the text of one card straight from its file.
+
+    Returns:
+        str: The card, or None if the card does not exist or the file changed
+        since it was scanned (list_files() then drops the stale index).
+    """
+    with manager.connection() as conn:
+        row = conn.execute(
+            "SELECT f.path, f.size, f.mtime, c.byte_offset, c.byte_length FROM vcf_cards c "
+            "JOIN vcf_files f ON f.file_id = c.file_id WHERE c.file_id = ? AND c.card_index = ?",
+            (file_id, card_index)
+        ).fetchone()
+    if row is None:
+        return None
+    path, size, mtime, byte_offset, byte_length = row
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size != size or stat.st_mtime_ns != mtime:
+                print(f"{path} changed since it was indexed, refresh the file list.")
+                return None
+            f.seek(byte_offset)
+            return f.read(byte_length).decode('utf-8', errors='replace')
+    except OSError as e:
+        print(f"Cannot read card {card_index} of {path}: {e}")
+        return None
+
+def get_card_fields(file_id, card_index):
+    """
+    Parses one card of a file the way an import would, without writing anything.
+
+    Returns:
+        dict: Column name -> value for the persons columns plus the other, group
+        and role columns the card has values for, and 'contact_points' with its
+        (kind, type, raw) tuples. None if the card cannot be read or parsed.
+    """
+    text = read_card_text(file_id, card_index)
+    if text is None:
+        return None
+    try:
+        person, other, group, role, points = vcard_import.parse_cards(text)[0]
+    except Exception as e:
+        print(f"Cannot parse card {card_index} of file {file_id}: {e}")
+        return None
+
+    fields = dict(zip(vcard_import.PERSON_COLUMNS, person))
+    for columns, row in ((vcard_import.OTHER_COLUMNS, other), (vcard_import.GROUP_COLUMNS, group),
+                         (vcard_import.ROLE_COLUMNS, role)):
+        if row:
+            fields.update((column, value) for column, value in zip(columns, row) if column not in fields)
+    fields['contact_points'] = [(kind, types, raw) for kind, position, types, raw, normalized in points]
+    return fields
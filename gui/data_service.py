@@ -0,0 +1,204 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Runs the GUI's database work on worker threads, so a slow query or a write
+# waiting for a lock never freezes the window. Tk may only be used from the
+# thread running mainloop(): workers never touch a widget, finished requests go
+# into a queue that the Tk thread drains with after() and hands to callbacks.
+
+
+class DataService:
+    """
+    A small pool of worker threads for dbms calls, returning futures.
+
+    Reads run on the pool in parallel. Writes (submit(..., write=True)) all go
+    to one writer thread instead, so they run one after the other in the order
+    they were submitted: two quick saves of the same item can not overtake
+    each other.
+
+    A request can have a key such as "details". Submitting another request with
+    the same key makes the earlier one stale: if it has not started yet it is
+    cancelled, if it already ran its result is dropped. So after a quick series
+    of clicks only the answer to the last one reaches the widgets.
+
+    Every worker uses its own SQLite connection (see dbms.connection), in WAL mode
+    readers are never blocked by the writer.
+    """
+    WORKERS = 2
+    POLL_INTERVAL_MS = 15
+    # A request running longer than this gets its on_loading callback
+    LOADING_DELAY_MS = 150
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.root = None
+        self.tasks = queue.Queue()    # (future, func, args, kwargs), None stops a worker
+        self.writes = queue.Queue()   # The same for the writer thread
+        self.finished = queue.Queue() # (future, key, widget, on_done, on_error)
+        self.threads = []
+        self.writer = None
+        self.latest = {}              # key -> Future of the newest request with that key
+        self.waiting = []             # (deadline, future, key, widget, on_loading)
+
+    def start(self, root):
+        """Starts the workers and the writer, root is the widget whose after() delivers the results."""
+        self.root = root
+        if self.writer is None:
+            self.writer = self._start_thread(self.writes, "data-service-writer")
+        while len(self.threads) < self.workers:
+            self.threads.append(self._start_thread(self.tasks, f"data-service-{len(self.threads)}"))
+        root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def stop(self):
+        """
+        Cancels the reads that have not started and lets the workers end after
+        their current one. Writes are not dropped: this waits until the writer
+        has done all of them, their callbacks are not called anymore.
+        """
+        self.root = None
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                task[0].cancel()
+        for _ in self.threads:
+            self.tasks.put(None)
+        if self.writer is not None:
+            self.writes.put(None)
+            self.writer.join()
+        self.threads = []
+        self.writer = None
+        self.latest.clear()
+        self.waiting.clear()
+
+    def submit(self, func, *args, key=None, widget=None, on_done=None, on_error=None, on_loading=None,
+               write=False, **kwargs):
+        """
+        Runs func(*args, **kwargs) on a worker, or on the writer if write is True.
+
+        The callbacks are called on the Tk thread. Without a running service (in
+        scripts) func runs right away and so do the callbacks.
+
+        Args:
+            func: The work, it must not use Tk.
+            key (str): Requests with the same key replace each other, see the class.
+            widget: The callbacks are skipped once this widget is destroyed.
+            on_done: Called with func's result.
+            on_error: Called with the exception func raised, by default it is printed.
+            on_loading: Called without arguments if the request is still running
+                after LOADING_DELAY_MS, to show that something is coming.
+            write (bool): func changes the database. Writes run one at a time in
+                submission order.
+
+        Returns:
+            Future: The request, e.g. to check is_current() or cancel() it.
+        """
+        future = Future()
+        if key is not None:
+            self.cancel(key)
+            self.latest[key] = future
+
+        if self.root is None:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            self._deliver(future, key, widget, on_done, on_error)
+            return future
+
+        future.add_done_callback(lambda done: self.finished.put((done, key, widget, on_done, on_error)))
+        if on_loading is not None:
+            deadline = time.monotonic() + self.LOADING_DELAY_MS / 1000
+            self.waiting.append((deadline, future, key, widget, on_loading))
+        (self.writes if write else self.tasks).put((future, func, args, kwargs))
+        return future
+
+    def cancel(self, key):
+        """Makes the latest request with key stale, e.g. when its view was left."""
+        previous = self.latest.pop(key, None)
+        if previous is not None:
+            previous.cancel() # Only works if it has not started, else its result is dropped
+
+    def is_current(self, future, key):
+        """True if future is the newest request of key and its result will be delivered."""
+        return future is not None and self.latest.get(key) is future
+
+    def _start_thread(self, tasks, name):
+        thread = threading.Thread(target=self._work, args=(tasks,), name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def _work(self, tasks):
+        """Worker or writer thread: runs the requests of tasks until it gets None."""
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            future, func, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue # Cancelled while it was queued
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _poll(self):
+        if self.root is None:
+            return
+        try:
+            while True:
+                self._deliver(*self.finished.get_nowait())
+        except queue.Empty:
+            pass
+
+        if self.waiting:
+            now = time.monotonic()
+            still_waiting = []
+            for entry in self.waiting:
+                deadline, future, key, widget, on_loading = entry
+                if future.done() or (key is not None and not self.is_current(future, key)):
+                    continue
+                if deadline > now:
+                    still_waiting.append(entry)
+                elif widget is None or widget.winfo_exists():
+                    self._call(on_loading)
+            self.waiting = still_waiting
+
+        self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _deliver(self, future, key, widget, on_done, on_error):
+        # Stale and cancelled requests and those of destroyed widgets are dropped
+        if future.cancelled():
+            return
+        if key is not None:
+            if not self.is_current(future, key):
+                return
+            del self.latest[key]
+        if widget is not None and not widget.winfo_exists():
+            return
+
+        error = future.exception()
+        if error is None:
+            if on_done is not None:
+                self._call(on_done, future.result())
+        elif on_error is not None:
+            self._call(on_error, error)
+        else:
+            print(f"Error in background database request: {error}")
+
+    @staticmethod
+    def _call(callback, *args):
+        # A failing callback must not stop the delivery of the others
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Error in data service callback {callback}: {e}")
+
+
+# The service of the running App, see App.__init__()
+service = DataService()
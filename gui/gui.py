@@ -1,13 +1,16 @@
 import customtkinter as ctk
 import tkinter as tk
-from collections import OrderedDict
 from tkinter import filedialog, messagebox
 import base64
 import io
+import queue
+import threading
 from PIL import Image, ImageTk
 
-from dbms import dbms
-from dbms.vcard_import import import_vcard
+from dbms import changes, dbms, schema, vcf_files
+from dbms.vcard_import import ImportCancelled, import_vcard
+from gui.data_service import service
+from gui.virtual_list import ListSource, PagedItemSource, VirtualList
 
 
 # --- CategorySidebar Class (Leftmost Sidebar: Persons, Groups, Files) ---
@@ -62,16 +65,42 @@ class CategorySidebar(ctk.CTkFrame):
 
 
     def _clear_all_data(self):
+        if ImportProgressDialog.blocks_writes():
+            return
         if messagebox.askyesno("Confirm", "Really delete all data?"):
-            dbms.clear_tables()
-            messagebox.showinfo("Success", "All data deleted!")
-            self.on_category_selected_callback(self.current_selection.get())
+            self._run_data_task(dbms.clear_tables, "All data deleted!")
 
     def _generate_test_data(self):
-        dbms.generate_test_data()
-        messagebox.showinfo("Success", "Test data generated!")
+        if ImportProgressDialog.blocks_writes():
+            return
+        self._run_data_task(dbms.generate_test_data, "Test data generated!")
+
+    def _run_data_task(self, func, success_text):
+        """Runs func on the data service, its buttons are disabled until it is done."""
+        self._set_data_buttons_state("disabled")
+        service.submit(func, widget=self, write=True,
+                       on_done=lambda result: self._data_task_done(success_text),
+                       on_error=self._data_task_failed)
+
+    def _data_task_done(self, success_text):
+        self._set_data_buttons_state("normal")
+        messagebox.showinfo("Success", success_text)
         self.on_category_selected_callback(self.current_selection.get())
 
+    def _data_task_failed(self, error):
+        self._set_data_buttons_state("normal")
+        print(f"Error changing the data: {error}")
+        messagebox.showerror("Error", f"The data could not be changed: {error}")
+
+    def _set_data_buttons_state(self, state):
+        self.clear_data_button.configure(state=state)
+        self.generate_data_button.configure(state=state)
+
+    def set_writes_state(self, state):
+        """Enables or disables the buttons that change the data, see App.set_writes_state()."""
+        self._set_data_buttons_state(state)
+        self.import_button.configure(state=state)
+
     def _select_category(self, category_text):
         """Internal method to handle category selection and update appearance."""
         if self.current_selection.get() != category_text: # Only update if selection changed
@@ -123,10 +152,8 @@ class ActionBar(ctk.CTkFrame):
         current_category = self.current_category_getter()
         if current_category and current_category != "Files": # Cannot add "Files"
             # Create Window
-            add_window = ExternalWindow(self.master.master, mode="Add", category=current_category)
-            # When the external window closes, refresh the list
-            self.master.master.wait_window(add_window)
-            self._refresh_action() # Refresh after window closes
+            # The new item shows up in the list through the change notification of its save
+            ExternalWindow(self.master.master, mode="Add", category=current_category)
         else:
             messagebox.showinfo("Cannot Add", "Cannot add items to 'Files' category or no category selected.")
 
@@ -137,12 +164,8 @@ class ActionBar(ctk.CTkFrame):
         
         if current_category and selected_item_id != 0 and current_category != "Files":
             # Create Window
-            edit_window = ExternalWindow(self.master.master, mode="Edit", category=current_category, item_id=selected_item_id)
-            # When the external window closes, refresh the list and update main content
-            self.master.master.wait_window(edit_window)
-            self._refresh_action() # Refresh after window closes
-            # Re-select the item to update its details in MainContentFrame
-            self.master.on_item_selected_callback(current_category, selected_item_id)
+            # Saving relabels the item's row and redraws its details, see DetailSidebar.apply_change
+            ExternalWindow(self.master.master, mode="Edit", category=current_category, item_id=selected_item_id)
         else:
             messagebox.showinfo("Cannot Edit", "Please select a person or group to edit.")
 
@@ -153,40 +176,55 @@ class ActionBar(ctk.CTkFrame):
         selected_item_id = self.master.current_item_selection.get()
 
         if current_category and selected_item_id != 0 and current_category.lower() != "files":
-            # Get item name for confirmation message
-            item_data = dbms.get_item_data(current_category.lower(), selected_item_id)
-            item_name = ""
-            if item_data:
-                # Prioritize 'fn' for persons, 'title' for groups
-                item_name = item_data.get('fn') or item_data.get('title')
-            
-            if not item_name: # Fallback if no specific name attribute found
-                item_name = f"{current_category[:-1].capitalize()} ID: {selected_item_id}"
-
-            if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{item_name}'?"):
-                try:
-                    # Call the database function to delete the item
-                    dbms.delete_item(current_category.lower(), selected_item_id)
-                    messagebox.showinfo("Delete Success", f"'{item_name}' deleted successfully.")
-                    
-                    # Refresh the list in DetailSidebar to remove the deleted item
-                    self._refresh_action() 
-                    
-                    # Notify MainContentFrame that the item is deleted, so it clears its display
-                    self.master.on_item_selected_callback(current_category, None) 
-                except Exception as e:
-                    messagebox.showerror("Delete Error", f"Failed to delete '{item_name}': {e}")
-                    print(f"Error deleting item {item_name} (ID: {selected_item_id}) from {current_category}: {e}")
+            # Get item name ('fn' for persons, 'title' for groups) for confirmation message
+            service.submit(dbms.get_item_name, current_category.lower(), selected_item_id, widget=self,
+                           on_done=lambda item_name: self._confirm_delete(current_category, selected_item_id, item_name))
         else:
             messagebox.showinfo("Cannot Delete", "Please select a person or group to delete.")
 
+    def _confirm_delete(self, current_category, selected_item_id, item_name):
+        if not item_name: # Fallback if no specific name attribute found
+            item_name = f"{current_category[:-1].capitalize()} ID: {selected_item_id}"
+
+        if ImportProgressDialog.blocks_writes():
+            return
+        if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{item_name}'?"):
+            # Call the database function to delete the item
+            # The list drops the row and selects its neighbour once the change arrives
+            service.submit(
+                dbms.delete_item, current_category.lower(), selected_item_id, widget=self, write=True,
+                on_done=lambda deleted: self._deleted(current_category, selected_item_id, item_name, deleted),
+                on_error=lambda e: self._delete_failed(current_category, selected_item_id, item_name, e)
+            )
+
+    def _deleted(self, current_category, selected_item_id, item_name, deleted):
+        if deleted:
+            messagebox.showinfo("Delete Success", f"'{item_name}' deleted successfully.")
+        else:
+            self._delete_failed(current_category, selected_item_id, item_name, "it no longer exists.")
+
+    def _delete_failed(self, current_category, selected_item_id, item_name, e):
+        messagebox.showerror("Delete Error", f"Failed to delete '{item_name}': {e}")
+        print(f"Error deleting item {item_name} (ID: {selected_item_id}) from {current_category}: {e}")
+
     def _refresh_action(self):
         print("Refresh action triggered.")
         if self.on_refresh_callback:
             self.on_refresh_callback()
 
+    def set_writes_state(self, state):
+        """Enables or disables the buttons that change the data, Refresh stays usable."""
+        for button in (self.add_button, self.edit_button, self.delete_button):
+            button.configure(state=state)
+
 
 class DetailSidebar(ctk.CTkFrame):
+    FILTER_DELAY_MS = 150        # Typing pause after which the filter query runs
+    FILTER_MATCHES = 100         # Rows listed for a filter
+    FILTER_COUNT_LIMIT = 10_000  # Matches beyond this are shown as "10000+"
+    # Label of the filter mode button -> mode of dbms.filter_items()
+    FILTER_MODES = {"Starts with": "prefix", "Words": "words"}
+
     def __init__(self, master, on_item_selected_callback):
         super().__init__(master, width=200, corner_radius=0)
         self.grid(row=0, column=1, sticky="nswe")
@@ -195,8 +233,8 @@ class DetailSidebar(ctk.CTkFrame):
         self.on_item_selected_callback = on_item_selected_callback
         self.current_category = None
         self.current_item_selection = ctk.IntVar(value=0) # Stores the ID of the selected item
-
-        self.item_buttons = []
+        self.loading_source = None # Future of the list being read, see update_content()
+        self.loading_selection = 0 # Item to select again once it is read
 
         # Add a title label for the sidebar
         self.title_label = ctk.CTkLabel(self, text="Items", font=ctk.CTkFont(size=16, weight="bold"))
@@ -209,15 +247,33 @@ class DetailSidebar(ctk.CTkFrame):
                                     on_refresh_callback=lambda: self.update_content(self.current_category, force_update=True))
         self.action_bar.grid(row=1, column=0, padx=5, pady=(5, 0), sticky="ew")
 
-        # Frame to hold scrollable items (now in row=2)
-        self.scrollable_frame = ctk.CTkScrollableFrame(self, fg_color="transparent")
-        self.scrollable_frame.grid(row=2, column=0, sticky="nswe", padx=5, pady=5)
-        self.scrollable_frame.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(2, weight=1) # Make scrollable frame expand vertically
-
-        # Placeholder label
-        self.placeholder_label = ctk.CTkLabel(self.scrollable_frame, text="Select a category...")
-        self.placeholder_label.pack(expand=True)
+        # Filter box (row=2): lists only the names matching what is typed, the
+        # query runs once typing pauses for FILTER_DELAY_MS
+        self.filter_bar = ctk.CTkFrame(self, fg_color="transparent")
+        self.filter_bar.grid(row=2, column=0, padx=5, pady=(5, 0), sticky="ew")
+        self.filter_bar.grid_columnconfigure(0, weight=1)
+        self.filter_entry = ctk.CTkEntry(self.filter_bar, placeholder_text="Filter by name...")
+        self.filter_entry.grid(row=0, column=0, sticky="ew")
+        self.filter_entry.bind("<KeyRelease>", lambda event: self._schedule_filter())
+        self.filter_entry.bind("<Escape>", lambda event: self._clear_filter())
+        self.filter_mode = ctk.CTkSegmentedButton(self.filter_bar, values=list(self.FILTER_MODES),
+                                                  command=lambda value: self._schedule_filter(delay=0))
+        self.filter_mode.set("Starts with")
+        self.filter_mode.grid(row=1, column=0, pady=(3, 0), sticky="ew")
+        self.filter_count_label = ctk.CTkLabel(self.filter_bar, text="", text_color="gray", height=18)
+        self.filter_count_label.grid(row=2, column=0, sticky="w")
+        self.filter_job = None # after() id of the filter waiting for typing to pause
+        self.applied_filter = ("", "prefix") # (text, mode) the list was read with
+
+        # The items (now in row=3): only the rows in view have widgets, however long the list is
+        self.item_list = VirtualList(self, on_select=self._select_item, fg_color="transparent")
+        self.item_list.grid(row=3, column=0, sticky="nswe", padx=5, pady=5)
+        self.grid_rowconfigure(3, weight=1) # Make the list expand vertically
+
+        # Placeholder label, shown instead of the list
+        self.placeholder_label = ctk.CTkLabel(self, text="Select a category...", wraplength=180)
+        self.placeholder_label.grid(row=3, column=0, padx=5, pady=5)
+        self.item_list.grid_remove()
 
 
     def update_content(self, category_name, force_update=False):
@@ -231,68 +287,175 @@ class DetailSidebar(ctk.CTkFrame):
         self.current_category = category_name
         
         # Preserve selected item if it exists in the new list, otherwise reset
-        previous_selection_id = self.current_item_selection.get()
+        previous_selection_id = self.current_item_selection.get() or self.loading_selection
         self.current_item_selection.set(0) # Reset before re-populating
+        self.loading_selection = previous_selection_id
 
-        # Clear existing buttons
-        for button in self.item_buttons:
-            button.destroy()
-        self.item_buttons.clear()
+        # Files are not filtered, their list is short
+        if category_name == "Files":
+            self.filter_bar.grid_remove()
+            self.applied_filter = ("", "prefix")
+        else:
+            self.filter_bar.grid()
+            self.applied_filter = self._current_filter()
+
+        # The list is read on the data service, a newer request replaces this one,
+        # so of a quick series of filter queries only the last one is shown
+        self.loading_source = service.submit(
+            self._load_source, category_name, previous_selection_id, *self.applied_filter,
+            key="item_list", widget=self,
+            on_done=lambda result: self._show_source(category_name, *result),
+            on_loading=lambda: self._show_placeholder("Loading...")
+        )
 
-        # Remove placeholder if present
-        if self.placeholder_label:
-            self.placeholder_label.destroy()
-            self.placeholder_label = None
+    @classmethod
+    def _load_source(cls, category_name, previous_selection_id, filter_text="", filter_mode="prefix"):
+        """
+        Worker thread: builds the list's source and reads its first rows, never touches Tk.
 
-        items = OrderedDict()
-        if category_name != "Files": # Only query DB for Persons/Groups
-            items = dbms.get_all_items_ids_and_names(category_name)
+        Returns:
+            tuple: (source, position of previous_selection_id in it or None,
+            number of filter matches or None without a filter).
+        """
+        match_count = None
+        if category_name == "Files":
+            # The .vcf files of CONTACTS_VCF_DIR, they are only scanned once opened
+            source = ListSource(vcf_files.list_files())
+        elif filter_text:
+            # The first matches only, with a count of all of them up to a limit
+            rows, match_count = dbms.filter_items(category_name, filter_text, filter_mode,
+                                                  cls.FILTER_MATCHES, cls.FILTER_COUNT_LIMIT)
+            source = ListSource(rows)
         else:
-            # For "Files" category, you might list actual files or have mock data
-            # For this example, we'll just show a message.
-            self.placeholder_label = ctk.CTkLabel(self.scrollable_frame, text="File listing not implemented yet.")
-            self.placeholder_label.pack(expand=True)
-            self.on_item_selected_callback(self.current_category, None) # Notify App no item selected
-            return
+            # Rows are read page by page in name order as they scroll into view
+            source = PagedItemSource(category_name)
+            source.rows_between(0, PagedItemSource.PAGE_SIZE)
+        position = source.index_of(previous_selection_id) if previous_selection_id and len(source) else None
+        return source, position, match_count
+
+    def _current_filter(self):
+        return self.filter_entry.get().strip(), self.FILTER_MODES[self.filter_mode.get()]
+
+    def _schedule_filter(self, delay=None):
+        """Filters the list once typing pauses, every keystroke starts the wait anew."""
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(self.FILTER_DELAY_MS if delay is None else delay, self._apply_filter)
+
+    def _apply_filter(self):
+        self.filter_job = None
+        # Keys that do not change the text (arrows, shift, ...) cause no query
+        if self.current_category not in (None, "Files") and self._current_filter() != self.applied_filter:
+            self.update_content(self.current_category, force_update=True)
+
+    def _clear_filter(self):
+        self.filter_entry.delete(0, "end")
+        self._schedule_filter(delay=0)
+
+    def _show_filter_count(self, shown, match_count):
+        if match_count is None:
+            text = ""
+        elif match_count > shown:
+            more = "+" if match_count >= self.FILTER_COUNT_LIMIT else ""
+            text = f"First {shown} of {match_count}{more} matches"
+        else:
+            text = f"{match_count} match{'es' if match_count != 1 else ''}"
+        self.filter_count_label.configure(text=text)
+
+    def _show_placeholder(self, text):
+        self.item_list.grid_remove()
+        self.placeholder_label.configure(text=text)
+        self.placeholder_label.grid()
+
+    def _show_source(self, category_name, source, position, match_count):
+        """Shows the rows _load_source() read."""
+        previous_selection_id = self.loading_selection
+        self.loading_source = None
+        self.loading_selection = 0
+        self._show_filter_count(len(source), match_count)
 
         # If no items found, display placeholder message
-        if not items:
-            self.placeholder_label = ctk.CTkLabel(self.scrollable_frame, text=f"No {category_name.lower()} found.")
-            self.placeholder_label.pack(expand=True)
+        if len(source) == 0:
+            if category_name == "Files":
+                empty_text = f"No .vcf files in '{vcf_files.get_vcf_dir()}'."
+            elif match_count is not None:
+                empty_text = f"No {category_name.lower()} match '{self.applied_filter[0]}'."
+            else:
+                empty_text = f"No {category_name.lower()} found."
+            self.item_list.set_source(ListSource(()))
+            self._show_placeholder(empty_text)
             self.on_item_selected_callback(self.current_category, None) # Notify App no item selected
             return
 
-        # Create buttons for each item in the selected category
-        selected_item_found = False
-        for item_id, item_text in items.items():
-            button = ctk.CTkButton(
-                self.scrollable_frame,
-                text=item_text,
-                command=lambda id=item_id: self._select_item(id),
-                height=30,
-                fg_color="transparent",
-                hover_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"],
-                text_color=ctk.ThemeManager.theme["CTkButton"]["text_color"]
-            )
-            button.item_id = item_id  # Store item_id in button for reference
-            button.pack(fill="x", padx=2, pady=1) # fill="x" makes it fill horizontal space
-            self.item_buttons.append(button)
-
-            if item_id == previous_selection_id:
-                self.current_item_selection.set(item_id)
-                selected_item_found = True
+        self.placeholder_label.grid_remove()
+        self.item_list.grid()
+        if isinstance(source, PagedItemSource):
+            source.read = self._read_rows # Pages scrolled into view are read on the data service
+        self.item_list.set_source(source)
 
         # Automatically select the first item in the new category or re-select previous
-        if items:
-            if not selected_item_found:
-                first_item_id = next(iter(items))
-                self._select_item(first_item_id)
-            else:
-                self._select_item(self.current_item_selection.get()) # Trigger update for display
+        if position is None:
+            self._select_item(source.rows_between(0, 1)[0][0])
         else:
-            self.on_item_selected_callback(self.current_category, None)
+            self.item_list.scroll_to(position)
+            self._select_item(previous_selection_id)
 
 
+    def apply_change(self, change):
+        """
+        Applies a changes.Change to the list if it is about the shown category:
+        only the rows that were added, removed or renamed are repainted. If the
+        selected item was deleted its neighbour is selected, if it was changed
+        its details are shown again.
+        """
+        if self.current_category is None or change.category != self.current_category.lower():
+            return
+        if service.is_current(self.loading_source, "item_list"):
+            # The list may have been read before the change, read it again
+            self.update_content(self.current_category, force_update=True)
+            return
+        source = self.item_list.source
+        if not isinstance(source, PagedItemSource):
+            # The empty list's placeholder or a filter's matches are showing, read them again
+            self.update_content(self.current_category, force_update=True)
+            return
+
+        if change.reset:
+            # Too much changed to merge, the selected item is selected again if it is still there
+            self.update_content(self.current_category, force_update=True)
+            return
+
+        selected_id = self.current_item_selection.get()
+        selected_index = source.index_of(selected_id) if selected_id in change.deleted else None
+        source.apply(change, on_done=lambda: self._change_applied(source, change, selected_id, selected_index))
+
+    def _change_applied(self, source, change, selected_id, selected_index):
+        """Called once the shown source merged a change, see apply_change()."""
+        if self.item_list.source is not source: # Another list was opened meanwhile
+            return
+        if len(source) == 0:
+            self.update_content(self.current_category, force_update=True) # Shows the placeholder
+        elif selected_id in change.deleted:
+            def select_neighbour(row):
+                if row is not None and self.item_list.source is source:
+                    self._select_item(row[0])
+            source.row_at(min(selected_index or 0, len(source) - 1), select_neighbour)
+        elif selected_id in change.updated:
+            self.on_item_selected_callback(self.current_category, selected_id) # Show the new details
+
+    def _read_rows(self, func, *args, on_done, on_error=None, **kwargs):
+        """
+        The reader of the shown PagedItemSource: runs its reads on the data
+        service and redraws the list once a result is merged.
+        """
+        def then_refresh(callback):
+            def deliver(value):
+                callback(value)
+                self.item_list.refresh()
+            return deliver
+        service.submit(func, *args, widget=self, on_done=then_refresh(on_done),
+                       on_error=then_refresh(on_error) if on_error is not None else None, **kwargs)
+
     def _select_item(self, item_id):
         """Internal method to handle item selection and update appearance."""
         if self.current_item_selection.get() == item_id: # Avoid re-selection if already selected
@@ -300,20 +463,9 @@ class DetailSidebar(ctk.CTkFrame):
 
         print(f"Item Selected: {item_id} from {self.current_category}")
         self.current_item_selection.set(item_id)
-        self._update_button_appearance()
+        self.item_list.select(item_id) # Repaints only the old and the new row
         self.on_item_selected_callback(self.current_category, item_id) # Notify the App class
 
-    def _update_button_appearance(self):
-        """Updates the background color of item buttons based on current_item_selection."""
-        selected_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
-        deselected_color = "transparent"
-
-        for button in self.item_buttons:
-            if getattr(button, "item_id") == self.current_item_selection.get():
-                button.configure(fg_color=selected_color)
-            else:
-                button.configure(fg_color=deselected_color)
-
 
 # --- MainContentFrame Class ---
 class AssignmentWindow(ctk.CTkToplevel):
@@ -353,39 +505,59 @@ class AssignmentWindow(ctk.CTkToplevel):
         """Creates the widgets for the assignment window."""
         self.scrollable_frame = ctk.CTkScrollableFrame(self, label_text=f"Select {self.category_to_assign}:")
         self.scrollable_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.loading_label = ctk.CTkLabel(self.scrollable_frame, text="Loading...")
+        self.loading_label.pack(anchor="w", padx=5, pady=2)
 
-        all_items = dbms.get_all_items_ids_and_names(self.category_to_assign)
-        
-        if self.current_category == "Persons":
-            assigned_items = set(id for id, _ in dbms.get_groups_for_person(self.item_id))
-        elif self.current_category == "Groups":
-            assigned_items = set(id for id, _ in dbms.get_persons_for_group(self.item_id))
+        # Enabled once the choices are shown
+        self.save_button = ctk.CTkButton(self, text="Save Assignments", command=self._save_assignments,
+                                         state="disabled")
+        self.save_button.pack(pady=10)
+
+        service.submit(self._load_choices, self.current_category, self.item_id, self.category_to_assign,
+                       widget=self, on_done=self._show_choices)
+
+    @staticmethod
+    def _load_choices(current_category, item_id, category_to_assign):
+        """
+        Worker thread: reads the items to choose from, never touches Tk.
+
+        Returns:
+            tuple: (ids assigned now, list of (id, name) of all items).
+        """
+        if current_category == "Persons":
+            assigned_items = set(id for id, _ in dbms.get_groups_for_person(item_id))
+        elif current_category == "Groups":
+            assigned_items = set(id for id, _ in dbms.get_persons_for_group(item_id))
         else:
             assigned_items = set() # Should not happen with current logic
+        return assigned_items, list(dbms.iter_items(category_to_assign))
 
-        for item_id, item_name in all_items.items():
+    def _show_choices(self, choices):
+        assigned_items, items = choices
+        self.loading_label.destroy()
+        for item_id, item_name in items:
             var = ctk.BooleanVar(value=(item_id in assigned_items))
             chk = ctk.CTkCheckBox(self.scrollable_frame, text=item_name, variable=var)
             chk.pack(anchor="w", padx=5, pady=2)
             self.vars[item_id] = var
-
-        save_button = ctk.CTkButton(self, text="Save Assignments", command=self._save_assignments)
-        save_button.pack(pady=10)
+        self.save_button.configure(state="normal")
 
     def _save_assignments(self):
         """Saves the assignments based on checkbox states."""
-        for item_id_to_assign, var in self.vars.items():
-            if self.current_category == "Persons":
-                if var.get():
-                    dbms.assign_person_to_group(self.item_id, item_id_to_assign)
-                else:
-                    dbms.remove_person_from_group(self.item_id, item_id_to_assign)
-            elif self.current_category == "Groups":
-                if var.get():
-                    dbms.assign_person_to_group(item_id_to_assign, self.item_id)
-                else:
-                    dbms.remove_person_from_group(item_id_to_assign, self.item_id)
-        
+        # Only the memberships that actually changed are written, in one transaction
+        if ImportProgressDialog.blocks_writes():
+            return
+        checked_ids = [item_id for item_id, var in self.vars.items() if var.get()]
+        self.save_button.configure(state="disabled", text="Saving...")
+        service.submit(dbms.sync_memberships, self.current_category, self.item_id, checked_ids, widget=self,
+                       write=True, on_done=self._assignments_saved, on_error=self._save_failed)
+
+    def _save_failed(self, error):
+        print(f"Error saving assignments of {self.current_category} ID {self.item_id}: {error}")
+        messagebox.showerror("Assignment Error", f"Failed to save assignments: {error}")
+        self.save_button.configure(state="normal", text="Save Assignments")
+
+    def _assignments_saved(self, result):
         messagebox.showinfo("Assignment Saved", "Assignments updated successfully!")
         self.destroy() # Close the Toplevel window
 
@@ -393,6 +565,124 @@ class AssignmentWindow(ctk.CTkToplevel):
         if self.refresh_callback:
             self.refresh_callback(self.current_category, self.item_id)
 
+class ImportProgressDialog(ctk.CTkToplevel):
+    """
+    Runs a vCard import on a worker thread and shows its progress.
+
+    The worker never touches Tk, it only puts messages into a queue that the dialog
+    polls with after(). The import runs atomically, so Cancel rolls it back completely.
+    It holds SQLite's write lock until it commits, so the GUI makes no writes
+    meanwhile, see blocks_writes().
+    """
+    POLL_INTERVAL_MS = 100
+
+    running = None # The dialog of the import in progress
+
+    @classmethod
+    def blocks_writes(cls):
+        """
+        Returns True, after telling the user, while an import runs: a write would
+        wait for the import's lock and fail after busy_timeout.
+        """
+        if cls.running is None:
+            return False
+        messagebox.showinfo("Import Running", "A vCard import is running, please try again once it is done.")
+        return True
+
+    def __init__(self, master, vcf_path, on_finished):
+        """
+        Args:
+            master: The parent widget (the App).
+            vcf_path: Path of the .vcf file to import.
+            on_finished: Called on the main thread with ("done", import_vcard's counts),
+                ("cancelled", message) or ("error", exception) once the import ended.
+        """
+        super().__init__(master)
+        self.on_finished = on_finished
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        ImportProgressDialog.running = self
+
+        self.title("Importing vCards")
+        self.geometry("460x170")
+        self.resizable(False, False)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.file_label = ctk.CTkLabel(self, text=f"Importing {vcf_path}", wraplength=420, justify="left")
+        self.file_label.grid(row=0, column=0, padx=20, pady=(15, 5), sticky="w")
+        self.progress_bar = ctk.CTkProgressBar(self)
+        self.progress_bar.set(0)
+        self.progress_bar.grid(row=1, column=0, padx=20, pady=5, sticky="ew")
+        self.status_label = ctk.CTkLabel(self, text="Starting...")
+        self.status_label.grid(row=2, column=0, padx=20, pady=5, sticky="w")
+        self.cancel_button = ctk.CTkButton(self, text="Cancel", command=self._cancel,
+                                           fg_color="gray", hover_color="darkgray")
+        self.cancel_button.grid(row=3, column=0, padx=20, pady=(5, 15))
+
+        self.protocol("WM_DELETE_WINDOW", self._cancel) # Closing the window cancels the import
+        self.transient(master)
+        self.grab_set()
+
+        self.worker = threading.Thread(target=self._run_import, args=(vcf_path,), daemon=True)
+        self.worker.start()
+        self.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _run_import(self, vcf_path):
+        """Worker thread: runs the import and reports back through the queue."""
+        try:
+            # Re-importing an export only adds the new cards and updates the changed ones
+            counts = import_vcard(vcf_path, atomic=True, upsert=True, cancel_event=self.cancel_event,
+                                  progress=lambda info: self.messages.put(("progress", info)))
+            self.messages.put(("done", counts))
+        except ImportCancelled as e:
+            self.messages.put(("cancelled", str(e)))
+        except Exception as e:
+            print(f"Error importing vCard: {e}")
+            self.messages.put(("error", e))
+
+    def _poll(self):
+        """Applies the worker's messages, only the latest progress is drawn."""
+        latest_progress = None
+        try:
+            while True:
+                kind, payload = self.messages.get_nowait()
+                if kind == "progress":
+                    latest_progress = payload
+                else:
+                    self._finish(kind, payload)
+                    return
+        except queue.Empty:
+            pass
+        if latest_progress is not None and not self.cancel_event.is_set():
+            self._show_progress(latest_progress)
+        self.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _show_progress(self, info):
+        fraction = info["bytes_done"] / info["bytes_total"] if info["bytes_total"] else 1.0
+        self.progress_bar.set(fraction)
+        text = (f"{info['cards']} cards, {info['bytes_done'] / 1e6:.1f} of {info['bytes_total'] / 1e6:.1f} MB, "
+                f"{info['cards_per_sec']:.0f} cards/s")
+        if fraction >= 1.0:
+            text += ", saving..."
+        elif info["eta_seconds"] is not None:
+            minutes, seconds = divmod(int(info["eta_seconds"]), 60)
+            text += f", about {minutes}:{seconds:02d} left"
+        self.status_label.configure(text=text)
+
+    def _cancel(self):
+        if self.cancel_event.is_set():
+            return
+        self.cancel_event.set()
+        self.cancel_button.configure(state="disabled")
+        self.status_label.configure(text="Cancelling, nothing will be imported...")
+
+    def _finish(self, kind, payload):
+        ImportProgressDialog.running = None
+        self.grab_release()
+        self.destroy()
+        self.on_finished(kind, payload)
+
+
 class MainContentFrame(ctk.CTkFrame):
     """
     This frame displays the detailed attributes of a selected item (person or group).
@@ -419,165 +709,146 @@ class MainContentFrame(ctk.CTkFrame):
         )
         self.placeholder_label.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
 
-        # Define assign button
-        self.assign_btn = None
-        
-        # This will hold the CTkScrollableFrame for item details
+        # This will hold the ItemDetailFrame or FileBrowserFrame shown
         self.details_scroll_frame = None
 
-        # Attribute display name mapping for friendly labels
-        self.attribute_display_names = {
-            "fn": "First Name", "n": "Last Name", "nickname": "Nickname",
-            "photo": "Photo", "bday": "Birthday", "anniversary": "Anniversary",
-            "gender": "Gender", "adr": "Address", "tel": "Telephone",
-            "email": "Email", "impp": "Instant Messenger", "lang": "Language",
-            "tz": "Time Zone", "geo": "Geolocation", "note": "Notes",
-            "title": "Group Title", "logo": "Group Logo", "org": "Organization",
-            "related": "Related Information", "url": "Website URL"
-        }
+        # category -> ItemDetailFrame, created once per table schema and reused
+        # for every item of that category
+        self.detail_views = {}
 
     def _clear_content(self):
-        """Clears all dynamically created content within the MainContentFrame."""
-        if self.details_scroll_frame:
+        """Hides the detail view or destroys the file browser and shows the placeholder."""
+        if isinstance(self.details_scroll_frame, ItemDetailFrame):
+            # Kept for the next item of its category, see _get_detail_view()
+            self.details_scroll_frame.grid_remove()
+        elif self.details_scroll_frame:
             self.details_scroll_frame.destroy()
-            self.details_scroll_frame = None
+        self.details_scroll_frame = None
         
         # Ensure placeholder is visible and packed when no item is selected
         if self.placeholder_label:
             self.placeholder_label.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
 
+    def _show_frame(self, frame):
+        # Puts frame in place of the placeholder or the previous view, unless it is shown already
+        if self.details_scroll_frame is frame:
+            return
+        self._clear_content()
+        self.placeholder_label.grid_forget()
+        self.details_scroll_frame = frame
+        frame.grid(row=0, column=0, padx=20, pady=(10, 5), sticky="nsew")
+
+    def _get_detail_view(self, category, table):
+        """
+        Returns the ItemDetailFrame of a category, creating it the first time and
+        again only if the table's columns changed (a migration).
+        """
+        view = self.detail_views.get(category)
+        if view is not None and view.table == table:
+            return view
+        if view is not None:
+            if self.details_scroll_frame is view:
+                self._clear_content()
+            view.destroy()
+
+        if category == "Persons":
+            assign_text, category_to_assign = "Assign to Groups", "groups"
+        else:
+            assign_text, category_to_assign = "Assign Persons", "persons"
+        view = ItemDetailFrame(
+            self, category, table, assign_text,
+            on_assign=lambda: self._open_assignment_window(self.current_item_id, category_to_assign, category)
+        )
+        self.detail_views[category] = view
+        return view
+
     def update_content(self, category, item_id=None):
         """
         Updates the content displayed based on the selected category and item ID.
         If item_id is None, a placeholder message is shown.
         """
-        self._clear_content() # Always clear previous content first
-
         self.current_category = category
         self.current_item_id = item_id
 
-        # Handle "Files" category separately as it doesn't have item details in DB
+        # Details still being read for the previous selection are not wanted anymore
+        service.cancel("details")
+
+        # Files are browsed straight from disk, their cards are not in the database
         if self.current_category == "Files":
-            self.placeholder_label.configure(text="File details can be shown here (not yet implemented).")
+            self._clear_content()
+            if item_id is None:
+                self.placeholder_label.configure(text=f"Select a .vcf file from '{vcf_files.get_vcf_dir()}' to browse it.")
+                return
+            self._show_frame(FileBrowserFrame(self, item_id))
             return
 
         if item_id is None:
+            self._clear_content()
             self.placeholder_label.configure(text=f"Select an item from '{category}' to view details.")
             return
 
-        # Fetch item data from the database
-        item_data = dbms.get_item_data(category, item_id)
+        # Read on the data service, the view keeps showing the previous item meanwhile
+        service.submit(self._load_details, category, item_id, key="details", widget=self,
+                       on_done=lambda details: self._show_details(category, item_id, *details),
+                       on_loading=self._show_loading)
 
-        if not item_data:
-            self.placeholder_label.configure(text=f"No details found for the selected {category[:-1]} (ID: {item_id}).")
-            return
-
-        # Hide the initial placeholder label since we have content to display
-        if self.placeholder_label:
-            self.placeholder_label.grid_forget()
-
-        # Create a scrollable frame for the item details
-        display_title = item_data.get('fn') or item_data.get('title') or f"{category[:-1].capitalize()} Details"
-        self.details_scroll_frame = ctk.CTkScrollableFrame(
-            self,
-            label_text=f"Details for: {display_title}",
-            label_font=ctk.CTkFont(size=18, weight="bold")
-        )
-        self.details_scroll_frame.grid(row=0, column=0, padx=20, pady=(10, 5), sticky="nsew")
-        self.details_scroll_frame.grid_columnconfigure(1, weight=1) # Value column expands
-
-        row_num = 0
-        # Fetch attributes from dbms to ensure correct order and types for display
-        attributes_info = OrderedDict(dbms.get_attributes(self.current_category))
-
-        for attr_name, attr_type in attributes_info.items():
-
-            display_name = self.attribute_display_names.get(attr_name, attr_name.replace("_", " ").title())
-            value = item_data.get(attr_name) # Get raw value
-
-            # Special handling for BLOB types (assuming base64 encoded image data)
-            if attr_type == "BLOB" and value:
-                try:
-                    # Ensure value is a string, then decode
-                    img_data_bytes = base64.b64decode(str(value))
-                    img = Image.open(io.BytesIO(img_data_bytes))
-                    img.thumbnail((200, 200)) # Resize for display in UI
-                    tk_img = ImageTk.PhotoImage(img)
-
-                    # Create a label to hold the image
-                    img_label = ctk.CTkLabel(self.details_scroll_frame, text="", image=tk_img)
-                    img_label.image = tk_img
-                    img_label.grid(row=row_num, column=0, columnspan=2, padx=10, pady=5)
-                    row_num += 1
-                except (base64.binascii.Error, IOError, Exception) as e:
-                    # Fallback if image decoding or loading fails
-                    print(f"Error displaying image for attribute {attr_name}: {e}")
-                    value_text = f"[Image Data - Unable to Display: {e}]"
-                    
-                    name_label = ctk.CTkLabel(self.details_scroll_frame, text=f"{display_name}:",
-                                              font=ctk.CTkFont(size=13, weight="bold"))
-                    name_label.grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
-                    value_label = ctk.CTkLabel(self.details_scroll_frame, text=value_text, wraplength=400, justify="left")
-                    value_label.grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
-                    row_num += 1
-            else:
-                # Regular text attributes
-                name_label = ctk.CTkLabel(self.details_scroll_frame, text=f"{display_name}:",
-                                          font=ctk.CTkFont(size=13, weight="bold"))
-                name_label.grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
+    @staticmethod
+    def _load_details(category, item_id):
+        """
+        Worker thread: reads everything the detail view shows, never touches Tk.
+        Photos and logos are read and shrunk here as well, only their Tk images
+        are made on the Tk thread.
 
-                value_text = str(value) if value is not None else "N/A"
+        Returns:
+            tuple: (table, item data or None if the item does not exist, linked names).
+        """
+        # Column order, types and labels come from the cached schema, no query needed
+        table = dbms.get_table_schema(category)
 
-                value_label = ctk.CTkLabel(self.details_scroll_frame, text=value_text, wraplength=400, justify="left")
-                value_label.grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
-                row_num += 1
+        # Fetch item data from the database, photos and logos come as lazy handles
+        item_data = dbms.get_item_fields(category, item_id, table.column_names)
+        if not item_data:
+            return table, None, None
 
-        # --- Show linked groups/persons ---
-        if self.current_category == "Persons":
+        item_data = dict(item_data) # The cached record is shared, the thumbnails go into a copy
+        for attr_name in table.blob_columns:
+            value = item_data.get(attr_name)
+            if not value:
+                item_data[attr_name] = None # Also an empty value's handle
+                continue
+            try:
+                # Only now is the image actually read from the database
+                item_data[attr_name] = ItemDetailFrame.make_thumbnail(value.read())
+            except (base64.binascii.Error, IOError, Exception) as e:
+                print(f"Error displaying image for attribute {attr_name}: {e}")
+                item_data[attr_name] = e
+
+        # --- Linked groups/persons ---
+        if category == "Persons":
             groups = dbms.get_groups_for_person(item_id)
-            group_names = ", ".join(title for _, title in groups) if groups else "None"
-            name_label = ctk.CTkLabel(self.details_scroll_frame, text="Groups:",
-                                      font=ctk.CTkFont(size=13, weight="bold"))
-            name_label.grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
-            value_label = ctk.CTkLabel(self.details_scroll_frame, text=group_names, wraplength=400, justify="left")
-            value_label.grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
-            row_num += 1
-
-        elif self.current_category == "Groups":
+            linked_names = ", ".join(title for _, title in groups) if groups else "None"
+        else:
             persons = dbms.get_persons_for_group(item_id)
-            person_names = ", ".join(name for _, name in persons) if persons else "None"
-            name_label = ctk.CTkLabel(self.details_scroll_frame, text="Members:",
-                                      font=ctk.CTkFont(size=13, weight="bold"))
-            name_label.grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
-            value_label = ctk.CTkLabel(self.details_scroll_frame, text=person_names, wraplength=400, justify="left")
-            value_label.grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
-            row_num += 1
+            linked_names = ", ".join(name for _, name in persons) if persons else "None"
+        return table, item_data, linked_names
 
-        # --- Assignment Buttons ---
-        if self.assign_btn:
-            self.assign_btn.destroy()
-
-        if self.current_item_id: # Only show assign button if an item is selected
-            if self.current_category == "Persons":
-                self.assign_btn = ctk.CTkButton(
-                    self.details_scroll_frame,
-                    text="Assign to Groups",
-                    command=lambda: self._open_assignment_window(
-                        self.current_item_id, "groups", "Persons"
-                    )
-                )
-                self.assign_btn.grid(row=999, column=0, columnspan=2, pady=(10, 5)) # Use a high row number to place it at the bottom
-                row_num += 1
-            elif self.current_category == "Groups":
-                self.assign_btn = ctk.CTkButton(
-                    self.details_scroll_frame,
-                    text="Assign Persons",
-                    command=lambda: self._open_assignment_window(
-                        self.current_item_id, "persons", "Groups"
-                    )
-                )
-                self.assign_btn.grid(row=999, column=0, columnspan=2, pady=(10, 5))
-                row_num += 1
+    def _show_loading(self):
+        if isinstance(self.details_scroll_frame, ItemDetailFrame):
+            self.details_scroll_frame.configure(label_text="Loading...")
+        else:
+            self.placeholder_label.configure(text="Loading...")
+
+    def _show_details(self, category, item_id, table, item_data, linked_names):
+        """Shows what _load_details() read."""
+        if not item_data:
+            self._clear_content()
+            self.placeholder_label.configure(text=f"No details found for the selected {category[:-1]} (ID: {item_id}).")
+            return
+
+        # The labels of the category's view are reused, only their text and images change
+        view = self._get_detail_view(category, table)
+        view.show(item_data, linked_names)
+        self._show_frame(view)
 
     def _open_assignment_window(self, item_id, category_to_assign, current_category):
         """
@@ -591,12 +862,13 @@ class MainContentFrame(ctk.CTkFrame):
         Generic action button. Its behavior can be customized based on the
         currently selected category and item.
         """
-        item_title = None
-        if self.current_item_id and self.current_category:
-            item_data = dbms.get_item_data(self.current_category, self.current_item_id)
-            if item_data:
-                item_title = item_data.get('fn') or item_data.get('title')
+        if self.current_item_id and self.current_category and self.current_category != "Files":
+            service.submit(dbms.get_item_name, self.current_category, self.current_item_id,
+                           key="main_action", widget=self, on_done=self._show_main_action)
+        else:
+            self._show_main_action(None)
 
+    def _show_main_action(self, item_title):
         current_info = f"Category: {self.current_category}, Item: {item_title or 'None'}"
         messagebox.showinfo("Main Action", f"Performing action on:\n{current_info}")
         print(f"Main Action Button clicked. Current view: {current_info}")
@@ -607,20 +879,370 @@ class MainContentFrame(ctk.CTkFrame):
             title="Select a vCard file",
             filetypes=[("vCard files", "*.vcf"), ("All files", "*.*")]
         )
-        if file_path:
+        if file_path and not ImportProgressDialog.blocks_writes():
+            # The import runs in the background, the window stays responsive
+            self.master.set_writes_state("disabled")
+            ImportProgressDialog(self.master, file_path, self._import_finished)
+
+    def _import_finished(self, status, result):
+        """Called by the ImportProgressDialog once the import committed, was cancelled or failed."""
+        self.master.set_writes_state("normal")
+        if status == "done":
+            # The import's change notification has already refreshed the lists
+            messagebox.showinfo("vCard Import",
+                                f"vCard import successful! {result['inserted']} new, {result['updated']} updated, "
+                                f"{result['unchanged']} unchanged.")
+        elif status == "cancelled":
+            messagebox.showinfo("vCard Import", "Import cancelled, no contacts were imported.")
+        else:
+            messagebox.showerror("vCard Import Error", f"Failed to import vCard: {result}")
+
+
+
+class ItemDetailFrame(ctk.CTkScrollableFrame):
+    """
+    The details of a person or group: a label per attribute name and value.
+
+    The labels are created once for the columns of a table and show() only changes
+    their text and images, so selecting another item creates no widgets. Labels
+    whose text stays the same are not touched.
+    """
+    THUMBNAIL_SIZE = (200, 200)
+
+    def __init__(self, master, category, table, assign_text, on_assign):
+        """
+        Args:
+            master: The parent widget.
+            category (str): "Persons" or "Groups".
+            table (schema.Table): The columns to show, see dbms.get_table_schema().
+            assign_text (str): Text of the assignment button.
+            on_assign: Called when the assignment button is clicked.
+        """
+        super().__init__(master, label_text=" ", label_font=ctk.CTkFont(size=18, weight="bold"))
+        self.category = category
+        self.table = table
+        self.grid_columnconfigure(1, weight=1) # Value column expands
+
+        name_font = ctk.CTkFont(size=13, weight="bold")
+        # column name -> (name label, value label, image label or None)
+        self.rows = {}
+        for row_num, column in enumerate(table.columns):
+            self.rows[column.name] = self._add_row(row_num, f"{column.display_name}:", name_font)
+            if column.is_blob:
+                image_label = ctk.CTkLabel(self, text="")
+                image_label.image = None
+                image_label.row_num = row_num
+                self.rows[column.name] += (image_label,)
+            else:
+                self.rows[column.name] += (None,)
+
+        link_title = "Groups:" if category == "Persons" else "Members:"
+        _, self.link_label = self._add_row(len(table.columns), link_title, name_font)
+
+        self.assign_btn = ctk.CTkButton(self, text=assign_text, command=on_assign)
+        self.assign_btn.grid(row=999, column=0, columnspan=2, pady=(10, 5)) # Use a high row number to place it at the bottom
+
+    def _add_row(self, row_num, title, font):
+        name_label = ctk.CTkLabel(self, text=title, font=font)
+        name_label.grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
+        value_label = ctk.CTkLabel(self, text="", wraplength=400, justify="left")
+        value_label.grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
+        return name_label, value_label
+
+    @staticmethod
+    def _set_text(label, text):
+        if label.cget("text") != text:
+            label.configure(text=text)
+
+    def show(self, item_data, linked_names):
+        """
+        Shows an item.
+
+        Args:
+            item_data (dict): Column name -> value, photos and logos as PIL images
+                from make_thumbnail() or the exception that prevented it.
+            linked_names (str): The item's groups or members, comma separated.
+        """
+        display_title = item_data.get('fn') or item_data.get('title') or f"{self.category[:-1].capitalize()} Details"
+        if self.cget("label_text") != f"Details for: {display_title}":
+            self.configure(label_text=f"Details for: {display_title}")
+
+        for column in self.table.columns:
+            name_label, value_label, image_label = self.rows[column.name]
+            value = item_data.get(column.name) # Get raw value
+
+            if image_label is None:
+                self._set_text(value_label, str(value) if value is not None else "N/A")
+                continue
+
+            tk_img = None
+            value_text = "N/A"
+            if isinstance(value, Exception):
+                # Fallback if image decoding or loading failed
+                value_text = f"[Image Data - Unable to Display: {value}]"
+            elif value is not None:
+                tk_img = ImageTk.PhotoImage(value)
+
+            # An image takes the whole row, otherwise the name and a text are shown
+            if tk_img is not None:
+                image_label.configure(image=tk_img)
+                image_label.image = tk_img
+                if not image_label.grid_info():
+                    name_label.grid_remove()
+                    value_label.grid_remove()
+                    image_label.grid(row=image_label.row_num, column=0, columnspan=2, padx=10, pady=5)
+            else:
+                image_label.image = None
+                self._set_text(value_label, value_text)
+                if image_label.grid_info():
+                    image_label.grid_remove()
+                    name_label.grid()
+                    value_label.grid()
+
+        self._set_text(self.link_label, linked_names)
+
+    @classmethod
+    def make_thumbnail(cls, img_data_bytes):
+        """Decodes raw or base64 encoded image data into a PIL image of at most THUMBNAIL_SIZE."""
+        try:
+            img = Image.open(io.BytesIO(img_data_bytes))
+        except IOError:
+            img = Image.open(io.BytesIO(base64.b64decode(img_data_bytes)))
+        img.thumbnail(cls.THUMBNAIL_SIZE) # Resize for display in UI
+        return img
+
+
+class FileBrowserFrame(ctk.CTkFrame):
+    """
+    Shows the cards of one .vcf file a page at a time and previews the selected one.
+
+    The file is scanned into its byte-offset index on a worker thread the first time
+    it is opened (see dbms.vcf_files), after that paging only queries the index and a
+    preview reads and parses the bytes of a single card. Nothing is imported.
+    """
+    CARD_PAGE_SIZE = 100
+    POLL_INTERVAL_MS = 100
+
+    # file_id -> (worker thread, list receiving its error), shared so that a file
+    # that is opened again while it is being scanned is not scanned twice
+    _index_jobs = {}
+
+    def __init__(self, master, file_id):
+        super().__init__(master, fg_color="transparent")
+        self.file_id = file_id
+        self.page_starts = [None] # `after` value of every page up to the current one
+        self.has_next_page = False
+        self.card_buttons = []
+        self.page_cards = [] # card_index of every card on the current page
+        self.selected_card = None
+        self.preview_widgets = []
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=2)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.header_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=18, weight="bold"),
+                                         wraplength=600, justify="left")
+        self.header_label.grid(row=0, column=0, columnspan=2, padx=10, pady=(5, 10), sticky="w")
+
+        self.card_list = ctk.CTkScrollableFrame(self, label_text="Cards")
+        self.card_list.grid(row=1, column=0, padx=(0, 5), sticky="nsew")
+        self.card_list.grid_columnconfigure(0, weight=1)
+
+        self.page_bar = ctk.CTkFrame(self, fg_color="transparent")
+        self.page_bar.grid(row=2, column=0, padx=(0, 5), pady=5, sticky="ew")
+        self.page_bar.grid_columnconfigure(1, weight=1)
+        self.previous_button = ctk.CTkButton(self.page_bar, text="< Previous", width=90,
+                                             command=self._previous_page, state="disabled")
+        self.previous_button.grid(row=0, column=0)
+        self.page_label = ctk.CTkLabel(self.page_bar, text="")
+        self.page_label.grid(row=0, column=1)
+        self.next_button = ctk.CTkButton(self.page_bar, text="Next >", width=90,
+                                         command=self._next_page, state="disabled")
+        self.next_button.grid(row=0, column=2)
+
+        self.preview_frame = ctk.CTkScrollableFrame(self, label_text="Preview")
+        self.preview_frame.grid(row=1, column=1, rowspan=2, padx=(5, 0), sticky="nsew")
+        self.preview_frame.grid_columnconfigure(1, weight=1)
+
+        # What is known of the file is read on the data service
+        self.file_info = None
+        self.header_label.configure(text="Loading...")
+        service.submit(self._load_file, file_id, key="file_info", widget=self,
+                       on_done=lambda result: self._file_loaded(*result))
+
+    @staticmethod
+    def _load_file(file_id):
+        """Worker thread: returns (file info, whether it is indexed)."""
+        return vcf_files.get_file(file_id), vcf_files.is_indexed(file_id)
+
+    def _file_loaded(self, file_info, indexed):
+        self.file_info = file_info
+        if indexed:
+            self._show_file()
+        else:
+            self._start_indexing()
+
+    def _start_indexing(self):
+        name = self.file_info['path'] if self.file_info else self.file_id
+        self.header_label.configure(text=f"Indexing {name}...")
+        job = self._index_jobs.get(self.file_id)
+        if job is None or not job[0].is_alive():
+            errors = []
+            worker = threading.Thread(target=self._run_index, args=(self.file_id, errors), daemon=True)
+            self._index_jobs[self.file_id] = (worker, errors)
+            worker.start()
+        self.after(self.POLL_INTERVAL_MS, self._poll_indexing)
+
+    @staticmethod
+    def _run_index(file_id, errors):
+        """Worker thread: scans the file, never touches Tk."""
+        try:
+            vcf_files.index_file(file_id)
+        except Exception as e:
+            print(f"Error indexing vCard file {file_id}: {e}")
+            errors.append(e)
+
+    def _poll_indexing(self):
+        if not self.winfo_exists(): # The user moved on, the scan still finishes in the background
+            return
+        worker, errors = self._index_jobs[self.file_id]
+        if worker.is_alive():
+            self.after(self.POLL_INTERVAL_MS, self._poll_indexing)
+            return
+        del self._index_jobs[self.file_id]
+        if errors:
+            self.header_label.configure(text=f"Cannot index {self.file_info['path']}: {errors[0]}")
+            return
+        service.submit(vcf_files.get_file, self.file_id, key="file_info", widget=self,
+                       on_done=lambda file_info: self._file_loaded(file_info, True))
+
+    def _show_file(self):
+        info = self.file_info
+        self.header_label.configure(
+            text=f"{info['path']}\n{info['card_count']} cards, {info['size'] / 1e6:.1f} MB"
+        )
+        self._show_page()
+
+    def _show_page(self):
+        # The paging buttons wait for the page, so a quick second click can not skip one
+        self.previous_button.configure(state="disabled")
+        self.next_button.configure(state="disabled")
+        self.page_label.configure(text="Loading...")
+        # One card more than shown tells whether there is a next page
+        service.submit(vcf_files.list_cards, self.file_id, self.page_starts[-1], self.CARD_PAGE_SIZE + 1,
+                       key="card_page", widget=self, on_done=self._show_cards, on_error=self._page_failed)
+
+    def _page_failed(self, error):
+        print(f"Error reading the cards of vCard file {self.file_id}: {error}")
+        self.page_label.configure(text="Cannot read the cards")
+        self.previous_button.configure(state="normal" if len(self.page_starts) > 1 else "disabled")
+
+    def _show_cards(self, cards):
+        """Shows a page that _show_page() read."""
+        self.has_next_page = len(cards) > self.CARD_PAGE_SIZE
+        cards = cards[:self.CARD_PAGE_SIZE]
+
+        # The buttons of the previous page are reused, only their text changes
+        for position, (card_index, fn) in enumerate(cards):
+            if position == len(self.card_buttons):
+                button = ctk.CTkButton(
+                    self.card_list, height=28, anchor="w",
+                    fg_color="transparent",
+                    hover_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"],
+                    text_color=ctk.ThemeManager.theme["CTkButton"]["text_color"]
+                )
+                self.card_buttons.append(button)
+            button = self.card_buttons[position]
+            button.card_index = card_index
+            button.configure(text=fn or f"Card {card_index + 1}",
+                             command=lambda index=card_index: self._select_card(index))
+            button.pack(fill="x", padx=2, pady=1)
+        # Buttons left over from a longer page are hidden and kept for the next one
+        for button in self.card_buttons[len(cards):]:
+            button.pack_forget()
+            button.card_index = None
+        self.page_cards = [card_index for card_index, _ in cards]
+
+        if cards:
+            first, last = cards[0][0] + 1, cards[-1][0] + 1
+            self.page_label.configure(text=f"{first}-{last} of {self.file_info['card_count']}")
+        else:
+            self.page_label.configure(text="No cards")
+        self.previous_button.configure(state="normal" if len(self.page_starts) > 1 else "disabled")
+        self.next_button.configure(state="normal" if self.has_next_page else "disabled")
+
+        if cards:
+            self._select_card(cards[0][0])
+        else:
+            self._clear_preview()
+
+    def _next_page(self):
+        if self.has_next_page and self.page_cards:
+            self.page_starts.append(self.page_cards[-1])
+            self._show_page()
+
+    def _previous_page(self):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+            self._show_page()
+
+    def _select_card(self, card_index):
+        self.selected_card = card_index
+        selected_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+        for button in self.card_buttons:
+            button.configure(fg_color=selected_color if button.card_index == card_index else "transparent")
+        # Reading and parsing the card runs on the data service, the last click wins
+        service.submit(vcf_files.get_card_fields, self.file_id, card_index, key="card_preview", widget=self,
+                       on_done=self._show_preview)
+
+    def _clear_preview(self):
+        for widget in self.preview_widgets:
+            widget.destroy()
+        self.preview_widgets.clear()
+
+    def _add_preview_row(self, row_num, label, value_text):
+        name_label = ctk.CTkLabel(self.preview_frame, text=f"{label}:", font=ctk.CTkFont(size=13, weight="bold"))
+        name_label.grid(row=row_num, column=0, padx=(10, 5), pady=2, sticky="nw")
+        value_label = ctk.CTkLabel(self.preview_frame, text=value_text, wraplength=350, justify="left")
+        value_label.grid(row=row_num, column=1, padx=(5, 10), pady=2, sticky="w")
+        self.preview_widgets += [name_label, value_label]
+
+    def _show_preview(self, fields):
+        """Shows the parsed card, only the properties it has a value for."""
+        self._clear_preview()
+        if fields is None:
+            self._add_preview_row(0, "Error", "This card cannot be read, see the console for details.")
+            return
+
+        row_num = 0
+        photo = fields.pop('photo', None)
+        if photo:
             try:
-                # Call the external vCard import function
-                import_vcard(file_path)
-                messagebox.showinfo("vCard Import", "vCard import successful! Refreshing persons list.")
-                # After successful import, refresh the 'Persons' category in the DetailSidebar
-                # This needs to be done via the App's on_category_selected or directly calling DetailSidebar
-                # self.master is the App instance
-                self.master.detail_sidebar.update_content("Persons", force_update=True)
-                # Optionally, re-select the first person or the newly imported one if its ID is known
+                img = Image.open(io.BytesIO(photo))
+                img.thumbnail((200, 200)) # Resize for display in UI
+                tk_img = ImageTk.PhotoImage(img)
+                img_label = ctk.CTkLabel(self.preview_frame, text="", image=tk_img)
+                img_label.image = tk_img
+                img_label.grid(row=row_num, column=0, columnspan=2, padx=10, pady=5)
+                self.preview_widgets.append(img_label)
+                row_num += 1
             except Exception as e:
-                print(f"Error importing vCard: {e}")
-                messagebox.showerror("vCard Import Error", f"Failed to import vCard: {e}")
+                print(f"Error displaying photo of card {self.selected_card}: {e}")
 
+        contacts = fields.pop('contact_points')
+        # The first TEL, EMAIL, ... is also a persons column, it is listed with the others below
+        contact_kinds = {kind for kind, _, _ in contacts}
+        for column, value in fields.items():
+            if value is None or value == 'None' or column in contact_kinds:
+                continue
+            self._add_preview_row(row_num, schema.column_label(column), str(value))
+            row_num += 1
+        # Every TEL, EMAIL, ... of the card, not just the first one the persons table keeps
+        for kind, types, raw in contacts:
+            label = schema.column_label(kind) + (f" ({types})" if types else "")
+            self._add_preview_row(row_num, label, raw)
+            row_num += 1
 
 
 # --- ExternalWindow Class (Moved here for self-containment in gui.py) ---
@@ -652,45 +1274,13 @@ class ExternalWindow(ctk.CTkToplevel):
         self.grid_rowconfigure(0, weight=1)    # Allows the scrollable frame to expand vertically
         self.grid_columnconfigure(0, weight=1) # Allows content to expand horizontally
 
-        # --- Attribute Display Name Mapping ---
-        # This dictionary maps internal database column names to user-friendly labels.
-        self.attribute_display_names = {
-            "fn": "First Name",
-            "n": "Last Name",
-            "nickname": "Nickname",
-            "photo": "Photo",
-            "bday": "Birthday",
-            "anniversary": "Anniversary",
-            "gender": "Gender",
-            "adr": "Address",
-            "tel": "Telephone Number",
-            "email": "Email Address",
-            "impp": "Instant Messenger ID",
-            "lang": "Language",
-            "tz": "Time Zone",
-            "geo": "Geolocation (Lat,Long)",
-            "note": "Notes",
-            "title": "Group Title",
-            "logo": "Group Logo",
-            "org": "Organization",
-            "related": "Related Information",
-            "url": "Website URL"
-            # Add mappings for any other attribute names from 'role', 'is_in', 'other' tables
-            # if you intend to extend this window's functionality for them.
-            # Primary keys are generally skipped in 'Add' mode and shown read-only in 'Edit'.
-        }
-
         # --- Fetch Attributes and Item Data ---
-        # Fetch attribute names and types from the database manager.
-        # OrderedDict is used to ensure the UI fields appear in the same order
-        # as returned by get_attributes, which is important for a consistent layout.
-        self.attributes = OrderedDict(dbms.get_attributes(self.category))
+        # Column names, types and form labels come from the cached schema of the table,
+        # in table order, which is important for a consistent layout.
+        self.table = dbms.get_table_schema(self.category)
 
-        # Retrieve existing item data if in "Edit" mode to pre-fill the fields.
+        # Existing item data is read on the data service in "Edit" mode, see _fill_entries()
         self.item_data = {}
-        if self.mode == "Edit" and self.item_id is not None:
-            self.item_data = dbms.get_item_data(self.category, self.item_id)
-            print(f"Debug: Fetched existing data for {self.category} ID {self.item_id}: {self.item_data}")
 
         # --- Create Scrollable Frame for Attributes ---
         # This frame will contain all the label and entry pairs for attributes.
@@ -709,13 +1299,14 @@ class ExternalWindow(ctk.CTkToplevel):
 
         # --- Populate Scrollable Frame with Attribute Fields ---
         row_num = 0
-        for attr_name, attr_type in self.attributes.items():
+        for column in self.table.columns:
+            attr_name = column.name
             # Skip primary key IDs for 'Add' mode, as they are usually auto-generated by the DB.
-            if self.mode == "Add" and (attr_name.endswith('_id') or attr_name == "person_id" or attr_name == "group_id"):
+            if self.mode == "Add" and column.is_primary_key:
                 continue
 
             # Determine the display name for the attribute
-            display_name = self.attribute_display_names.get(attr_name, attr_name.replace("_", " ").title())
+            display_name = column.form_label
 
             # Create a label for the attribute
             label = ctk.CTkLabel(self.scrollable_frame, text=f"{display_name}:",
@@ -727,14 +1318,9 @@ class ExternalWindow(ctk.CTkToplevel):
                                  font=ctk.CTkFont(size=13))
             entry.grid(row=row_num, column=1, padx=(5, 10), pady=5, sticky="ew")
 
-            # If in 'Edit' mode, pre-fill the entry with existing data
+            # In 'Edit' mode the entries are filled once the item is read
             if self.mode == "Edit":
-                current_value = self.item_data.get(attr_name, "")
-                if current_value is not None: # Ensure None doesn't get inserted as "None" string
-                    entry.insert(0, str(current_value))
-                # For primary key IDs, make them read-only in edit mode
-                if attr_name.endswith('_id') or attr_name == "person_id" or attr_name == "group_id":
-                    entry.configure(state="readonly") # Disable editing for IDs
+                entry.configure(state="disabled")
 
             # Store the entry widget reference with its original attribute name
             self.attribute_entry_widgets[attr_name] = entry
@@ -766,6 +1352,33 @@ class ExternalWindow(ctk.CTkToplevel):
         self.grab_set()        # Make this window modal (grabs all input)
         self.focus_set()       # Give focus to this window
 
+        # Retrieve existing item data if in "Edit" mode to pre-fill the fields.
+        if self.mode == "Edit" and self.item_id is not None:
+            self.save_button.configure(state="disabled")
+            # Text columns only, photos and logos are not edited as text
+            service.submit(dbms.get_item_fields, self.category, self.item_id, widget=self,
+                           on_done=self._fill_entries)
+
+    def _fill_entries(self, item_data):
+        """Pre-fills the entries with the existing data of the edited item."""
+        self.item_data = item_data or {}
+        print(f"Debug: Fetched existing data for {self.category} ID {self.item_id}: {self.item_data}")
+        for column in self.table.columns:
+            entry = self.attribute_entry_widgets.get(column.name)
+            if entry is None:
+                continue
+            entry.configure(state="normal")
+            current_value = self.item_data.get(column.name, "")
+            if current_value is not None: # Ensure None doesn't get inserted as "None" string
+                entry.insert(0, str(current_value))
+            # For primary key IDs, make them read-only in edit mode
+            if column.name.endswith('_id') or column.name == "person_id" or column.name == "group_id":
+                entry.configure(state="readonly") # Disable editing for IDs
+            # Images are kept as they are, the entry is only a placeholder
+            if column.is_blob:
+                entry.configure(state="disabled")
+        self.save_button.configure(state="normal")
+
     def _save_changes(self):
         """
         Retrieves the current values from all attribute entry fields,
@@ -783,13 +1396,23 @@ class ExternalWindow(ctk.CTkToplevel):
                 # For readonly fields (like IDs in edit mode), retrieve their existing value
                 collected_data[attr_name] = entry_widget.get().strip()
 
-        # Call the dbms to save the collected data
+        # Call the dbms to save the collected data on the data service
         # Pass self.item_id (which will be None for 'Add' mode) to differentiate between add/edit
-        dbms.save_item_data(self.category, self.item_id, collected_data)
+        if ImportProgressDialog.blocks_writes():
+            return
+        self.save_button.configure(state="disabled", text="Saving...")
+        service.submit(dbms.save_item_data, self.category, self.item_id, collected_data, widget=self,
+                       write=True, on_done=self._saved, on_error=self._save_failed)
 
+    def _saved(self, result):
         print(f"Data for {self.category} {self.mode} operation processed and saved.")
         self.destroy() # Close the external window
 
+    def _save_failed(self, error):
+        print(f"Error saving {self.category} data: {error}")
+        messagebox.showerror("Save Error", f"The changes could not be saved: {error}")
+        self.save_button.configure(state="normal", text="Save Changes")
+
     def _cancel_changes(self):
         """
         Closes the external window without saving any changes.
@@ -808,6 +1431,8 @@ class ExternalWindow(ctk.CTkToplevel):
 
 # --- Main App Class ---
 class App(ctk.CTk):
+    CHANGE_POLL_INTERVAL_MS = 100
+
     def __init__(self):
         super().__init__()
 
@@ -819,6 +1444,9 @@ class App(ctk.CTk):
         self.geometry(f"{window_width}x{window_height}")
         self.minsize(700, 400)
 
+        # Database work of the widgets below runs on its worker threads
+        service.start(self)
+
         # Configure grid layout for the main window (1 row, 3 columns)
         self.grid_rowconfigure(0, weight=1) # Allow content area to expand vertically
         self.grid_columnconfigure(0, weight=0) # CategorySidebar fixed width
@@ -831,6 +1459,33 @@ class App(ctk.CTk):
         # Pass main_content_frame.import_vcard_file as the callback for the Import button
         self.category_sidebar = CategorySidebar(self, self.on_category_selected, self.main_content_frame.import_vcard_file)
 
+        # Database changes can be made on any thread (imports run on a worker), they
+        # are queued and applied to the widgets here, on the Tk thread
+        self.db_changes = queue.Queue()
+        changes.subscribe(self.db_changes.put)
+        self.after(self.CHANGE_POLL_INTERVAL_MS, self._poll_db_changes)
+
+    def _poll_db_changes(self):
+        try:
+            while True:
+                self.detail_sidebar.apply_change(self.db_changes.get_nowait())
+        except queue.Empty:
+            pass
+        self.after(self.CHANGE_POLL_INTERVAL_MS, self._poll_db_changes)
+
+    def destroy(self):
+        changes.unsubscribe(self.db_changes.put)
+        service.stop()
+        super().destroy()
+
+
+    def set_writes_state(self, state):
+        """
+        Enables ("normal") or disables ("disabled") the buttons that change the
+        data, an import disables them while it holds the write lock.
+        """
+        self.category_sidebar.set_writes_state(state)
+        self.detail_sidebar.action_bar.set_writes_state(state)
 
     def on_category_selected(self, category_name):
         """Callback from CategorySidebar when a category is selected."""
@@ -0,0 +1,432 @@
+import tkinter as tk
+
+import customtkinter as ctk
+
+from dbms import dbms
+
+
+class ListSource:
+    """Rows of a VirtualList that are all in memory, for short lists such as the .vcf files."""
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def rows_between(self, first, last):
+        """Returns the (id, label) rows first up to (excluding) last."""
+        return self.rows[first:last]
+
+    def index_of(self, item_id):
+        """Returns the position of item_id, or None if it is not in the list."""
+        for index, (row_id, _) in enumerate(self.rows):
+            if row_id == item_id:
+                return index
+        return None
+
+
+class PagedItemSource:
+    """
+    The persons or groups of the database as rows of a VirtualList, in name order.
+
+    Keeps one window of consecutive rows around what the list shows, at most
+    MAX_ROWS of them, read with dbms.list_items_page(): continued from the key of
+    its last row while the list scrolls down, read by offset when it scrolls up or
+    jumps. apply() merges a dbms change into the window, so that afterwards only
+    the rows that really changed differ.
+
+    Without a reader every read happens right away, on the thread asking, which
+    is how the worker building the source reads its first page. Once the source is
+    shown, read is set to a function like DataService.submit() that runs the reads
+    off the Tk thread and calls on_done there: rows not read yet are returned as
+    (None, None) placeholders, the reader redraws the list when they arrive.
+    """
+    PAGE_SIZE = 200
+    MAX_ROWS = 5000
+
+    def __init__(self, category, sort="name"):
+        self.category = category.lower()
+        self.sort = sort
+        self.count = dbms.count_items(category)
+        self.start = 0 # Position of rows[0] in the whole list
+        self.rows = [] # (id, label) tuples in list order
+        self.read = None # read(func, *args, key=, on_done=, on_error=, **kwargs), see above
+        self.loading = None # (page_size, position) of the page being read
+        self.version = 0 # Counts the changes of the window, a page read for an older one is dropped
+        self.changes = [] # (change, on_done) of apply(), the first ones are being read
+
+    def __len__(self):
+        return self.count
+
+    def rows_between(self, first, last):
+        """
+        Returns the (id, label) rows first up to (excluding) last, reading them if
+        needed. With a reader the rows being read are (None, None) meanwhile.
+        """
+        last = min(last, self.count)
+        if first >= last:
+            return []
+        end = self.start + len(self.rows)
+        if first < self.start or last > end:
+            if self.changes:
+                pass # The window is being changed, the rows are read after that
+            elif self.rows and self.start <= first <= end:
+                self._extend(last)
+            else:
+                self._load(first, last)
+        before = min(max(self.start - first, 0), last - first)
+        rows = self.rows[max(first - self.start, 0):max(last - self.start, 0)]
+        return [(None, None)] * before + rows + [(None, None)] * (last - first - before - len(rows))
+
+    def _extend(self, last):
+        # Scrolling down: continue after the last row, then drop rows far above
+        missing = last - (self.start + len(self.rows))
+        page_size = -(-missing // self.PAGE_SIZE) * self.PAGE_SIZE
+        self._read_page(self._append, page_size, after=self._page_key(self.rows[-1]))
+
+    def _append(self, rows):
+        self.rows += rows
+        surplus = len(self.rows) - self.MAX_ROWS
+        if surplus > 0:
+            del self.rows[:surplus]
+            self.start += surplus
+
+    def _load(self, first, last):
+        # Scrolling up or jumping: read the rows in view and a page around them
+        start = max(first - self.PAGE_SIZE, 0)
+        page_size = min(last + self.PAGE_SIZE, self.count) - start
+        self._read_page(lambda rows: self._replace(start, rows), page_size, offset=start)
+
+    def _replace(self, start, rows):
+        self.start, self.rows = start, rows
+
+    def _read_page(self, merge, page_size, **position):
+        # Reads a page of list_items_page() at position and hands its rows to merge
+        if self.read is None:
+            merge(dbms.list_items_page(self.category, self.sort, page_size, **position)[0])
+            return
+        request = (page_size, position)
+        if request == self.loading:
+            return # Asked again while it is on its way
+        self.loading = request
+        version = self.version
+
+        def done(result):
+            if self.loading == request:
+                self.loading = None
+            # The page continues the window it was asked for, not one changed since
+            if version == self.version:
+                self.version += 1
+                merge(result[0])
+
+        def failed(error):
+            if self.loading == request:
+                self.loading = None
+            print(f"Error reading the {self.category} list: {error}")
+
+        self.read(dbms.list_items_page, self.category, self.sort, page_size, key="list_page",
+                  on_done=done, on_error=failed, **position)
+
+    def _page_key(self, row):
+        # The `after` key of list_items_page() for the rows after row
+        return row[0] if self.sort == "id" else (row[1], row[0])
+
+    def _sort_key(self, row):
+        # SQLite's order: NULL, then numbers, then text by code point (BINARY on UTF-8)
+        row_id, label = row
+        if self.sort == "id":
+            return (row_id,)
+        if label is None:
+            return (0, 0, row_id)
+        if isinstance(label, (int, float)):
+            return (1, label, row_id)
+        return (2, str(label), row_id)
+
+    def index_of(self, item_id):
+        """
+        Returns the position of item_id in the list, or None if it does not exist.
+        With a reader only the window is searched, None then also means not read.
+        """
+        for position, (row_id, _) in enumerate(self.rows):
+            if row_id == item_id:
+                return self.start + position
+        if self.read is not None:
+            return None
+        return dbms.get_item_position(self.category, item_id, self.sort)
+
+    def row_at(self, index, on_done):
+        """Calls on_done with the (id, label) row at index, or None if there is none, reading it if needed."""
+        if self.start <= index < self.start + len(self.rows):
+            on_done(self.rows[index - self.start])
+            return
+        if self.read is None:
+            rows, _ = dbms.list_items_page(self.category, self.sort, 1, offset=index)
+            on_done(rows[0] if rows else None)
+            return
+        self.read(dbms.list_items_page, self.category, self.sort, 1, offset=index, key="list_row",
+                  on_done=lambda result: on_done(result[0][0] if result[0] else None))
+
+    def apply(self, change, on_done=None):
+        """
+        Updates the window for a changes.Change of this category: deleted rows are
+        removed, new and renamed rows are put where they belong now. Only the
+        changed ids and the count are read, and the window's position if a row
+        before it may have come or gone.
+
+        Everything is taken from the database as it is now, so applying a change
+        whose effect was already read with an earlier one does no harm. With a
+        reader, changes arriving while one is read are applied together after it.
+
+        Args:
+            change (changes.Change): The change.
+            on_done: Called without arguments once the window shows the change.
+        """
+        self.changes.append((change, on_done))
+        if len(self.changes) == 1:
+            self._apply_changes()
+
+    def _apply_changes(self):
+        # Reads the effect of all waiting changes at once
+        batch = len(self.changes)
+        waiting = [change for change, _ in self.changes]
+        change = waiting[0]._replace(
+            inserted=sum((c.inserted for c in waiting), ()),
+            updated=sum((c.updated for c in waiting), ()),
+            deleted=sum((c.deleted for c in waiting), ()),
+            reset=any(c.reset for c in waiting)
+        )
+
+        def done(window):
+            self.count, self.start, self.rows = window
+            self.version += 1
+            finished, self.changes = self.changes[:batch], self.changes[batch:]
+            for _, callback in finished:
+                if callback is not None:
+                    callback()
+            if self.changes:
+                self._apply_changes()
+
+        def failed(error):
+            print(f"Error reading a change of the {self.category} list: {error}")
+            done((self.count, 0, [])) # Read again when shown
+
+        if self.read is None:
+            done(self._read_change(change, self.count, self.start, self.rows))
+            return
+        # Pages on their way were asked for the window before the change
+        self.version += 1
+        self.loading = None
+        self.read(self._read_change, change, self.count, self.start, list(self.rows), key="list_change",
+                  on_done=done, on_error=failed)
+
+    def _read_change(self, change, old_count, start, rows):
+        """
+        Worker thread: the (count, start, rows) of the window start, rows after
+        change. Only reads the source's settings, the window comes as arguments.
+        """
+        count = dbms.count_items(self.category)
+        touched = set(change.inserted) | set(change.updated) | set(change.deleted)
+        if change.reset or len(touched) > self.MAX_ROWS or not rows:
+            return count, 0, [] # Read again when shown
+
+        first_key = self._sort_key(rows[0])
+        last_key = self._sort_key(rows[-1])
+        at_start = start == 0
+        at_end = start + len(rows) >= old_count
+
+        # Deleted or renamed rows outside the window may have been before it
+        window_ids = {row_id for row_id, _ in rows}
+        moved_before = any(row_id not in window_ids for row_id in change.deleted + change.updated)
+        kept = [row for row in rows if row[0] not in touched]
+        for row in dbms.get_item_names(self.category, change.inserted + change.updated).items():
+            key = self._sort_key(row)
+            if key < first_key and not at_start:
+                moved_before = True
+            elif key <= last_key or at_end:
+                kept.append(row)
+        kept.sort(key=self._sort_key)
+
+        position = start
+        if kept and moved_before and not at_start:
+            position = dbms.get_item_position(self.category, kept[0][0], self.sort)
+        if not kept or position is None:
+            return count, 0, []
+        return count, position, kept
+
+
+class VirtualList(ctk.CTkFrame):
+    """
+    A scrollable list of (id, label) rows that only creates widgets for the rows
+    in view.
+
+    The rows are drawn on a canvas whose scroll region is as tall as all rows
+    together. On every scroll the buttons of a small pool, enough for the visible
+    rows plus OVERSCAN on either side, are moved to the rows now in view and given
+    their labels. Rows come from a source (ListSource or PagedItemSource), which is
+    only asked for the rows being drawn. A (None, None) row is still being read,
+    it shows LOADING_TEXT and can not be clicked.
+    """
+    ROW_HEIGHT = 32
+    OVERSCAN = 5
+    LOADING_TEXT = "Loading..."
+
+    def __init__(self, master, on_select, **kwargs):
+        """
+        Args:
+            master: The parent widget.
+            on_select: Called with the id of a row when the user clicks it.
+        """
+        super().__init__(master, **kwargs)
+        self.on_select = on_select
+        self.source = ListSource(())
+        self.selected_id = None
+        self.buttons = []       # The pool of (button, canvas window), never shrinks
+        self.visible = {}       # id -> (button, canvas window) of the rows currently drawn
+        self.width = 1
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0,
+                                bg=self._canvas_color(),
+                                yscrollincrement=self.ROW_HEIGHT)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._scroll)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.canvas)
+
+    def _canvas_color(self):
+        color = self._bg_color if self._fg_color == "transparent" else self._fg_color
+        return self._apply_appearance_mode(color)
+
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        self.canvas.configure(bg=self._canvas_color())
+
+    def _bind_wheel(self, widget):
+        # Windows and macOS send <MouseWheel>, X11 buttons 4 and 5
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", lambda event: self._scroll("scroll", -3, "units"), add="+")
+        widget.bind("<Button-5>", lambda event: self._scroll("scroll", 3, "units"), add="+")
+
+    def _on_wheel(self, event):
+        steps = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        self._scroll("scroll", steps * 3, "units")
+
+    def _on_resize(self, event):
+        self.width = event.width
+        for button, window in self.buttons:
+            self.canvas.itemconfigure(window, width=self.width)
+        self.render()
+
+    def _scroll(self, *args):
+        self.canvas.yview(*args)
+        self.render()
+
+    def set_source(self, source):
+        """Shows the rows of another source, scrolled to the top."""
+        self.source = source
+        self.canvas.configure(scrollregion=(0, 0, 0, len(source) * self.ROW_HEIGHT))
+        self.canvas.yview_moveto(0)
+        self.render()
+
+    def refresh(self):
+        """Redraws after the rows of the source changed, keeping the scroll position."""
+        self.canvas.configure(scrollregion=(0, 0, 0, len(self.source) * self.ROW_HEIGHT))
+        self.render()
+
+    def scroll_to(self, index):
+        """Scrolls index into view if it is not."""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        row_top = index * self.ROW_HEIGHT
+        if row_top < top or row_top + self.ROW_HEIGHT > bottom:
+            total = max(len(self.source) * self.ROW_HEIGHT, 1)
+            self.canvas.yview_moveto(row_top / total)
+            self.render()
+
+    def select(self, item_id):
+        """Highlights the row of item_id, only the old and new row are repainted."""
+        previous = self.visible.get(self.selected_id)
+        if previous is not None:
+            previous[0].configure(fg_color="transparent")
+        self.selected_id = item_id
+        current = self.visible.get(item_id)
+        if current is not None:
+            current[0].configure(fg_color=self._selected_color())
+
+    @staticmethod
+    def _selected_color():
+        return ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+
+    def _new_button(self):
+        button = ctk.CTkButton(
+            self.canvas,
+            text="",
+            height=self.ROW_HEIGHT - 2,
+            anchor="w",
+            fg_color="transparent",
+            hover_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"],
+            text_color=ctk.ThemeManager.theme["CTkButton"]["text_color"]
+        )
+        button.item_id = None # Row shown, None while the button is hidden
+        button.label = None
+        button.index = None
+        button.configure(command=lambda: self._click(button))
+        self._bind_wheel(button)
+        window = self.canvas.create_window(0, 0, window=button, anchor="nw", width=self.width, state="hidden")
+        return button, window
+
+    def _click(self, button):
+        # The id of a placeholder is its ("loading", index) key, see render()
+        if not isinstance(button.item_id, tuple):
+            self.on_select(button.item_id)
+
+    def render(self):
+        """
+        Draws the rows in view. A button that keeps showing the same row is left
+        alone or only moved, the others get the label and highlight of their new
+        row, so after a change only the rows that differ are repainted.
+        """
+        height = max(self.canvas.winfo_height(), self.ROW_HEIGHT)
+        top = self.canvas.canvasy(0)
+        first = max(int(top // self.ROW_HEIGHT) - self.OVERSCAN, 0)
+        last = min(int((top + height) // self.ROW_HEIGHT) + 1 + self.OVERSCAN, len(self.source))
+        # Rows still being read are keyed by their position, the buttons are reused once they arrive
+        rows = [(("loading", index), self.LOADING_TEXT) if row_id is None else (row_id, label)
+                for index, (row_id, label) in enumerate(self.source.rows_between(first, last), start=first)]
+
+        while len(self.buttons) < len(rows):
+            self.buttons.append(self._new_button())
+
+        # Buttons whose row is still in view keep it, the others are reused
+        by_id = {entry[0].item_id: entry for entry in self.buttons if entry[0].item_id is not None}
+        row_ids = {row_id for row_id, _ in rows}
+        free = [entry for entry in self.buttons if entry[0].item_id not in row_ids]
+
+        self.visible = {}
+        selected_color = self._selected_color()
+        for index, (row_id, label) in enumerate(rows, start=first):
+            entry = by_id.get(row_id) or free.pop()
+            button, window = entry
+            text = label if label is not None else f"(no name, ID {row_id})"
+            if button.item_id != row_id:
+                if button.item_id is None:
+                    self.canvas.itemconfigure(window, state="normal")
+                button.item_id = row_id
+                button.label = text
+                button.configure(text=text, fg_color=selected_color if row_id == self.selected_id else "transparent")
+            elif button.label != text:
+                button.label = text
+                button.configure(text=text)
+            if button.index != index:
+                button.index = index
+                self.canvas.coords(window, 0, index * self.ROW_HEIGHT)
+            self.visible[row_id] = entry
+        for button, window in free:
+            if button.item_id is not None:
+                button.item_id = button.index = None
+                self.canvas.itemconfigure(window, state="hidden")
+        self.buttons = list(self.visible.values()) + free
@@ -22,11 +22,11 @@ for module, package in required_packages.items():
     install_and_import(module, package)
 
 
-from dbms import vcard_import
+from dbms import migrations, vcard_import
 from gui import gui 
 
-# Run database init
-subprocess.run([sys.executable, "dbms/dbms.py"])
+# Bring the database schema up to date, only pending migrations are run
+migrations.migrate()
 
 # Launch GUI 
 gui.launch()
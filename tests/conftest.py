@@ -0,0 +1,22 @@
+import pytest
+
+from dbms import dbms
+from dbms.connection import manager
+
+
+@pytest.fixture
+def empty_database(tmp_path):
+    """Points the connection manager at a new database file without any tables."""
+    previous_path = manager.db_path
+    manager.use_database(str(tmp_path / "test.db"))
+    dbms.invalidate_cache()
+    yield manager
+    manager.use_database(previous_path)
+    dbms.invalidate_cache()
+
+
+@pytest.fixture
+def database(empty_database):
+    """A new database with every migration applied."""
+    dbms.create_tables()
+    return empty_database
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from gui.data_service import DataService
+
+
+class FakeRoot:
+    """Stands in for the Tk root: after() callbacks are run by the test's own loop."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, delay_ms, callback):
+        self.pending.append(callback)
+
+    def run_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            pending, self.pending = self.pending, []
+            for callback in pending:
+                callback()
+            time.sleep(0.005)
+
+
+def test_writes_run_one_at_a_time_in_order():
+    service = DataService()
+    root = FakeRoot()
+    service.start(root)
+    running = []
+    order = []
+    overlapped = []
+    lock = threading.Lock()
+
+    def write(number):
+        with lock:
+            running.append(number)
+            if len(running) > 1:
+                overlapped.append(number)
+        time.sleep(0.02 if number % 2 == 0 else 0.001)
+        with lock:
+            running.remove(number)
+        return number
+
+    done = []
+    for number in range(6):
+        service.submit(write, number, write=True, on_done=done.append)
+    root.run_until(lambda: len(done) == 6)
+    service.stop()
+
+    assert done == list(range(6))
+    assert overlapped == []
+
+
+def test_stop_finishes_queued_writes():
+    service = DataService()
+    service.start(FakeRoot())
+    written = []
+    for number in range(3):
+        service.submit(lambda number: (time.sleep(0.01), written.append(number)), number, write=True)
+    service.stop()
+    assert written == [0, 1, 2]
@@ -0,0 +1,102 @@
+import sqlite3
+
+import pytest
+
+from dbms import changes, dbms, search
+from dbms.connection import manager
+
+
+def test_item_data_has_no_internal_columns(database):
+    with manager.transaction() as conn:
+        conn.execute("INSERT INTO groups (group_id, title, intern_key) VALUES (1, 'Friends', 'key')")
+    item = dbms.get_item_data("groups", 1)
+    assert item["title"] == "Friends"
+    assert "intern_key" not in item
+    assert list(item) == list(dbms.get_table_schema("groups").column_names)
+
+
+def test_delete_batch_reports_only_existing_ids(database, monkeypatch):
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (person_id, fn) VALUES (?, ?)", [(1, "Ann"), (2, "Ben"), (3, "Cid")])
+    dbms.get_item_data("persons", 1)
+    notified = []
+    monkeypatch.setattr(changes, "_subscribers", [notified.append])
+
+    # A generator can only be read once
+    assert dbms.delete_items_batch("persons", (item_id for item_id in (1, 3, 7, 1))) == 2
+    assert [change.deleted for change in notified] == [(1, 3)]
+    assert dbms.get_item_data("persons", 1) is None
+    assert dbms.get_item_data("persons", 2)["fn"] == "Ben"
+
+
+def test_search_ranks_name_matches_first(database):
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (person_id, fn, note) VALUES (?, ?, ?)", [
+            (1, "Anna Berg", "call john smith"), (2, "John Smith", None), (3, "Bob", "smith"), (4, "Smith Johnson", None),
+        ])
+    assert [item_id for _, item_id, _ in search.search("john smith")] == [2, 4, 1]
+    assert [item_id for _, item_id, _ in search.search("smith", limit=3)] == [2, 4, 1]
+    assert [item_id for _, item_id, _ in search.search("john smith", mode="phrase")] == [2, 1]
+    with manager.transaction() as conn:
+        conn.execute("UPDATE persons SET fn = 'Bob Smith' WHERE person_id = 3")
+        conn.execute("DELETE FROM persons WHERE person_id = 2")
+    assert [item_id for _, item_id, _ in search.search("smith")] == [3, 4, 1]
+
+
+def test_failed_writes_raise(database):
+    with manager.transaction() as conn:
+        conn.execute("INSERT INTO persons (person_id, fn) VALUES (1, 'Ann')")
+    manager.get().execute("PRAGMA busy_timeout = 0")
+    locker = sqlite3.connect(manager.db_path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            dbms.save_item_data("persons", 1, {"fn": "Anna"})
+        with pytest.raises(sqlite3.OperationalError):
+            dbms.delete_item("persons", 1)
+    finally:
+        locker.rollback()
+        locker.close()
+
+    assert dbms.get_item_data("persons", 1)["fn"] == "Ann"
+    assert dbms.delete_item("persons", 1) is True
+    assert dbms.delete_item("persons", 1) is False
+
+
+def test_sync_memberships_writes_only_the_difference(database):
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (person_id, fn) VALUES (?, ?)", [(1, "Ann"), (2, "Ben")])
+        conn.executemany("INSERT INTO groups (group_id, title) VALUES (?, ?)", [(1, "A"), (2, "B"), (3, "C")])
+        # A membership written by an import, with its role
+        conn.execute("INSERT INTO role (role_id, role) VALUES (1, 'Boss')")
+        conn.executemany("INSERT INTO is_in (person_id, group_id, role_id) VALUES (?, ?, ?)",
+                         [(1, 1, 1), (1, 2, None), (2, 2, None)])
+
+    assert dbms.sync_memberships("Persons", 1, [2, 3]) == ([3], [1])
+    assert dbms.sync_memberships("persons", 1, [3, 2]) == ([], [])
+    assert dbms.sync_memberships("groups", 2, []) == ([], [1, 2])
+    assert manager.get().execute("SELECT person_id, group_id FROM is_in").fetchall() == [(1, 3)]
+    assert dbms.sync_memberships("files", 1, [1]) == ([], [])
+
+
+def test_writes_invalidate_the_cached_records_and_lists(database):
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (person_id, fn) VALUES (?, ?)", [(1, "Ann"), (2, "Ben")])
+        conn.execute("INSERT INTO groups (group_id, title) VALUES (1, 'Friends')")
+        conn.execute("INSERT INTO is_in (person_id, group_id) VALUES (1, 1)")
+    assert dbms.get_item_data("persons", 1)["fn"] == "Ann"
+    assert dbms.get_groups_for_person(1) == [(1, "Friends")]
+    assert dbms.get_persons_for_group(1) == [(1, "Ann")]
+
+    # A renamed group shows its new title in the lists of its members
+    dbms.save_item_data("groups", 1, {"title": "Family"})
+    assert dbms.get_groups_for_person(1) == [(1, "Family")]
+    dbms.save_item_data("persons", 1, {"fn": "Anna"})
+    assert dbms.get_item_data("persons", 1)["fn"] == "Anna"
+    assert dbms.get_persons_for_group(1) == [(1, "Anna")]
+
+    dbms.sync_memberships("groups", 1, [1, 2])
+    assert dbms.get_groups_for_person(2) == [(1, "Family")]
+    dbms.delete_item("persons", 1)
+    assert dbms.get_item_data("persons", 1) is None
+    assert dbms.get_persons_for_group(1) == [(2, "Ben")]
@@ -0,0 +1,32 @@
+from dbms import migrations
+from dbms.connection import manager
+
+
+def migrate_to(version, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, "MIGRATIONS", [m for m in migrations.MIGRATIONS if m[0] <= version])
+        migrations.migrate()
+
+
+def test_intern_backfill_leaves_gui_groups_alone(empty_database, monkeypatch):
+    migrate_to(11, monkeypatch)
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (person_id, fn) VALUES (?, ?)", [(1, "Ann"), (2, "Ben"), (3, "Cid")])
+        # Two identical groups made in the GUI, no logo, members without a role
+        conn.executemany("INSERT INTO groups (group_id, title) VALUES (?, 'Friends')", [(1,), (2,)])
+        conn.executemany("INSERT INTO is_in (person_id, group_id) VALUES (?, ?)", [(1, 1), (2, 2)])
+        # Two identical groups written by an older import, each card with its role
+        conn.executemany("INSERT INTO groups (group_id, title, org) VALUES (?, 'None', 'ACME')", [(3,), (4,)])
+        conn.executemany("INSERT INTO role (role_id, role, member) VALUES (?, 'None', 'None')", [(1,), (2,)])
+        conn.executemany("INSERT INTO is_in (person_id, group_id, role_id) VALUES (?, ?, ?)", [(1, 3, 1), (3, 4, 2)])
+
+    migrate_to(12, monkeypatch)
+    conn = manager.get()
+    groups = conn.execute("SELECT group_id, intern_key FROM groups ORDER BY group_id").fetchall()
+    assert [group_id for group_id, _ in groups] == [1, 2, 3]
+    assert groups[0][1] is None and groups[1][1] is None
+    assert groups[2][1] is not None
+    assert conn.execute("SELECT person_id, group_id FROM is_in ORDER BY person_id, group_id").fetchall() == [
+        (1, 1), (1, 3), (2, 2), (3, 3)
+    ]
+    assert conn.execute("SELECT COUNT(*) FROM role").fetchone()[0] == 1
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from dbms import dbms, vcard_import
+from dbms.benchmarks import write_synthetic_vcf
+from dbms.connection import manager
+
+
+def test_upsert_recognizes_cards_of_a_plain_import(database, tmp_path):
+    vcf_path = write_synthetic_vcf(str(tmp_path / "cards.vcf"), 20)
+    with open(vcf_path, "a", encoding="utf-8", newline="") as f:
+        f.write("BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Without Uid\r\nEND:VCARD\r\n")
+
+    assert vcard_import.import_vcard(vcf_path, chunk_size=8)["inserted"] == 21
+    counts = vcard_import.import_vcard(vcf_path, chunk_size=8, upsert=True)
+    assert counts["inserted"] == 0 and counts["unchanged"] == 21
+    assert manager.get().execute("SELECT COUNT(*) FROM persons").fetchone()[0] == 21
+
+
+def _write_cards(path, cards):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("".join(cards))
+    return str(path)
+
+def _card(number, end="END:VCARD\r\n"):
+    return f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Card {number}\r\n{end}"
+
+
+def test_unclosed_card_fails_the_import(database, tmp_path):
+    cards = [_card(number, end="" if number == 2 else "END:VCARD\r\n") for number in range(10)]
+    vcf_path = _write_cards(tmp_path / "broken.vcf", cards)
+
+    with pytest.raises(vcard_import.UnclosedCard):
+        list(vcard_import.iter_vcard_texts(vcf_path))
+    with pytest.raises(vcard_import.UnclosedCard):
+        vcard_import.import_vcard(vcf_path, atomic=True)
+    assert manager.get().execute("SELECT COUNT(*) FROM persons").fetchone()[0] == 0
+
+    vcf_path = _write_cards(tmp_path / "last.vcf", [_card(0), _card(1, end="")])
+    with pytest.raises(vcard_import.UnclosedCard):
+        list(vcard_import.iter_vcard_texts(vcf_path))
+
+
+def test_agent_card_stays_nested(tmp_path):
+    agent = ("BEGIN:VCARD\r\nVERSION:2.1\r\nFN:Boss\r\nAGENT:\r\n"
+             "BEGIN:VCARD\r\nVERSION:2.1\r\nFN:Assistant\r\nEND:VCARD\r\nEND:VCARD\r\n")
+    vcf_path = _write_cards(tmp_path / "agent.vcf", [_card(0), agent, _card(2)])
+    texts = [text for _, _, text in vcard_import.iter_vcard_texts(vcf_path)]
+    assert len(texts) == 3
+    assert "FN:Assistant" in texts[1]
+
+
+def test_update_keeps_a_group_renamed_in_the_gui(database, tmp_path):
+    card = "BEGIN:VCARD\r\nVERSION:3.0\r\nUID:u1\r\nFN:Ann\r\nTITLE:Boss\r\n{}END:VCARD\r\n"
+    vcard_import.import_vcard(_write_cards(tmp_path / "v1.vcf", [card.format("")]), upsert=True)
+    with manager.transaction() as conn:
+        conn.execute("UPDATE groups SET title = 'Management' WHERE group_id = 1")
+
+    counts = vcard_import.import_vcard(_write_cards(tmp_path / "v2.vcf", [card.format("NOTE:Changed\r\n")]),
+                                       upsert=True)
+    assert counts["updated"] == 1
+    conn = manager.get()
+    assert conn.execute("SELECT title FROM groups WHERE group_id = 1").fetchone() == ("Management",)
+    assert conn.execute("SELECT group_id FROM is_in WHERE person_id = 1 ORDER BY group_id").fetchall()[0] == (1,)
+
+
+def test_files_are_imported_again_after_clearing_the_tables(database, tmp_path):
+    vcf_path = write_synthetic_vcf(str(tmp_path / "cards.vcf"), 5)
+    assert vcard_import.import_paths([vcf_path])["imported"] == 1
+    dbms.clear_tables()
+
+    assert vcard_import.import_paths([vcf_path])["imported"] == 1
+    assert manager.get().execute("SELECT COUNT(*) FROM persons").fetchone()[0] == 5
+
+
+def test_interrupted_import_resumes_after_the_last_committed_chunk(database, tmp_path):
+    vcf_path = write_synthetic_vcf(str(tmp_path / "cards.vcf"), 10)
+    cancel_event = threading.Event()
+    with pytest.raises(vcard_import.ImportCancelled):
+        # Stops before the second chunk, the first one stays committed
+        vcard_import.import_vcard(vcf_path, chunk_size=4, checkpoint=True, cancel_event=cancel_event,
+                                  progress=lambda info: cancel_event.set())
+    conn = manager.get()
+    assert conn.execute("SELECT COUNT(*) FROM persons").fetchone()[0] == 4
+    assert not vcard_import.is_imported(vcf_path)
+
+    assert vcard_import.import_vcard(vcf_path, chunk_size=4, checkpoint=True)["cards"] == 6
+    assert conn.execute("SELECT COUNT(*) FROM persons").fetchone()[0] == 10
+    assert vcard_import.is_imported(vcf_path)
+    assert vcard_import.import_vcard(vcf_path, chunk_size=4, checkpoint=True)["cards"] == 0
@@ -0,0 +1,84 @@
+import pytest
+
+from dbms import vcard_import, vcard_parser
+from dbms.benchmarks import synthetic_vcard
+
+# Hand-written cards: (id, text, whether vcard_parser decodes it itself instead
+# of handing it to vobject). vCard 2.1/3.0/4.0, folding, QUOTED-PRINTABLE, base64,
+# escapes, structured values and a nested AGENT.
+SAMPLE_CARDS = [
+    ("quoted-printable 2.1", True,
+     "BEGIN:VCARD\r\nVERSION:2.1\r\nN:Gump;Forrest;;Mr.\r\nFN:Forrest Gump\r\n"
+     "ORG:Bubba Gump Shrimp Co.\r\nTITLE:Shrimp Man\r\n"
+     "TEL;WORK;VOICE:(111) 555-1212\r\nTEL;HOME;VOICE:(404) 555-1212\r\n"
+     "ADR;WORK;PREF:;;100 Waters Edge;Baytown;LA;30314;United States of America\r\n"
+     "LABEL;WORK;PREF;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8:100 Waters Edge=0D=0ABaytown\r\n"
+     "NOTE;ENCODING=QUOTED-PRINTABLE;CHARSET=ISO-8859-1:Caf=E9 au lait\r\n"
+     "EMAIL:forrestgump@example.com\r\nREV:20080424T195243Z\r\nEND:VCARD\r\n"),
+
+    ("quoted-printable singleton and base64 photo", True,
+     "BEGIN:VCARD\r\nVERSION:2.1\r\nN;QUOTED-PRINTABLE;CHARSET=UTF-8:M=C3=BCller;J=C3=BCrgen\r\n"
+     "FN;QUOTED-PRINTABLE:J=C3=BCrgen M=C3=BCller\r\n"
+     "PHOTO;ENCODING=BASE64;TYPE=JPEG:\r\n /9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRof\r\n"
+     " Hh0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/\r\n\r\n"
+     "END:VCARD\r\n"),
+
+    ("nested agent", False,
+     "BEGIN:VCARD\r\nVERSION:2.1\r\nFN:Boss\r\n"
+     "AGENT:\r\nBEGIN:VCARD\r\nVERSION:2.1\r\nFN:Assistant\r\nEND:VCARD\r\n"
+     "END:VCARD\r\n"),
+
+    ("escapes and structured values 3.0", True,
+     "BEGIN:VCARD\nVERSION:3.0\nN:Doe;John,Johnny;Quincy;Dr.,Prof.;Jr.\nFN:John Q. Doe\n"
+     "NICKNAME:JD,Johnny\nORG:Example\\, Inc.;R&D;Lab 5\nTITLE:Lead\\; Senior\n"
+     "PHOTO;ENCODING=b;TYPE=PNG:iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4\n"
+     " 2mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==\n"
+     "ADR;TYPE=home:PO Box 1;Apt 2;1 Main St,Rear;Springfield;IL;62701;USA\n"
+     "ADR;TYPE=work:;;2 Side St;Shelbyville;;;\n"
+     "item1.EMAIL;type=INTERNET;type=pref:john@example.com\nitem1.X-ABLabel:_$!<Other>!$_\n"
+     "TEL;TYPE=cell,voice:+1-555-0100\nIMPP:xmpp:john@example.com\n"
+     "NOTE:Line one\\nline two\\, with comma, and a tail\\\\done \\x\n"
+     "CATEGORIES:friends,work\\,play,,\nGEO:37.386013;-122.082932\n"
+     "UID:abc\\,def\nBDAY:1980-01-02\nURL:http://example.com/a,b\nROLE:Boss\n"
+     "X-CUSTOM;ENCODING=QUOTED-PRINTABLE:=3D\nEND:VCARD\n"),
+
+    ("parameters 4.0", True,
+     "BEGIN:VCARD\r\nVERSION:4.0\r\nFN:Jane Roe\r\nN:Roe;Jane;;;\r\n"
+     "TEL;VALUE=uri;TYPE=\"voice,home\":tel:+1-555-555-5555;ext=5555\r\n"
+     "EMAIL;PREF=1:jane@example.com\r\nGENDER:F\r\nANNIVERSARY:19960415\r\n"
+     "LANG;TYPE=work;PREF=1:en\r\nTZ:-0500\r\nKEY:http://example.com/key.pgp\r\n"
+     "PHOTO:http://example.com/photo.jpg\r\nMEMBER:urn:uuid:03a0e51f\r\n"
+     "RELATED;TYPE=friend:urn:uuid:f81d4fae\r\nCLIENTPIDMAP:1;urn:uuid:3df403f4\r\n"
+     "PRODID:-//Example//EN\r\nEND:VCARD\r\n"),
+
+    ("base64 singleton and folded line", True,
+     "BEGIN:VCARD\r\nFN:No Version\r\nEMAIL;BASE64:am9obkBleGFtcGxlLmNvbQ==\r\n"
+     "NOTE:Folded across\r\n  two lines\r\nEND:VCARD\r\n"),
+
+    ("trailing backslash", False,
+     "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Back Slash\r\nNOTE:ends with a backslash\\\r\n"
+     "TITLE:escaped\\\\\r\nEND:VCARD\r\n"),
+
+    ("backslash before a fold", True,
+     "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Back Slash\\\r\n  folded\r\nEND:VCARD\r\n"),
+]
+
+
+def _vobject_rows(text):
+    try:
+        return vcard_import.parse_cards(text, fast=False)
+    except Exception as e:
+        return type(e).__name__
+
+
+@pytest.mark.parametrize("decoded, text", [sample[1:] for sample in SAMPLE_CARDS],
+                         ids=[sample[0] for sample in SAMPLE_CARDS])
+def test_fast_parser_matches_vobject(decoded, text):
+    cards = vcard_parser.read_cards(text)
+    assert [values is not None for values, _, _ in cards] == [decoded]
+    assert vcard_import.parse_cards(text, fast=True) == _vobject_rows(text)
+
+
+def test_fast_parser_matches_vobject_on_many_cards():
+    text = "".join(sample[2] for sample in SAMPLE_CARDS) + "".join(synthetic_vcard(i) for i in range(200))
+    assert vcard_import.parse_cards(text, fast=True) == _vobject_rows(text)
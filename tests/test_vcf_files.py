@@ -0,0 +1,39 @@
+from dbms import vcard_import, vcf_files
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return str(path)
+
+def _card(number, end="END:VCARD\r\n"):
+    return f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Card {number}\r\n{end}"
+
+
+def test_scan_lists_the_cards_after_an_unclosed_one(tmp_path, capsys):
+    cards = [_card(number, end="" if number == 2 else "END:VCARD\r\n") for number in range(10)]
+    path = _write(tmp_path / "broken.vcf", "".join(cards))
+
+    found = list(vcf_files.scan_cards(path))
+    assert [fn for _, _, fn in found] == [f"Card {number}" for number in range(10)]
+    offsets = [0]
+    for card in cards:
+        offsets.append(offsets[-1] + len(card.encode()))
+    assert [(start, end) for start, end, _ in found] == list(zip(offsets, offsets[1:]))
+    assert "has no END:VCARD" in capsys.readouterr().out
+
+
+def test_scan_reports_an_unclosed_last_card(tmp_path, capsys):
+    path = _write(tmp_path / "last.vcf", _card(0) + _card(1, end=""))
+    assert [fn for _, _, fn in vcf_files.scan_cards(path)] == ["Card 0", "Card 1"]
+    assert "has no END:VCARD" in capsys.readouterr().out
+
+
+def test_scan_splits_like_the_import(tmp_path):
+    agent = ("BEGIN:VCARD\r\nVERSION:2.1\r\nFN:Boss\r\nAGENT:\r\n"
+             "BEGIN:VCARD\r\nVERSION:2.1\r\nFN:Assistant\r\nEND:VCARD\r\nEND:VCARD\r\n")
+    path = _write(tmp_path / "agent.vcf", _card(0) + agent + _card(2))
+    scanned = list(vcf_files.scan_cards(path))
+    assert [fn for _, _, fn in scanned] == ["Card 0", "Boss", "Card 2"]
+    assert [(start, end) for start, end, _ in scanned] == \
+        [(start, end) for start, end, _ in vcard_import.iter_vcard_texts(path)]
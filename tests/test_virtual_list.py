@@ -0,0 +1,90 @@
+from dbms import changes, dbms
+from dbms.connection import manager
+from gui.virtual_list import PagedItemSource
+
+
+class QueuedReader:
+    """A reader for PagedItemSource that runs the reads only when the test says so."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, func, *args, key=None, on_done=None, on_error=None, **kwargs):
+        self.requests.append((func, args, kwargs, on_done))
+
+    def run_all(self):
+        while self.requests:
+            func, args, kwargs, on_done = self.requests.pop(0)
+            on_done(func(*args, **kwargs))
+
+
+def add_persons(names):
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (fn) VALUES (?)", [(name,) for name in names])
+
+
+def test_pages_are_placeholders_until_the_reader_ran(database):
+    add_persons(f"Person {number:04}" for number in range(1000))
+    source = PagedItemSource("Persons")
+    source.rows_between(0, 10)
+    reader = source.read = QueuedReader()
+
+    rows = source.rows_between(600, 610)
+    assert rows == [(None, None)] * 10
+    source.rows_between(600, 610) # Asked again while it is read: no second request
+    assert len(reader.requests) == 1
+
+    reader.run_all()
+    assert [label for _, label in source.rows_between(600, 610)] == [f"Person {number:04}" for number in range(600, 610)]
+
+
+def test_page_read_before_a_change_is_dropped(database):
+    add_persons(f"Person {number:04}" for number in range(1000))
+    source = PagedItemSource("Persons")
+    source.rows_between(0, 10)
+    reader = source.read = QueuedReader()
+
+    source.rows_between(600, 610)
+    with manager.transaction() as conn:
+        conn.execute("DELETE FROM persons WHERE person_id = 1")
+    source.apply(changes.Change("persons", (), (), (1,), False))
+    reader.run_all()
+
+    assert len(source) == 999
+    assert source.rows_between(0, 1)[0][1] == "Person 0001"
+    assert source.rows_between(600, 601) == [(None, None)] # The page is read again for the new window
+    reader.run_all()
+    assert source.rows_between(600, 601)[0][1] == "Person 0601"
+
+
+def assert_window_matches_database(source):
+    rows, _ = dbms.list_items_page("persons", "name", len(source.rows), offset=source.start)
+    assert source.rows == rows
+    assert len(source) == dbms.count_items("persons")
+
+
+def test_apply_keeps_the_window_equal_to_the_database(database):
+    add_persons(f"Person {number:04}" for number in range(1000))
+    source = PagedItemSource("Persons")
+    source.rows_between(500, 520) # A window in the middle of the list
+    window_start = source.start
+
+    with manager.transaction() as conn:
+        conn.execute("UPDATE persons SET fn = 'Person 0550b' WHERE person_id = 521") # Renamed in the window
+        conn.execute("INSERT INTO persons (person_id, fn) VALUES (2000, 'Person 0600b')") # Added in it
+        conn.execute("DELETE FROM persons WHERE person_id = 501") # Deleted from it
+    source.apply(changes.Change("persons", (2000,), (521,), (501,), False))
+    assert_window_matches_database(source)
+    assert source.start == window_start
+
+    # Rows coming and going before the window move it
+    with manager.transaction() as conn:
+        conn.executemany("INSERT INTO persons (person_id, fn) VALUES (?, ?)",
+                         [(3000 + number, f"Person 0000{number}") for number in range(3)])
+        conn.execute("UPDATE persons SET fn = 'Zed' WHERE person_id = 11")
+    source.apply(changes.Change("persons", (3000, 3001, 3002), (11,), (), False))
+    assert_window_matches_database(source)
+    assert source.start == window_start + 2
+
+    source.apply(changes.Change("persons", (), (), (), True))
+    assert source.rows == [] and len(source) == 1003